@@ -2,9 +2,12 @@
 Django settings for adminlte project.
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 
@@ -33,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'core',
     'newspaper',
@@ -49,6 +53,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.SQLInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -58,6 +63,15 @@ MIDDLEWARE = [
 ]
 
 
+# share of requests instrumented (0 disables, 1 records every request)
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv("SQL_INSTRUMENTATION_SAMPLE_RATE", "1" if DEBUG else "0.05")
+)
+SQL_SLOW_REQUEST_MS = int(os.getenv("SQL_SLOW_REQUEST_MS", "500"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+SQL_KEEP_SLOWEST = 3
+
+
 # ======================
 # URL / TEMPLATES
 # ======================
@@ -100,6 +114,30 @@ DATABASES = {
     }
 }
 
+# Connection reuse, from DB_CONN_MODE:
+#   none       - new connection per request (Django default)
+#   persistent - keep each worker's connection for DB_CONN_MAX_AGE seconds,
+#                checked for health before reuse
+#   pool       - process-local psycopg pool (needs psycopg 3 with the
+#                pool extra installed instead of psycopg2)
+DB_CONN_MODE = os.getenv("DB_CONN_MODE", "persistent")
+
+if DB_CONN_MODE == "persistent":
+    DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+    DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+elif DB_CONN_MODE == "pool":
+    # requirements.txt installs psycopg2, which has no pool option
+    if not (find_spec("psycopg") and find_spec("psycopg_pool")):
+        raise ImproperlyConfigured(
+            "DB_CONN_MODE=pool needs psycopg 3 with its pool extra: "
+            "pip install 'psycopg[binary,pool]' (or use DB_CONN_MODE=persistent)"
+        )
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+    }
+
 
 # ======================
 # PASSWORD VALIDATION
@@ -139,3 +177,94 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 
 PROD_MODE = True
 
+
+
+# ======================
+# INVOICE PDF CACHE / EXPORT
+# ======================
+
+INVOICE_PDF_CACHE_DIR = os.getenv(
+    "INVOICE_PDF_CACHE_DIR",
+    str(BASE_DIR / "cache" / "invoice_pdf")
+)
+
+INVOICE_PDF_CACHE_MAX_BYTES = int(
+    os.getenv("INVOICE_PDF_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+)
+
+INVOICE_EXPORT_WORKERS = int(
+    os.getenv("INVOICE_EXPORT_WORKERS", os.cpu_count() or 1)
+)
+
+
+# ======================
+# CACHE
+# ======================
+# Shared by every gunicorn worker. File-based by default; point
+# CACHE_BACKEND / CACHE_LOCATION at memcached where one is available, e.g.
+# django.core.cache.backends.memcached.PyMemcacheCache / 127.0.0.1:11211.
+# Entries are dropped by signals in core/signals.py; the timeout is only
+# a safety net.
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", str(BASE_DIR / "cache" / "django")),
+        "TIMEOUT": int(os.getenv("CACHE_TIMEOUT", "3600")),
+        "KEY_PREFIX": "adminlte",
+    }
+}
+
+
+# ======================
+# DELIVERY PARTITIONS
+# ======================
+# optional tablespace (e.g. on cheaper storage) for archived month partitions
+
+DELIVERY_ARCHIVE_TABLESPACE = os.getenv("DELIVERY_ARCHIVE_TABLESPACE", "")
+
+
+# ======================
+# DELIVERY STORAGE
+# ======================
+# "rows": generate_deliveries stores one Delivery row per customer per day.
+# "exceptions": only rows that differ from the subscription are stored
+# (not delivered, holiday, price override); sheets, dashboard counts and
+# bills are derived from subscriptions. See delivery/sheet.py.
+
+DELIVERY_STORAGE = os.getenv("DELIVERY_STORAGE", "rows")
+
+
+# ======================
+# BACKGROUND JOBS
+# ======================
+# With BACKGROUND_JOBS on, delivery generation, invoice creation and PDF
+# exports are queued in core.Job and run by `manage.py run_jobs` instead
+# of inside the request. See core/jobs.py.
+
+BACKGROUND_JOBS = os.getenv("BACKGROUND_JOBS", "0") == "1"
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
+# first retry delay, doubled for every further attempt
+JOB_RETRY_SECONDS = int(os.getenv("JOB_RETRY_SECONDS", "30"))
+
+# a RUNNING job with no heartbeat for this long is handed out again
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "900"))
+
+JOB_OUTPUT_DIR = os.getenv("JOB_OUTPUT_DIR", str(BASE_DIR / "cache" / "jobs"))
+
+# without background jobs, billing runs longer than this many customer
+# chunks are refused by the web UI; use `manage.py billing_run` instead
+BILLING_REQUEST_MAX_CHUNKS = int(os.getenv("BILLING_REQUEST_MAX_CHUNKS", "5"))
+
+
+# ======================
+# SCHEDULER
+# ======================
+# local hour at which `run_scheduler --loop` generates tomorrow's
+# deliveries and runs due billing cycles (see core/scheduler.py)
+
+SCHEDULER_HOUR = int(os.getenv("SCHEDULER_HOUR", "2"))
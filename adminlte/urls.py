@@ -33,7 +33,12 @@ urlpatterns = [
     path('logout/', core.views.logout_view, name='logout'),
     path("change-password/", core.views.change_password_view, name="change_password"),
 
-    path('dashboard/', core.views.dashboard_view, name='dashboard'),
+    path('dashboard/', core.views.async_dashboard_view, name='dashboard'),
+    path('export/<str:dataset>.csv', core.views.export_csv_view, name='export_csv'),
+    path('jobs/', core.views.job_list, name='job_list'),
+    path('jobs/<int:job_id>/', core.views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/download/', core.views.job_download, name='job_download'),
+    path('jobs/<int:job_id>/retry/', core.views.job_retry, name='job_retry'),
     path('newspaper/', include(newspaper.urls)),
     path('customers/', include(customers.urls)),
     path('delivery/', include(delivery.urls)),
@@ -0,0 +1,171 @@
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from customers.models import Customer
+from delivery.models import Delivery
+from .middleware import record_queries
+
+
+BENCH_USERNAME = "bench"
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "baseline.json"
+
+
+def bench_user():
+    user, created = get_user_model().objects.get_or_create(
+        username=BENCH_USERNAME,
+        defaults={"is_staff": True},
+    )
+    if created:
+        user.set_unusable_password()
+        user.save()
+    return user
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _fixtures():
+    today = date.today()
+    busy = (
+        Customer.objects
+        .filter(
+            is_active=True,
+            delivery__status=Delivery.Status.DELIVERED,
+            delivery__invoice__isnull=True,
+        )
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+    return {
+        "today": today,
+        "customer_id": busy or Customer.objects.order_by("id").values_list("id", flat=True).first(),
+        "future_date": (
+            Delivery.objects.order_by("-date").values_list("date", flat=True).first()
+            or today
+        ) + timedelta(days=1),
+    }
+
+
+# name -> (method, url builder, POST data builder, mutates)
+SCENARIOS = {
+    "dashboard_view": ("get", lambda f: "/dashboard/", None, False),
+    "invoice_list": ("get", lambda f: "/invoice/", None, False),
+    "customer_detail_view": (
+        "get", lambda f: f"/customers/customer_detail/{f['customer_id']}/", None, False,
+    ),
+    "delivery_list_view": ("get", lambda f: f"/delivery/?date={f['today']}", None, False),
+    "generate_deliveries": (
+        "post", lambda f: "/delivery/generate/",
+        lambda f: {"date": f["future_date"].isoformat()}, True,
+    ),
+    "generate_invoice": (
+        "post", lambda f: f"/invoice/generate/{f['customer_id']}/",
+        lambda f: {"to_date": f["today"].isoformat()}, True,
+    ),
+}
+
+
+def _run_once(client, method, url, data, mutates):
+    """Return `(seconds, queries, status)`; mutating scenarios are rolled back."""
+    # counts the dashboard's section threads too, unlike the connection's
+    # query log
+    with record_queries() as queries:
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                response = getattr(client, method)(url, data or {})
+                if mutates:
+                    raise _Rollback
+        except _Rollback:
+            pass
+        elapsed = time.perf_counter() - start
+    return elapsed, queries.count, response.status_code
+
+
+def run(names=None, repeat=5):
+    """
+    Measure each scenario `repeat` times after one warm-up call, with the
+    shared cache off so every call does its real work.
+
+    Returns `{name: {"ms": median_ms, "queries": n, "status": code}}`.
+    """
+    fixtures = _fixtures()
+
+    results = {}
+    # generate_deliveries refuses future dates in PROD_MODE; a sampled
+    # request would record its queries apart from ours
+    with override_settings(
+        PROD_MODE=False,
+        SQL_INSTRUMENTATION_SAMPLE_RATE=0,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+    ):
+        client = Client()
+        client.force_login(bench_user())
+        for name in names or SCENARIOS:
+            method, url, data, mutates = SCENARIOS[name]
+            url, data = url(fixtures), data(fixtures) if data else None
+
+            _run_once(client, method, url, data, mutates)
+            timings = []
+            for _ in range(repeat):
+                elapsed, queries, status = _run_once(client, method, url, data, mutates)
+                timings.append(elapsed)
+
+            results[name] = {
+                "ms": round(statistics.median(timings) * 1000, 2),
+                "queries": queries,
+                "status": status,
+            }
+    return results
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_baseline(results, path=DEFAULT_BASELINE, times=False):
+    """
+    Store query counts and statuses; wall times only with `times`, as
+    they only mean something on the machine that measured them.
+    """
+    if not times:
+        results = {
+            name: {k: v for k, v in result.items() if k != "ms"}
+            for name, result in results.items()
+        }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(results, baseline, time_tolerance=0.5):
+    """
+    Compare against `baseline`. Any extra query is a regression; wall time,
+    where the baseline has one, may grow by `time_tolerance` (0.5 = 50%)
+    before it counts.
+    """
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["queries"] > base["queries"]:
+            found.append(f"{name}: {result['queries']} queries (baseline {base['queries']})")
+        if "ms" in base and result["ms"] > base["ms"] * (1 + time_tolerance):
+            found.append(f"{name}: {result['ms']}ms (baseline {base['ms']}ms)")
+    return found
@@ -0,0 +1,178 @@
+import threading
+import time
+from collections import Counter
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+_MISSING = object()
+
+GROUPS = ("dashboard", "newspapers", "customer")
+
+# hit/miss counts are kept per process and added to the shared counters
+# at most this often, so a read costs one cache get. Workers flushing at
+# once may lose an increment: the totals are approximate.
+STATS_FLUSH_SECONDS = 30
+
+
+# ============================
+# KEYS
+# ============================
+def day_key(day):
+    return f"dashboard:day:{day.isoformat()}"
+
+
+def month_key(day):
+    return f"dashboard:month:{day.replace(day=1).isoformat()}"
+
+
+PENDING_KEY = "dashboard:pending"
+TOP_PENDING_KEY = "dashboard:top"
+NEWSPAPERS_ALL_KEY = "newspapers:all"
+NEWSPAPERS_ACTIVE_KEY = "newspapers:active"
+
+
+def customer_key(customer_id):
+    return f"customer:{customer_id}:summary"
+
+
+# changes whenever today's roster may have; see customers.roster
+ROSTER_VERSION_KEY = "roster:version"
+
+# bumped at once by roster_changed(), so this process sees its own
+# uncommitted changes; other workers only see the shared token after commit
+_roster_changes = {"count": 0}
+
+
+# ============================
+# READS
+# ============================
+_counts = Counter()
+_counts_lock = threading.Lock()
+_flushed_at = [time.monotonic()]
+
+
+def _count(group, outcome):
+    with _counts_lock:
+        _counts[f"stats:{group}:{outcome}"] += 1
+        if time.monotonic() - _flushed_at[0] < STATS_FLUSH_SECONDS:
+            return
+    _flush_counts()
+
+
+def _flush_counts():
+    with _counts_lock:
+        pending = dict(_counts)
+        _counts.clear()
+        _flushed_at[0] = time.monotonic()
+
+    for key, n in pending.items():
+        try:
+            cache.incr(key, n)
+        except ValueError:
+            # first hit/miss of this kind, or the counter expired
+            if not cache.add(key, n, timeout=None):
+                cache.incr(key, n)
+
+
+def cached(group, key, compute):
+    """Return the cached value for `key`, computing and storing it on a miss."""
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        _count(group, "hits")
+        return value
+
+    _count(group, "misses")
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+def roster_version():
+    """The current roster token: shared by every worker, plus local changes."""
+    version = cache.get(ROSTER_VERSION_KEY)
+    if version is None:
+        cache.add(ROSTER_VERSION_KEY, uuid4().hex, timeout=None)
+        version = cache.get(ROSTER_VERSION_KEY)
+    return version, _roster_changes["count"]
+
+
+def stats():
+    """
+    `{group: {"hits": n, "misses": n}}`, summed over all workers up to
+    their last flush, and this process's counts.
+
+    The counters live in the cache itself, so clearing it resets them.
+    """
+    _flush_counts()
+    keys = [f"stats:{g}:{o}" for g in GROUPS for o in ("hits", "misses")]
+    values = cache.get_many(keys)
+    return {
+        g: {o: values.get(f"stats:{g}:{o}", 0) for o in ("hits", "misses")}
+        for g in GROUPS
+    }
+
+
+def reset_stats():
+    with _counts_lock:
+        _counts.clear()
+    cache.delete_many([f"stats:{g}:{o}" for g in GROUPS for o in ("hits", "misses")])
+
+
+# ============================
+# INVALIDATION
+# ============================
+def invalidate(*keys):
+    """
+    Drop `keys` once the current transaction commits, so a concurrent
+    request cannot re-cache the rows we are about to replace.
+    """
+    keys = list(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def deliveries_changed(day):
+    invalidate(day_key(day))
+
+
+def billing_changed(customer_id, day):
+    """An invoice or payment for `customer_id`, rolled up under `day`, changed."""
+    invalidate(
+        PENDING_KEY,
+        TOP_PENDING_KEY,
+        month_key(day),
+        customer_key(customer_id),
+    )
+
+
+def billing_changed_many(changes):
+    """`billing_changed` for many `(customer_id, day)` pairs at once."""
+    invalidate(
+        PENDING_KEY,
+        TOP_PENDING_KEY,
+        *{month_key(day) for _, day in changes},
+        *{customer_key(customer_id) for customer_id, _ in changes},
+    )
+
+
+def customer_changed(customer_id):
+    invalidate(customer_key(customer_id), TOP_PENDING_KEY)
+
+
+def newspapers_changed():
+    invalidate(NEWSPAPERS_ALL_KEY, NEWSPAPERS_ACTIVE_KEY)
+
+
+def roster_changed():
+    """A subscription, customer or paper changed; in-process rosters are stale."""
+    _roster_changes["count"] += 1
+    transaction.on_commit(
+        lambda: cache.set(ROSTER_VERSION_KEY, uuid4().hex, timeout=None)
+    )
+
+
+def clear():
+    """After a full rollup or ledger rebuild, when any key may be stale."""
+    transaction.on_commit(cache.clear)
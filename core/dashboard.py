@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from customers.ledger import top_pending as ledger_top_pending
+from delivery.sheet import exceptions_only
+from . import caching, rollups
+from .middleware import instrument_thread
+from .models import DailyRollup, MonthlyRollup
+
+
+# =============================
+# 1️⃣ TODAY DELIVERY SNAPSHOT
+# =============================
+def today_snapshot(today):
+    if exceptions_only():
+        # nothing is stored for an untouched day; derive it
+        row = DailyRollup(date=today, **rollups.delivery_totals(today))
+    else:
+        row = DailyRollup.objects.filter(date=today).first() or DailyRollup(date=today)
+    return {
+        "total_today": row.deliveries_total,
+        "delivered_today": row.delivered_count,
+        "not_delivered_today": row.not_delivered_count,
+        "holiday_today": row.holiday_count,
+        "today_value": row.delivered_value,
+    }
+
+
+# =============================
+# 2️⃣ TOTAL PENDING (GLOBAL)
+# =============================
+def global_pending(today):
+    totals = MonthlyRollup.objects.aggregate(
+        billed=Sum("billed_amount"),
+        paid=Sum("paid_amount"),
+    )
+    return {"total_pending": (totals["billed"] or 0) - (totals["paid"] or 0)}
+
+
+# =============================
+# 3️⃣ TOP PENDING CUSTOMERS
+# =============================
+def top_pending(today):
+    return {
+        "top_pending": [
+            {
+                "name": row.customer.name,
+                "phone": row.customer.phone,
+                "pending": row.balance,
+            }
+            for row in ledger_top_pending(10)
+        ]
+    }
+
+
+# =============================
+# 4️⃣ INVOICE HEALTH (THIS MONTH)
+# =============================
+def month_health(today):
+    month_start = today.replace(day=1)
+    row = (
+        MonthlyRollup.objects.filter(month=month_start).first()
+        or MonthlyRollup(month=month_start)
+    )
+    return {
+        "billed_month": row.billed_amount,
+        "paid_month": row.paid_amount,
+        "pending_month": row.billed_amount - row.paid_amount,
+    }
+
+
+# section -> its cache key for a given day
+SECTIONS = (
+    (today_snapshot, caching.day_key),
+    (global_pending, lambda today: caching.PENDING_KEY),
+    (top_pending, lambda today: caching.TOP_PENDING_KEY),
+    (month_health, caching.month_key),
+)
+
+
+def _cached_section(section, key, today):
+    return caching.cached("dashboard", key(today), lambda: section(today))
+
+
+def build_context(today):
+    context = {"today": today}
+    for section, key in SECTIONS:
+        context.update(_cached_section(section, key, today))
+    return context
+
+
+# one pool per process, reused by every request. Without it, a WSGI
+# worker runs the async view on a fresh event loop whose default executor
+# starts new threads each time, and every connection they open leaks.
+# Its threads are the only ones holding dashboard connections, so
+# persistent connections stay bounded by the pool size.
+_executor = ThreadPoolExecutor(max_workers=len(SECTIONS), thread_name_prefix="dashboard")
+
+
+def _on_own_connection(section, key):
+    # each pool thread holds its own connection; apply the normal
+    # CONN_MAX_AGE rules to it as a request would, so without persistent
+    # connections it is closed as soon as the section finishes
+    def run(today):
+        close_old_connections()
+        try:
+            with instrument_thread():
+                return _cached_section(section, key, today)
+        finally:
+            close_old_connections()
+    return run
+
+
+async def abuild_context(today):
+    """
+    Run every section at once, each in a pool thread on its own DB
+    connection, so the dashboard costs about as much as its slowest query.
+    """
+    results = await asyncio.gather(*[
+        sync_to_async(
+            _on_own_connection(section, key), thread_sensitive=False, executor=_executor,
+        )(today)
+        for section, key in SECTIONS
+    ])
+    context = {"today": today}
+    for result in results:
+        context.update(result)
+    return context
@@ -0,0 +1,88 @@
+import csv
+import zlib
+
+from delivery.models import Delivery
+from invoice.models import Invoice, InvoiceDelivery, Payment
+
+
+ROWS_PER_CHUNK = 1000
+
+
+class _Echo:
+    """csv.writer target that hands each formatted line straight back."""
+
+    def write(self, value):
+        return value
+
+
+# name -> (queryset, field used for the date range, exported columns)
+DATASETS = {
+    "deliveries": (
+        Delivery.objects.order_by("id"),
+        "date",
+        ["id", "date", "customer_id", "customer__name", "subscription_id",
+         "newspaper_id", "newspaper__name", "price", "status", "invoice_id",
+         "created_at"],
+    ),
+    "invoices": (
+        Invoice.objects.order_by("id"),
+        "created_at__date",
+        ["id", "customer_id", "customer__name", "from_date", "to_date",
+         "total_amount", "is_locked", "created_at", "created_by__username"],
+    ),
+    "invoice-deliveries": (
+        InvoiceDelivery.objects.order_by("id"),
+        "date",
+        ["id", "invoice_id", "delivery_id", "date", "newspaper_id", "delivery_price"],
+    ),
+    "payments": (
+        Payment.objects.order_by("id"),
+        "payment_date",
+        ["id", "invoice_id", "invoice__customer_id", "amount", "payment_date",
+         "mode", "notes", "created_at", "created_by__username"],
+    ),
+}
+
+
+def export_rows(dataset, start=None, end=None):
+    """Return `(header, row_iterator)` for `dataset` filtered to [start, end]."""
+    queryset, date_field, columns = DATASETS[dataset]
+    if start:
+        queryset = queryset.filter(**{f"{date_field}__gte": start})
+    if end:
+        queryset = queryset.filter(**{f"{date_field}__lte": end})
+
+    rows = queryset.values_list(*columns).iterator(chunk_size=ROWS_PER_CHUNK * 2)
+    return columns, rows
+
+
+def stream_csv(header, rows, compress=False):
+    """
+    Yield CSV bytes in chunks of `ROWS_PER_CHUNK` lines, optionally gzipped.
+
+    The header goes out before the first row is fetched and rows are pulled
+    lazily from `rows`, so memory stays flat whatever the export size.
+    """
+    writer = csv.writer(_Echo())
+    gzipper = zlib.compressobj(wbits=31) if compress else None
+
+    def emit(text):
+        data = text.encode("utf-8")
+        if not gzipper:
+            return data
+        # sync-flush so every chunk reaches the client right away
+        return gzipper.compress(data) + gzipper.flush(zlib.Z_SYNC_FLUSH)
+
+    yield emit(writer.writerow(header))
+
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow(row))
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield emit("".join(buffer))
+            buffer = []
+
+    tail = emit("".join(buffer))
+    if gzipper:
+        tail += gzipper.flush()
+    yield tail
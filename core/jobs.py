@@ -0,0 +1,153 @@
+"""
+Background jobs without a broker.
+
+A task is a function registered under a name with @task, in an app's
+`tasks.py` (found at startup). `enqueue()` stores a Job row with the
+task's keyword arguments; `manage.py run_jobs` claims due rows with
+SELECT ... FOR UPDATE SKIP LOCKED and runs them. A task gets the Job
+first, may call `job.report()` between transactions to show progress,
+and returns a JSON-serialisable result.
+
+A task registered with `needs_user=True` writes rows owned by the user
+who queued it: `enqueue()` refuses it without a user, and it fails at
+once if that user has since been deleted.
+
+A task that raises is retried with a doubling delay until `max_attempts`;
+raising JobFailed fails it at once. A job whose worker stops sending
+heartbeats is handed out again.
+"""
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+
+TASKS = {}
+# kinds that cannot run without Job.created_by
+NEEDS_USER = set()
+
+
+class JobFailed(Exception):
+    """Raised by a task to fail its job without retrying."""
+
+
+def task(name, needs_user=False):
+    def register(func):
+        TASKS[name] = func
+        if needs_user:
+            NEEDS_USER.add(name)
+        return func
+    return register
+
+
+def enqueue(kind, user=None, max_attempts=3, **args):
+    if kind not in TASKS:
+        raise ValueError(f"Unknown job kind {kind!r}")
+    if kind in NEEDS_USER and user is None:
+        raise ValueError(f"Job kind {kind!r} needs a user")
+    return Job.objects.create(
+        kind=kind, args=args, created_by=user, max_attempts=max_attempts,
+    )
+
+
+def claim(worker):
+    """Mark the next due PENDING job RUNNING for `worker` and return it, or None."""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(status=Job.Status.PENDING, run_after__lte=now)
+            .order_by("run_after", "id")
+            .first()
+        )
+        if job is None:
+            return None
+
+        job.status = Job.Status.RUNNING
+        job.attempts += 1
+        job.worker = worker
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=[
+            "status", "attempts", "worker", "started_at", "heartbeat_at",
+        ])
+    return job
+
+
+def run(job):
+    """Run a claimed job and record it DONE, FAILED or PENDING for another attempt."""
+    func = TASKS.get(job.kind)
+    try:
+        if func is None:
+            raise JobFailed(f"Unknown job kind {job.kind!r}")
+        if job.kind in NEEDS_USER and job.created_by_id is None:
+            # the user was deleted after queueing; retrying cannot help
+            raise JobFailed("The user who queued this job no longer exists")
+        result = func(job, **job.args)
+    except Exception as exc:
+        job.error = traceback.format_exc()
+        if isinstance(exc, JobFailed) or job.attempts >= job.max_attempts:
+            job.status = Job.Status.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = Job.Status.PENDING
+            delay = settings.JOB_RETRY_SECONDS * 2 ** (job.attempts - 1)
+            job.run_after = timezone.now() + timedelta(seconds=delay)
+        job.save(update_fields=["status", "error", "finished_at", "run_after"])
+        return job
+
+    job.status = Job.Status.DONE
+    job.result = result
+    job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "result", "error", "finished_at"])
+    return job
+
+
+def retry(job):
+    """Queue a FAILED job again with a fresh set of attempts."""
+    return Job.objects.filter(pk=job.pk, status=Job.Status.FAILED).update(
+        status=Job.Status.PENDING,
+        attempts=0,
+        run_after=timezone.now(),
+        finished_at=None,
+    )
+
+
+def heartbeat(worker_prefix):
+    """Refresh RUNNING jobs held by workers whose name starts with `worker_prefix`."""
+    return Job.objects.filter(
+        status=Job.Status.RUNNING, worker__startswith=worker_prefix,
+    ).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale():
+    """
+    Hand RUNNING jobs without a heartbeat for JOB_STALE_SECONDS back out,
+    or fail them if that was their last attempt. Returns the count.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.Status.RUNNING,
+        heartbeat_at__lt=now - timedelta(seconds=settings.JOB_STALE_SECONDS),
+    )
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Job.Status.FAILED,
+        error="Worker stopped responding",
+        finished_at=now,
+    )
+    return failed + stale.update(status=Job.Status.PENDING, run_after=now)
+
+
+def output_path(job, suffix):
+    """Where a job writes a file it produces; served by the job page."""
+    directory = Path(settings.JOB_OUTPUT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"job_{job.id}{suffix}"
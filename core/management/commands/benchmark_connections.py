@@ -0,0 +1,89 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+MODES = ("none", "persistent", "pool")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-request latency with and without connection reuse. "
+        "Each simulated request opens (or reuses) a connection, runs the "
+        "query and goes through Django's end-of-request connection handling. "
+        "OPENS counts new connections (pool checkouts in pool mode). "
+        "Point DB_* at a local Postgres to measure setup cost in isolation."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--query", default="SELECT 1")
+        parser.add_argument("--database", default="default")
+        parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated subset of: none, persistent, pool.")
+
+    def _wrapper(self, mode, alias):
+        base = connections[alias]
+        settings_dict = {
+            **base.settings_dict,
+            "OPTIONS": {k: v for k, v in base.settings_dict["OPTIONS"].items() if k != "pool"},
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": False,
+        }
+        if mode == "persistent":
+            settings_dict["CONN_MAX_AGE"] = 600
+            settings_dict["CONN_HEALTH_CHECKS"] = True
+        elif mode == "pool":
+            settings_dict["OPTIONS"]["pool"] = {"min_size": 1, "max_size": 2}
+
+        # registered as a real alias: connection_created receivers look it up
+        bench_alias = f"bench_{mode}"
+        connections.settings[bench_alias] = settings_dict
+        return connections[bench_alias]
+
+    def handle(self, *args, **options):
+        modes = [m.strip() for m in options["modes"].split(",") if m.strip()]
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(f"{'MODE':<12}{'MEDIAN MS':>12}{'P95 MS':>10}{'OPENS':>10}")
+        for mode in modes:
+            conn = self._wrapper(mode, options["database"])
+            try:
+                timings, opens = self._measure(conn, options["requests"], options["query"])
+            except Exception as exc:
+                self.stdout.write(f"{mode:<12}skipped: {exc}")
+                continue
+            finally:
+                conn.close()
+                if mode == "pool":
+                    conn.close_pool()
+                del connections[conn.alias]
+                connections.settings.pop(conn.alias)
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            self.stdout.write(
+                f"{mode:<12}{statistics.median(timings) * 1000:>12.2f}"
+                f"{p95 * 1000:>10.2f}{opens:>10}"
+            )
+
+    def _measure(self, conn, requests, query):
+        timings = []
+        opens = 0
+        for _ in range(requests):
+            start = time.perf_counter()
+
+            # what close_old_connections does on request_started/finished
+            conn.close_if_unusable_or_obsolete()
+            if conn.connection is None:
+                opens += 1
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                cursor.fetchall()
+            conn.close_if_unusable_or_obsolete()
+
+            timings.append(time.perf_counter() - start)
+        return timings, opens
@@ -0,0 +1,71 @@
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from core import dashboard
+from core.benchmarks import bench_user
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare dashboard latency: sections run one after another, "
+        "sections run concurrently, and the full /dashboard/ request "
+        "through the WSGI and ASGI handlers. Run it against the real "
+        "database; the gain grows with per-query round-trip time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--cached", action="store_true",
+            help="Keep the shared cache on; by default every section hits the database.",
+        )
+
+    def handle(self, *args, **options):
+        if options["cached"]:
+            return self._run(options)
+        with override_settings(CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}
+        }):
+            return self._run(options)
+
+    def _run(self, options):
+        today = date.today()
+        user = bench_user()
+
+        wsgi = Client()
+        wsgi.force_login(user)
+        asgi = AsyncClient()
+        asgi.force_login(user)
+
+        # one long-lived loop, as under an ASGI server: its worker threads
+        # and their connections are reused between requests
+        with asyncio.Runner() as runner:
+            cases = [
+                ("sections sequential", lambda: dashboard.build_context(today)),
+                ("sections concurrent", lambda: runner.run(dashboard.abuild_context(today))),
+                ("request via WSGI", lambda: wsgi.get("/dashboard/")),
+                ("request via ASGI", lambda: runner.run(asgi.get("/dashboard/"))),
+            ]
+            self._report(cases, options["repeat"])
+
+    def _report(self, cases, repeat):
+        self.stdout.write(f"{'PATH':<24}{'MEDIAN MS':>12}{'P95 MS':>10}")
+        for name, call in cases:
+            call()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                call()
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"{name:<24}{statistics.median(timings) * 1000:>12.2f}{p95 * 1000:>10.2f}"
+            )
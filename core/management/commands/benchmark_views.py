@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main views and count their SQL queries, failing when they "
+        "regress past the stored baseline. Seed data first with seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("names", nargs="*", help="Scenarios to run (default: all).")
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--baseline", default=str(benchmarks.DEFAULT_BASELINE))
+        parser.add_argument(
+            "--time-tolerance", type=float, default=0.5,
+            help="Allowed wall-time growth over baseline (0.5 = 50%%).",
+        )
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Store these results as the new baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--with-times", action="store_true",
+            help="Also store wall times in the baseline (only comparable on this machine).",
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options["names"]) - set(benchmarks.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        results = benchmarks.run(options["names"] or None, repeat=options["repeat"])
+        baseline = benchmarks.load_baseline(options["baseline"])
+
+        self.stdout.write(f"{'SCENARIO':<24}{'MS':>10}{'QUERIES':>10}{'BASE MS':>10}{'BASE Q':>8}")
+        for name, result in results.items():
+            base = baseline.get(name, {})
+            self.stdout.write(
+                f"{name:<24}{result['ms']:>10}{result['queries']:>10}"
+                f"{base.get('ms', '-'):>10}{base.get('queries', '-'):>8}"
+            )
+
+        failed = [name for name, result in results.items() if result["status"] >= 400]
+        if failed:
+            raise CommandError(f"Scenarios returned errors: {', '.join(failed)}")
+
+        if options["update_baseline"]:
+            benchmarks.save_baseline(
+                {**baseline, **results}, options["baseline"], times=options["with_times"],
+            )
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['baseline']}"))
+            return
+
+        found = benchmarks.regressions(results, baseline, options["time_tolerance"])
+        if found:
+            raise CommandError("Regressions:\n  " + "\n  ".join(found))
+
+        self.stdout.write(self.style.SUCCESS("No regressions"))
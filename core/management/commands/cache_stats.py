@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core import caching
+
+
+class Command(BaseCommand):
+    help = "Show shared cache hit/miss counters per group."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing.")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'GROUP':<14}{'HITS':>10}{'MISSES':>10}{'HIT RATE':>10}")
+        for group, counts in caching.stats().items():
+            total = counts["hits"] + counts["misses"]
+            rate = f"{counts['hits'] / total:.0%}" if total else "-"
+            self.stdout.write(
+                f"{group:<14}{counts['hits']:>10}{counts['misses']:>10}{rate:>10}"
+            )
+
+        if options["reset"]:
+            caching.reset_stats()
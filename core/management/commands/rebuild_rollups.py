@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import caching, rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard daily/monthly rollup tables from source rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="Only rebuild from this month onward (YYYY-MM-DD).",
+        )
+
+    def handle(self, *args, **options):
+        since = options["since"]
+        if since:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+
+        written = rollups.rebuild(since=since)
+        caching.clear()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} daily rollup rows"))
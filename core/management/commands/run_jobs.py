@@ -0,0 +1,77 @@
+import os
+import signal
+import socket
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. Keeps polling until stopped (SIGTERM "
+        "lets running jobs finish), or with --once exits when none are due."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=1, help="Jobs run at the same time.")
+        parser.add_argument("--once", action="store_true", help="Exit when no job is due.")
+        parser.add_argument(
+            "--poll", type=float, default=settings.JOB_POLL_SECONDS,
+            help="Seconds between checks of an empty queue.",
+        )
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1")
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} jobs left by stopped workers")
+
+        threads = [
+            threading.Thread(
+                target=self._work,
+                args=(f"{prefix}:{n}", stop, options["once"], options["poll"]),
+            )
+            for n in range(options["concurrency"])
+        ]
+        for thread in threads:
+            thread.start()
+
+        # heartbeats keep this process's jobs from being requeued as stale
+        beat = max(settings.JOB_STALE_SECONDS / 3, 1)
+        try:
+            while any(thread.is_alive() for thread in threads):
+                jobs.heartbeat(prefix + ":")
+                jobs.requeue_stale()
+                for thread in threads:
+                    thread.join(beat / len(threads))
+        finally:
+            connection.close()
+
+    def _work(self, name, stop, once, poll):
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                job = jobs.claim(name)
+                if job is None:
+                    if once:
+                        return
+                    stop.wait(poll)
+                    continue
+
+                self.stdout.write(f"{name} job #{job.id} {job.kind} (attempt {job.attempts})")
+                job = jobs.run(job)
+                style = self.style.SUCCESS if job.status == job.Status.DONE else self.style.WARNING
+                self.stdout.write(style(f"{name} job #{job.id} {job.status}"))
+        finally:
+            connection.close()
@@ -0,0 +1,86 @@
+import signal
+import threading
+import traceback
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core import scheduler
+
+
+ROUTINES = ("deliveries", "billing")
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate tomorrow's deliveries and run the billing cycles due, "
+        "catching up any missed days. Run it nightly from cron, or keep it "
+        "running with --loop to fire at SCHEDULER_HOUR."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running; work once a day at SCHEDULER_HOUR.")
+        parser.add_argument("--since", help="Redo every day from this date (YYYY-MM-DD) instead of the checkpoint.")
+        parser.add_argument("--only", choices=ROUTINES, help="Run one routine.")
+
+    def handle(self, *args, **options):
+        try:
+            since = date.fromisoformat(options["since"]) if options["since"] else None
+        except ValueError:
+            raise CommandError("--since must be YYYY-MM-DD")
+        routines = [options["only"]] if options["only"] else ROUTINES
+
+        if not options["loop"]:
+            self._tick(routines, since)
+            return
+
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+        # catch up straight away, then once a day off peak
+        self._tick(routines, since)
+        while not stop.wait(self._seconds_to_next_run()):
+            try:
+                self._tick(routines, None)
+            except Exception:
+                # checkpoints hold; the failed days are retried next time
+                self.stderr.write(traceback.format_exc())
+
+    def _seconds_to_next_run(self):
+        now = timezone.localtime()
+        at = timezone.make_aware(datetime.combine(now.date(), time(settings.SCHEDULER_HOUR)))
+        if at <= now:
+            at += timedelta(days=1)
+        return (at - now).total_seconds()
+
+    def _tick(self, routines, since):
+        # after a day asleep the server has likely dropped the connection;
+        # the advisory lock must be taken on a live session
+        close_old_connections()
+        today = timezone.localdate()
+        try:
+            with scheduler.exclusive():
+                if "deliveries" in routines:
+                    days, result = scheduler.generate_ahead(today, since)
+                    if days:
+                        self.stdout.write(
+                            f"Deliveries: {days} days, {result.created} created, {result.skipped} skipped"
+                        )
+                    else:
+                        self.stdout.write("Deliveries: up to date")
+
+                if "billing" in routines:
+                    for run in scheduler.bill_cycles(today, since):
+                        self.stdout.write(
+                            f"Billing day {run.billing_day} up to {run.cutoff_date}: "
+                            f"{run.customers_billed} invoices, ₹{run.total_amount}"
+                        )
+        except scheduler.AlreadyRunning as exc:
+            self.stderr.write(str(exc))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f"Scheduler done for {today}"))
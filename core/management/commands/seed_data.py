@@ -0,0 +1,162 @@
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core import rollups
+from core.benchmarks import bench_user
+from customers import ledger
+from customers.models import Customer, Subscription
+from delivery.generation import generate_range
+from delivery.models import Delivery
+from delivery.sheet import exceptions_only
+from delivery.status import apply_filter
+from invoice.billing import run_billing
+from invoice.models import BillingRun, Invoice, Payment
+from newspaper.models import NewsPaper, NewsPaperPrice
+
+
+AREAS = ["North", "South", "East", "West", "Central"]
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic customers, subscriptions, deliveries, invoices and payments for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customers", type=int, default=1000)
+        parser.add_argument("--days", type=int, default=90, help="Days of delivery history ending today.")
+        parser.add_argument("--newspapers", type=int, default=5)
+        parser.add_argument("--paid-ratio", type=float, default=0.7, help="Share of invoices that get a payment.")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--force", action="store_true", help="Allow seeding when DEBUG is off.")
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError("Refusing to seed with DEBUG off; pass --force if this is a scratch database")
+
+        rng = random.Random(options["seed"])
+        today = date.today()
+        start = today - timedelta(days=options["days"] - 1)
+        user = bench_user()
+
+        with transaction.atomic():
+            offset = NewsPaper.objects.count()
+            papers = NewsPaper.objects.bulk_create([
+                NewsPaper(
+                    name=f"Bench Paper {offset + i}",
+                    price_per_day=Decimal(rng.choice(["4.00", "5.50", "6.00", "7.50", "10.00"])),
+                )
+                for i in range(options["newspapers"])
+            ])
+            # a Sunday price throughout and a rise halfway through the history
+            midway = start + timedelta(days=max(options["days"] // 2, 1))
+            NewsPaperPrice.objects.bulk_create([
+                NewsPaperPrice(
+                    newspaper=paper,
+                    effective_from=day,
+                    price=paper.price_per_day + rise,
+                    sunday_price=paper.price_per_day + rise + 2,
+                )
+                for paper in papers
+                for day, rise in ((start, 0), (midway, Decimal("0.50")))
+            ])
+
+            offset = Customer.objects.count()
+            customers = []
+            for i in range(options["customers"]):
+                phone = f"+91 9{rng.randrange(10**8, 10**9)}"
+                cust = Customer(
+                    name=f"Bench Customer {offset + i}",
+                    phone=phone,
+                    area=rng.choice(AREAS),
+                )
+                # bulk_create bypasses save(), which fills phone_digits
+                cust.phone_digits = phone[4:]
+                customers.append(cust)
+            customers = Customer.objects.bulk_create(customers, batch_size=1000)
+
+            Subscription.objects.bulk_create([
+                Subscription(
+                    customer=cust,
+                    newspaper=rng.choice(papers),
+                    start_date=start + timedelta(days=rng.randrange(0, max(options["days"] // 3, 1))),
+                )
+                for cust in customers
+            ], batch_size=1000)
+
+        if exceptions_only():
+            self._seed_exceptions(rng, customers, start, today)
+        else:
+            result = generate_range(start, today)
+            self.stdout.write(f"Deliveries: {result.created} created")
+
+            # ~5% of deliveries are missed, split between not-delivered and holidays
+            delivery_ids = list(
+                Delivery.objects
+                .filter(date__gte=start, customer__in=customers)
+                .values_list("id", flat=True)
+            )
+            missed = rng.sample(delivery_ids, len(delivery_ids) // 20)
+            half = len(missed) // 2
+            Delivery.objects.filter(id__in=missed[:half]).update(status=Delivery.Status.NOT_DELIVERED, updated_at=timezone.now())
+            Delivery.objects.filter(id__in=missed[half:]).update(status=Delivery.Status.HOLIDAY, updated_at=timezone.now())
+
+        # bill every completed month in the window
+        cutoff = today.replace(day=1) - timedelta(days=1)
+        cutoffs = []
+        while cutoff >= start:
+            cutoffs.append(cutoff)
+            cutoff = cutoff.replace(day=1) - timedelta(days=1)
+        for cutoff in reversed(cutoffs):
+            run_billing(BillingRun.objects.create(cutoff_date=cutoff, created_by=user))
+
+        invoices = list(
+            Invoice.objects
+            .filter(customer__in=customers)
+            .values_list("id", "total_amount", "to_date")
+        )
+        Payment.objects.bulk_create([
+            Payment(
+                invoice_id=invoice_id,
+                amount=total if rng.random() < 0.8 else (total / 2).quantize(Decimal("0.01")),
+                payment_date=to_date + timedelta(days=rng.randrange(1, 10)),
+                mode=rng.choice(["CASH", "UPI"]),
+                created_by=user,
+            )
+            for invoice_id, total, to_date in invoices
+            if total > 0 and rng.random() < options["paid_ratio"]
+        ], batch_size=1000)
+
+        # bulk inserts skip signals and ledger posting; rebuild both
+        rollups.rebuild()
+        ledger.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(customers)} customers, {len(invoices)} invoices over {options['days']} days"
+        ))
+
+    def _seed_exceptions(self, rng, customers, start, today):
+        """The same ~5% of missed days, stored as exceptions one day at a time."""
+        starts = dict(
+            Subscription.objects
+            .filter(customer__in=customers)
+            .values_list("customer_id", "start_date")
+        )
+        stored = 0
+        day = start
+        while day <= today:
+            subscribed = [c for c, s in starts.items() if s <= day]
+            missed = rng.sample(subscribed, len(subscribed) // 20)
+            half = len(missed) // 2
+            for status, ids in (
+                (Delivery.Status.NOT_DELIVERED, missed[:half]),
+                (Delivery.Status.HOLIDAY, missed[half:]),
+            ):
+                if ids:
+                    stored += apply_filter(day, status, customer_ids=ids).updated
+            day += timedelta(days=1)
+        self.stdout.write(f"Deliveries: {stored} exceptions stored")
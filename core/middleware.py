@@ -0,0 +1,138 @@
+import heapq
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger("adminlte.sql")
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+_current_recorder = ContextVar("sql_recorder", default=None)
+
+
+def query_shape(sql):
+    """Parametrized SQL with IN-lists collapsed, so equal shapes compare equal."""
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+class _QueryRecorder:
+    def __init__(self, keep_slowest):
+        self.count = 0
+        self.total = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+        self.keep_slowest = keep_slowest
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._record(elapsed, sql)
+
+    def _record(self, elapsed, sql):
+        self.count += 1
+        self.total += elapsed
+        self.shapes[query_shape(sql)] += 1
+
+        entry = (elapsed, self.count, sql)
+        if len(self.slowest) < self.keep_slowest:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def repeated(self, threshold):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+@contextmanager
+def instrument_thread():
+    """
+    Attach the sampled request's recorder, if any, to this thread's
+    connections. For work a view hands off to other threads.
+    """
+    recorder = _current_recorder.get()
+    with ExitStack() as stack:
+        if recorder is not None:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(recorder))
+        yield
+
+
+@contextmanager
+def record_queries(keep_slowest=0):
+    """
+    Record every query run inside the block, including those of threads
+    it hands work to through instrument_thread(). Yields the recorder.
+    """
+    recorder = _QueryRecorder(keep_slowest)
+    token = _current_recorder.set(recorder)
+    try:
+        with instrument_thread():
+            yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+class SQLInstrumentationMiddleware:
+    """
+    Record query count, DB time and slowest statements for a sample of
+    requests.
+
+    Sampled responses get a `Server-Timing: db;dur=...` header. Requests
+    slower than `SQL_SLOW_REQUEST_MS`, or that repeat one query shape at
+    least `SQL_N_PLUS_ONE_THRESHOLD` times (a likely N+1), are logged to
+    the `adminlte.sql` logger. Unsampled requests only pay for one
+    `random()` call.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.SQL_INSTRUMENTATION_SAMPLE_RATE
+        self.slow_ms = settings.SQL_SLOW_REQUEST_MS
+        self.n_plus_one = settings.SQL_N_PLUS_ONE_THRESHOLD
+        self.keep_slowest = settings.SQL_KEEP_SLOWEST
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        with record_queries(self.keep_slowest) as recorder:
+            response = self.get_response(request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.total * 1000
+
+        response["Server-Timing"] = (
+            f'db;dur={db_ms:.1f};desc="{recorder.count} queries", '
+            f"app;dur={elapsed_ms:.1f}"
+        )
+
+        repeated = recorder.repeated(self.n_plus_one)
+        if elapsed_ms >= self.slow_ms or repeated:
+            self._log(request, elapsed_ms, db_ms, recorder, repeated)
+
+        return response
+
+    def _log(self, request, elapsed_ms, db_ms, recorder, repeated):
+        lines = [
+            f"{request.method} {request.path}: {elapsed_ms:.0f}ms total, "
+            f"{db_ms:.0f}ms in {recorder.count} queries"
+        ]
+        for seconds, _, sql in sorted(recorder.slowest, reverse=True):
+            lines.append(f"  slow {seconds * 1000:.1f}ms: {sql[:300]}")
+        for shape, n in repeated:
+            lines.append(f"  possible N+1 ({n}x): {shape[:300]}")
+        logger.warning("\n".join(lines))
@@ -1,3 +1,141 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class RollupFields(models.Model):
+    """
+    Pre-aggregated counters read by the dashboard.
+
+    `paid_amount` is keyed by the day the *invoice* was created, not by
+    payment date, so billed - paid for a period is what is still pending
+    on the invoices cut in that period.
+    """
+
+    deliveries_total = models.PositiveIntegerField(default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    not_delivered_count = models.PositiveIntegerField(default=0)
+    holiday_count = models.PositiveIntegerField(default=0)
+    delivered_value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    billed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class DailyRollup(RollupFields):
+    date = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"Rollup {self.date}"
+
+
+class MonthlyRollup(RollupFields):
+    # always the first day of the month
+    month = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ["-month"]
+
+    def __str__(self):
+        return f"Rollup {self.month:%Y-%m}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by `manage.py run_jobs`.
+
+    Workers claim PENDING rows with SELECT ... FOR UPDATE SKIP LOCKED, so
+    any number of them can poll the table without handing a job out twice.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    # a name registered with core.jobs.task
+    kind = models.CharField(max_length=50)
+    args = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    # not claimed before this; pushed back after a failed attempt
+    run_after = models.DateTimeField(default=timezone.now)
+
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    worker = models.CharField(max_length=100, blank=True)
+    # refreshed by progress reports; a RUNNING job gone quiet is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            # the claim query: next due pending job
+            models.Index(
+                fields=["run_after", "id"],
+                name="job_pending_idx",
+                condition=models.Q(status="PENDING"),
+            ),
+        ]
+
+    def __str__(self):
+        return f"Job #{self.id} {self.kind}"
+
+    def report(self, progress, total=None, message=None):
+        """
+        Record progress for the status page. Written straight away, so call
+        it between transactions rather than inside one.
+        """
+        self.progress = progress
+        fields = {"progress": progress, "heartbeat_at": timezone.now()}
+        if total is not None:
+            self.total = fields["total"] = total
+        if message is not None:
+            self.message = fields["message"] = message[:255]
+        Job.objects.filter(pk=self.pk).update(**fields)
+
+    @property
+    def percent(self):
+        if not self.total:
+            return None
+        return min(100, self.progress * 100 // self.total)
+
+
+class SchedulerCheckpoint(models.Model):
+    """The last day a run_scheduler routine has completed."""
+
+    name = models.CharField(max_length=50, unique=True)
+    last_date = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} done through {self.last_date}"
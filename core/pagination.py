@@ -0,0 +1,165 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse
+
+
+PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds; a cursor needs exact values
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, cls=_CursorEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Cursor does not match this list")
+    return values
+
+
+def _value(obj, field):
+    return reduce(getattr, field.split("__"), obj)
+
+
+def _seek(ordering, values, forward):
+    """
+    Rows strictly after `values` in `ordering` (before, if not `forward`):
+    (a > x) OR (a = x AND b > y) OR ..., led by a redundant a >= x so the
+    planner can range-scan an index on the first column.
+    """
+    terms = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip("-")
+        ascending = (field[0] != "-") == forward
+        term = Q(**{f"{name}__{'gt' if ascending else 'lt'}": values[i]})
+        for prev, value in zip(ordering[:i], values):
+            term &= Q(**{prev.lstrip("-"): value})
+        terms.append(term)
+
+    first = ordering[0].lstrip("-")
+    ascending = (ordering[0][0] != "-") == forward
+    lead = Q(**{f"{first}__{'gte' if ascending else 'lte'}": values[0]})
+    return lead & reduce(lambda a, b: a | b, terms)
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: str | None
+    previous_cursor: str | None
+    params: dict
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _query(self, key, cursor):
+        params = self.params.copy()
+        params.pop("after", None)
+        params.pop("before", None)
+        params[key] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query("after", self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query("before", self.previous_cursor)
+
+
+def paginate(request, queryset, ordering, per_page=PER_PAGE):
+    """
+    One keyset page of `queryset`, ordered by `ordering`, which must end in
+    a unique field (normally "id" or "-id").
+
+    Reads `after` / `before` cursors and an optional `limit` from the query
+    string. Each page is a bounded index seek from the cursor, so page 1000
+    costs the same as page 1 and rows inserted meanwhile do not shift pages.
+    Raises InvalidCursor for a tampered or stale cursor.
+    """
+    ordering = list(ordering)
+    try:
+        per_page = min(int(request.GET.get("limit", per_page)), MAX_PER_PAGE)
+    except ValueError:
+        raise InvalidCursor("limit must be a number")
+    per_page = max(per_page, 1)
+
+    after = request.GET.get("after")
+    before = request.GET.get("before")
+    forward = not before
+
+    try:
+        if forward:
+            rows = queryset.order_by(*ordering)
+            if after:
+                rows = rows.filter(_seek(ordering, decode_cursor(after, len(ordering)), True))
+        else:
+            reverse = [f[1:] if f.startswith("-") else f"-{f}" for f in ordering]
+            rows = queryset.order_by(*reverse).filter(
+                _seek(ordering, decode_cursor(before, len(ordering)), False)
+            )
+    except (TypeError, ValueError, ValidationError) as exc:
+        # values of the wrong type for their field
+        raise InvalidCursor("Cursor does not match this list") from exc
+
+    items = list(rows[:per_page + 1])
+    more = len(items) > per_page
+    items = items[:per_page]
+    if not forward:
+        items.reverse()
+
+    def cursor(obj):
+        return encode_cursor([_value(obj, f.lstrip("-")) for f in ordering])
+
+    has_next = more if forward else True
+    has_previous = bool(after) if forward else more
+    return Page(
+        items=items,
+        next_cursor=cursor(items[-1]) if items and has_next else None,
+        previous_cursor=cursor(items[0]) if items and has_previous else None,
+        params=request.GET,
+    )
+
+
+def wants_json(request):
+    return request.GET.get("format") == "json"
+
+
+def json_page(page, rows):
+    """JSON mode of a paginated list: `rows` are the page items as dicts."""
+    return JsonResponse({
+        "results": rows,
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
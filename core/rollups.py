@@ -0,0 +1,234 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import caching
+from .models import DailyRollup, MonthlyRollup
+
+
+DELIVERY_FIELDS = (
+    "deliveries_total",
+    "delivered_count",
+    "not_delivered_count",
+    "holiday_count",
+    "delivered_value",
+)
+
+STATUS_FIELDS = {
+    "DELIVERED": "delivered_count",
+    "NOT_DELIVERED": "not_delivered_count",
+    "HOLIDAY": "holiday_count",
+}
+
+
+def _month_of(day):
+    return day.replace(day=1)
+
+
+def _local_day(value):
+    return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+
+def _rows_for(day):
+    return (
+        (DailyRollup, {"date": day}),
+        (MonthlyRollup, {"month": _month_of(day)}),
+    )
+
+
+# ============================
+# INCREMENTAL UPDATES
+# ============================
+def bump(day, **deltas):
+    """Add `deltas` to the daily and monthly rows covering `day`."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    changes = {field: F(field) + value for field, value in deltas.items()}
+    changes["updated_at"] = timezone.now()
+
+    for model, key in _rows_for(day):
+        model.objects.get_or_create(**key)
+        model.objects.filter(**key).update(**changes)
+
+
+def delivery_deltas(delivery, sign=1):
+    deltas = {"deliveries_total": sign}
+    field = STATUS_FIELDS.get(delivery.status)
+    if field:
+        deltas[field] = sign
+    if delivery.status == "DELIVERED":
+        deltas["delivered_value"] = sign * delivery.price
+    return deltas
+
+
+def add_delivery(delivery):
+    bump(delivery.date, **delivery_deltas(delivery))
+
+
+def remove_delivery(delivery):
+    bump(delivery.date, **delivery_deltas(delivery, sign=-1))
+
+
+def add_invoice(invoice):
+    bump(_local_day(invoice.created_at), billed_amount=invoice.total_amount)
+
+
+def add_payment(payment):
+    bump(
+        _local_day(payment.invoice.created_at),
+        paid_amount=Decimal(str(payment.amount)),
+    )
+
+
+def delivery_totals(day):
+    """
+    Delivery columns for one day, counted from `Delivery` rows, or from
+    the derived sheet in exception-only storage.
+    """
+    from delivery.models import Delivery
+    from delivery import sheet
+
+    if sheet.exceptions_only():
+        rows = sheet.status_totals(day)
+    else:
+        rows = (
+            Delivery.objects
+            .filter(date=day)
+            .values("status")
+            .annotate(c=Count("id"), v=Sum("price"))
+        )
+
+    values = dict.fromkeys(DELIVERY_FIELDS, 0)
+    for row in rows:
+        values["deliveries_total"] += row["c"]
+        field = STATUS_FIELDS.get(row["status"])
+        if field:
+            values[field] = row["c"]
+        if row["status"] == "DELIVERED":
+            values["delivered_value"] = row["v"] or 0
+    return values
+
+
+@transaction.atomic
+def refresh_deliveries(day):
+    """
+    Recount delivery columns for one day.
+
+    Used after queryset `.update()` calls, which bypass signals. Touches
+    one indexed day of deliveries plus at most 31 daily rollup rows.
+    """
+    values = delivery_totals(day)
+
+    now = timezone.now()
+    DailyRollup.objects.update_or_create(
+        date=day, defaults={**values, "updated_at": now}
+    )
+
+    month = _month_of(day)
+    month_values = DailyRollup.objects.filter(
+        date__year=month.year, date__month=month.month
+    ).aggregate(**{f: Sum(f) for f in DELIVERY_FIELDS})
+    month_values = {k: v or 0 for k, v in month_values.items()}
+    MonthlyRollup.objects.update_or_create(
+        month=month, defaults={**month_values, "updated_at": now}
+    )
+    caching.deliveries_changed(day)
+
+
+# ============================
+# FULL REBUILD
+# ============================
+@transaction.atomic
+def rebuild(since=None):
+    """
+    Recompute every rollup row from the source tables.
+
+    With `since`, only rows from that month onward are rebuilt.
+    Returns the number of daily rows written.
+    """
+    from customers.models import Subscription
+    from delivery.models import Delivery
+    from delivery import sheet
+    from invoice.models import Invoice, Payment
+
+    if since:
+        since = _month_of(since)
+
+    days = defaultdict(lambda: defaultdict(int))
+
+    deliveries = Delivery.objects.all()
+    invoices = Invoice.objects.all()
+    payments = Payment.objects.all()
+    if since:
+        deliveries = deliveries.filter(date__gte=since)
+        invoices = invoices.filter(created_at__date__gte=since)
+        payments = payments.filter(invoice__created_at__date__gte=since)
+
+    if sheet.exceptions_only():
+        # no rows to group: derive each day's sheet up to today
+        day = since or Subscription.objects.aggregate(first=Min("start_date"))["first"]
+        today = timezone.localdate()
+        while day and day <= today:
+            for field, value in delivery_totals(day).items():
+                if value:
+                    days[day][field] += value
+            day += timedelta(days=1)
+    else:
+        for row in (
+            deliveries.order_by()
+            .values("date", "status")
+            .annotate(c=Count("id"), v=Sum("price"))
+        ):
+            day = days[row["date"]]
+            day["deliveries_total"] += row["c"]
+            field = STATUS_FIELDS.get(row["status"])
+            if field:
+                day[field] += row["c"]
+            if row["status"] == "DELIVERED":
+                day["delivered_value"] += row["v"] or 0
+
+    for row in (
+        invoices.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("day")
+        .annotate(t=Sum("total_amount"))
+    ):
+        days[row["day"]]["billed_amount"] += row["t"] or 0
+
+    for row in (
+        payments.order_by()
+        .annotate(day=TruncDate("invoice__created_at"))
+        .values("day")
+        .annotate(t=Sum("amount"))
+    ):
+        days[row["day"]]["paid_amount"] += row["t"] or 0
+
+    months = defaultdict(lambda: defaultdict(int))
+    for day, values in days.items():
+        for field, value in values.items():
+            months[_month_of(day)][field] += value
+
+    if since:
+        DailyRollup.objects.filter(date__gte=since).delete()
+        MonthlyRollup.objects.filter(month__gte=since).delete()
+    else:
+        DailyRollup.objects.all().delete()
+        MonthlyRollup.objects.all().delete()
+
+    DailyRollup.objects.bulk_create(
+        [DailyRollup(date=day, **values) for day, values in days.items()],
+        batch_size=1000,
+    )
+    MonthlyRollup.objects.bulk_create(
+        [MonthlyRollup(month=month, **values) for month, values in months.items()],
+        batch_size=1000,
+    )
+
+    return len(days)
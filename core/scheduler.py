@@ -0,0 +1,111 @@
+"""
+Daily automation, run by `manage.py run_scheduler` off peak.
+
+Each routine keeps a SchedulerCheckpoint of the last day it completed
+and works through every day after it, so a missed night is caught up by
+the next run and running twice does nothing new:
+
+- "deliveries" generates each day's deliveries through tomorrow.
+- "billing" runs, for each day through today, a BillingRun of the
+  customers whose `billing_day` it is, up to the day before. Runs are
+  checkpointed per customer chunk, so a failed one is resumed.
+
+The first run starts at today (or `since`); nothing older is replayed.
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from customers.models import Customer
+from delivery.generation import generate_range
+from invoice.billing import run_billing
+from invoice.models import BillingRun
+from .models import SchedulerCheckpoint
+
+
+SYSTEM_USERNAME = "scheduler"
+
+# key for pg_try_advisory_lock; any constant unique to this lock
+LOCK_KEY = 0x5C4ED
+
+
+class AlreadyRunning(Exception):
+    pass
+
+
+@contextmanager
+def exclusive():
+    """Hold a session advisory lock so only one scheduler works at a time."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [LOCK_KEY])
+        if not cursor.fetchone()[0]:
+            raise AlreadyRunning("Another scheduler is running")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [LOCK_KEY])
+
+
+def system_user():
+    """The user automated billing runs are recorded as created by."""
+    user, created = get_user_model().objects.get_or_create(
+        username=SYSTEM_USERNAME, defaults={"is_active": False},
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=["password"])
+    return user
+
+
+def _first_due(name, today, since=None):
+    """First day routine `name` has still to do."""
+    checkpoint, _ = SchedulerCheckpoint.objects.get_or_create(
+        name=name, defaults={"last_date": (since or today) - timedelta(days=1)},
+    )
+    return since or checkpoint.last_date + timedelta(days=1)
+
+
+def _done(name, day):
+    SchedulerCheckpoint.objects.filter(name=name).update(last_date=day)
+
+
+def generate_ahead(today, since=None):
+    """Generate deliveries through tomorrow. Returns `(days, GenerationResult)`."""
+    target = today + timedelta(days=1)
+    start = _first_due("deliveries", today, since)
+    if start > target:
+        return 0, None
+
+    # generation is idempotent, so a crash between a day's commit and its
+    # checkpoint only repeats that day
+    result = generate_range(
+        start, target,
+        progress=lambda done, total: _done("deliveries", start + timedelta(days=done - 1)),
+    )
+    _done("deliveries", target)
+    return (target - start).days + 1, result
+
+
+def bill_cycles(today, since=None):
+    """Run every billing cycle due through today. Returns the BillingRuns run."""
+    runs = []
+    day = _first_due("billing", today, since)
+    while day <= today:
+        if Customer.objects.filter(is_active=True, billing_day=day.day).exists():
+            cutoff = day - timedelta(days=1)
+            run = (
+                BillingRun.objects
+                .filter(cutoff_date=cutoff, billing_day=day.day)
+                .order_by("-id")
+                .first()
+            ) or BillingRun.objects.create(
+                cutoff_date=cutoff, billing_day=day.day, created_by=system_user(),
+            )
+            # a DONE run returns at once; a crashed one resumes
+            runs.append(run_billing(run))
+        _done("billing", day)
+        day += timedelta(days=1)
+    return runs
@@ -0,0 +1,101 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from customers.models import Customer, Subscription
+from delivery.models import Delivery
+from delivery.sheet import exceptions_only
+from invoice.models import Invoice, Payment
+from newspaper.models import NewsPaper, NewsPaperPrice
+
+from . import caching, rollups
+
+
+# ============================
+# ROLLUP MAINTENANCE
+# ============================
+@receiver(post_save, sender=Delivery)
+def delivery_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    # a stored exception replaces a derived delivery rather than adding one
+    if created and not exceptions_only():
+        rollups.add_delivery(instance)
+    else:
+        rollups.refresh_deliveries(instance.date)
+
+
+@receiver(post_delete, sender=Delivery)
+def delivery_deleted(sender, instance, **kwargs):
+    if exceptions_only():
+        rollups.refresh_deliveries(instance.date)
+    else:
+        rollups.remove_delivery(instance)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.add_invoice(instance)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.add_payment(instance)
+
+
+# ============================
+# CACHE INVALIDATION
+# ============================
+@receiver([post_save, post_delete], sender=Delivery)
+def delivery_changed(sender, instance, **kwargs):
+    caching.deliveries_changed(instance.date)
+
+
+# invoices and payments are never deleted: ledger entries protect them
+@receiver(post_save, sender=Invoice)
+def invoice_changed(sender, instance, **kwargs):
+    caching.billing_changed(
+        instance.customer_id, timezone.localdate(instance.created_at)
+    )
+
+
+@receiver(post_save, sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    invoice = instance.invoice
+    caching.billing_changed(
+        invoice.customer_id, timezone.localdate(invoice.created_at)
+    )
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+@receiver([post_save, post_delete], sender=Customer)
+def customer_changed(sender, instance, **kwargs):
+    customer_id = instance.pk if sender is Customer else instance.customer_id
+    caching.customer_changed(customer_id)
+    caching.roster_changed()
+    if exceptions_only():
+        # today's sheet is derived from subscriptions
+        caching.deliveries_changed(timezone.localdate())
+
+
+@receiver([post_save, post_delete], sender=NewsPaperPrice)
+def newspaper_price_changed(sender, instance, **kwargs):
+    caching.newspapers_changed()
+    if exceptions_only():
+        caching.deliveries_changed(timezone.localdate())
+
+
+@receiver([post_save, post_delete], sender=NewsPaper)
+def newspaper_changed(sender, instance, **kwargs):
+    caching.newspapers_changed()
+    caching.roster_changed()
+    if exceptions_only():
+        # derived deliveries are priced from the paper
+        caching.deliveries_changed(timezone.localdate())
+    # customer summaries show the subscribed paper's name
+    subscribers = Subscription.objects.filter(
+        newspaper_id=instance.pk, is_active=True
+    ).values_list("customer_id", flat=True)
+    caching.invalidate(*[caching.customer_key(c) for c in subscribers])
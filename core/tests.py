@@ -1,3 +1,323 @@
-from django.test import TestCase
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from customers.models import Customer, Subscription
+from delivery.generation import generate_range
+from delivery.models import Delivery
+from newspaper.models import NewsPaper
+from invoice.models import BillingRun, Invoice
+from . import benchmarks, jobs, scheduler
+from .pagination import MAX_PER_PAGE, InvalidCursor, encode_cursor, paginate
+from .models import Job, SchedulerCheckpoint
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+
+    def test_invoice_job_needs_a_user(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("generate_invoice", customer_id=1, to_date=str(date.today()))
+        self.assertFalse(Job.objects.exists())
+
+    def test_invoice_job_of_deleted_user_fails_without_retry(self):
+        job = jobs.enqueue(
+            "generate_invoice", user=self.user, customer_id=1, to_date=str(date.today()),
+        )
+        self.user.delete()
+
+        job = jobs.run(jobs.claim("test"))
+
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn("no longer exists", job.error)
+
+    def _tasks(self, **tasks):
+        patched = mock.patch.dict(jobs.TASKS, tasks)
+        patched.start()
+        self.addCleanup(patched.stop)
+
+    def test_claims_due_jobs_in_order_once(self):
+        self._tasks(noop=lambda job: None)
+        now = timezone.now()
+        later = jobs.enqueue("noop")
+        first = jobs.enqueue("noop")
+        Job.objects.filter(pk=first.pk).update(run_after=now - timedelta(minutes=1))
+        second = jobs.enqueue("noop")
+        Job.objects.filter(pk=second.pk).update(run_after=now - timedelta(minutes=1))
+        Job.objects.filter(pk=later.pk).update(run_after=now + timedelta(minutes=1))
+
+        claimed = [jobs.claim("w1"), jobs.claim("w2"), jobs.claim("w3")]
+
+        self.assertEqual([job.pk for job in claimed[:2]], [first.pk, second.pk])
+        self.assertIsNone(claimed[2])
+        self.assertEqual(claimed[0].status, Job.Status.RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claimed[0].worker, "w1")
+
+    @override_settings(JOB_RETRY_SECONDS=30)
+    def test_failure_retries_with_doubling_delay(self):
+        def broken(job):
+            raise RuntimeError("boom")
+
+        self._tasks(broken=broken)
+        job = jobs.enqueue("broken", max_attempts=3)
+        now = timezone.now()
+
+        for attempts, delay in ((1, 30), (2, 60)):
+            Job.objects.filter(pk=job.pk).update(run_after=now)
+            with mock.patch("core.jobs.timezone.now", return_value=now):
+                job = jobs.run(jobs.claim("w"))
+            self.assertEqual(job.status, Job.Status.PENDING)
+            self.assertEqual(job.attempts, attempts)
+            self.assertEqual(job.run_after, now + timedelta(seconds=delay))
+
+        Job.objects.filter(pk=job.pk).update(run_after=now)
+        job = jobs.run(jobs.claim("w"))
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn("boom", job.error)
+
+        self.assertEqual(jobs.retry(job), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.Status.PENDING, 0))
+
+    def test_job_failed_is_not_retried(self):
+        def refused(job):
+            raise jobs.JobFailed("no")
+
+        self._tasks(refused=refused)
+        jobs.enqueue("refused")
+
+        job = jobs.run(jobs.claim("w"))
+
+        self.assertEqual((job.status, job.attempts), (Job.Status.FAILED, 1))
+        self.assertIsNone(jobs.claim("w"))
+
+    @override_settings(JOB_STALE_SECONDS=60)
+    def test_stale_jobs_are_requeued_or_failed(self):
+        self._tasks(noop=lambda job: None)
+        retried = jobs.enqueue("noop")
+        spent = jobs.enqueue("noop", max_attempts=1)
+        alive = jobs.enqueue("noop")
+        for _ in range(3):
+            jobs.claim("w")
+        Job.objects.exclude(pk=alive.pk).update(
+            heartbeat_at=timezone.now() - timedelta(seconds=120),
+        )
+
+        self.assertEqual(jobs.requeue_stale(), 2)
+
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {
+            retried.pk: Job.Status.PENDING,
+            spent.pk: Job.Status.FAILED,
+            alive.pk: Job.Status.RUNNING,
+        })
+
+
+class SchedulerTests(TestCase):
+    start = date(2026, 2, 20)
+
+    def setUp(self):
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.customers = {}
+        for name, billing_day in (("fifth", 5), ("tenth", 10), ("manual", None)):
+            customer = Customer.objects.create(
+                name=name, phone=f"+91 90000000{len(self.customers)}0", billing_day=billing_day,
+            )
+            Subscription.objects.create(customer=customer, newspaper=paper, start_date=self.start)
+            self.customers[name] = customer
+
+    def _checkpoint(self, name):
+        return SchedulerCheckpoint.objects.get(name=name).last_date
+
+    def _invoiced(self):
+        return sorted(
+            Invoice.objects.values_list("customer__name", "to_date", "total_amount")
+        )
+
+    def test_generate_ahead_is_idempotent(self):
+        today = date(2026, 3, 12)
+
+        days, _ = scheduler.generate_ahead(today, since=self.start)
+
+        self.assertEqual(days, 22)
+        self.assertEqual(self._checkpoint("deliveries"), date(2026, 3, 13))
+        self.assertEqual(scheduler.generate_ahead(today), (0, None))
+
+    def test_bills_each_cycle_up_to_the_day_before(self):
+        scheduler.generate_ahead(date(2026, 3, 12), since=self.start)
+
+        runs = scheduler.bill_cycles(date(2026, 3, 6), since=date(2026, 3, 5))
+
+        self.assertEqual(
+            [(run.cutoff_date, run.billing_day, run.status) for run in runs],
+            [(date(2026, 3, 4), 5, BillingRun.Status.DONE)],
+        )
+        self.assertEqual(self._invoiced(), [("fifth", date(2026, 3, 4), Decimal("65.00"))])
+        self.assertEqual(self._checkpoint("billing"), date(2026, 3, 6))
+
+        # a missed week is caught up to the next cycle without rebilling
+        runs = scheduler.bill_cycles(date(2026, 3, 12))
+
+        self.assertEqual(
+            [(run.cutoff_date, run.billing_day) for run in runs], [(date(2026, 3, 9), 10)],
+        )
+        self.assertEqual(self._invoiced(), [
+            ("fifth", date(2026, 3, 4), Decimal("65.00")),
+            ("tenth", date(2026, 3, 9), Decimal("90.00")),
+        ])
+        self.assertEqual(self._checkpoint("billing"), date(2026, 3, 12))
+        self.assertEqual(scheduler.bill_cycles(date(2026, 3, 12)), [])
+        self.assertEqual(BillingRun.objects.count(), 2)
+
+
+class BenchmarkTests(TestCase):
+    def _subscribe(self, count):
+        paper = NewsPaper.objects.get_or_create(
+            name="Times", defaults={"price_per_day": Decimal("5.00")},
+        )[0]
+        start = Customer.objects.count()
+        for i in range(start, start + count):
+            customer = Customer.objects.create(name=f"C{i}", phone=f"+91 90000000{i:02d}")
+            Subscription.objects.create(customer=customer, newspaper=paper, start_date=date.today())
+        generate_range(date.today(), date.today())
+
+    def test_baseline_keeps_times_only_when_asked(self):
+        results = {"invoice_list": {"ms": 12.5, "queries": 3, "status": 200}}
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "baseline.json"
+
+            benchmarks.save_baseline(results, path)
+            self.assertEqual(
+                benchmarks.load_baseline(path), {"invoice_list": {"queries": 3, "status": 200}},
+            )
+
+            benchmarks.save_baseline(results, path, times=True)
+            self.assertEqual(json.loads(path.read_text()), results)
+
+    def test_regressions(self):
+        baseline = {
+            "a": {"queries": 3, "status": 200},
+            "b": {"queries": 3, "status": 200, "ms": 10},
+        }
+        results = {
+            "a": {"queries": 3, "status": 200, "ms": 500},
+            "b": {"queries": 4, "status": 200, "ms": 16},
+            "new": {"queries": 99, "status": 200, "ms": 1},
+        }
+
+        self.assertEqual(
+            benchmarks.regressions(results, baseline),
+            ["b: 4 queries (baseline 3)", "b: 16ms (baseline 10ms)"],
+        )
+        self.assertEqual(
+            benchmarks.regressions(results, baseline, time_tolerance=1),
+            ["b: 4 queries (baseline 3)"],
+        )
+
+    def test_run_counts_queries_and_rolls_back(self):
+        self._subscribe(2)
+        deliveries = Delivery.objects.count()
+
+        results = benchmarks.run(["delivery_list_view", "generate_deliveries"], repeat=1)
+
+        self.assertEqual(results["delivery_list_view"]["status"], 200)
+        self.assertEqual(results["generate_deliveries"]["status"], 302)
+        self.assertGreater(results["generate_deliveries"]["queries"], 0)
+        self.assertEqual(Delivery.objects.count(), deliveries)
+
+    def test_delivery_list_queries_do_not_grow_with_rows(self):
+        self._subscribe(2)
+        few = benchmarks.run(["delivery_list_view"], repeat=1)["delivery_list_view"]["queries"]
+        self._subscribe(5)
+        many = benchmarks.run(["delivery_list_view"], repeat=1)["delivery_list_view"]["queries"]
+
+        self.assertEqual(many, few)
+
+
+class PaginationTests(TestCase):
+    def setUp(self):
+        for i, name in enumerate("BABCABD"):
+            Customer.objects.create(name=name, phone=f"+91 90000000{i:02d}")
+        self.factory = RequestFactory()
+
+    def _page(self, ordering, **params):
+        return paginate(self.factory.get("/", params), Customer.objects.all(), ordering)
+
+    def _walk(self, ordering, limit=3):
+        pages = [self._page(ordering, limit=limit)]
+        while pages[-1].has_next:
+            pages.append(self._page(ordering, limit=limit, after=pages[-1].next_cursor))
+        return pages
+
+    def _ids(self, pages):
+        return [c.id for page in pages for c in page.items]
+
+    def test_forward_walk_covers_every_row_once(self):
+        for ordering in [("name", "id"), ("-name", "-id"), ("-created_at", "-id")]:
+            with self.subTest(ordering=ordering):
+                pages = self._walk(ordering)
+                self.assertEqual(
+                    self._ids(pages),
+                    list(Customer.objects.order_by(*ordering).values_list("id", flat=True)),
+                )
+                self.assertEqual([len(page.items) for page in pages], [3, 3, 1])
+                self.assertFalse(pages[0].has_previous)
+
+    def test_backward_walk_returns_the_same_pages(self):
+        ordering = ("name", "id")
+        forward = self._walk(ordering)
+
+        backward = [forward[-1]]
+        while backward[-1].has_previous:
+            backward.append(
+                self._page(ordering, limit=3, before=backward[-1].previous_cursor)
+            )
+
+        self.assertEqual(
+            [[c.id for c in page.items] for page in reversed(backward)],
+            [[c.id for c in page.items] for page in forward],
+        )
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        ordering = ("name", "id")
+        first = self._page(ordering, limit=3)
+        second = self._page(ordering, limit=3, after=first.next_cursor)
+
+        Customer.objects.create(name="A", phone="+91 9000000099")
+
+        again = self._page(ordering, limit=3, after=first.next_cursor)
+        self.assertEqual([c.id for c in again.items], [c.id for c in second.items])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self._page(("id",), limit=0).items), 1)
+        self.assertEqual(len(self._page(("id",), limit=MAX_PER_PAGE + 1).items), 7)
+        with self.assertRaises(InvalidCursor):
+            self._page(("id",), limit="ten")
+
+    def test_bad_cursors(self):
+        for cursor in ["!!!", encode_cursor([1]), encode_cursor(["A", "x"]), encode_cursor({})]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                self._page(("name", "id"), after=cursor)
+
+    def test_list_view(self):
+        self.client.force_login(get_user_model().objects.create_user("staff"))
+        url = reverse("customer")
+
+        page = self.client.get(url, {"format": "json", "limit": 5}).json()
+        self.assertEqual(len(page["results"]), 5)
+        rest = self.client.get(url, {"format": "json", "after": page["next"]}).json()
+        self.assertEqual(len(rest["results"]), 2)
+        self.assertIsNone(rest["next"])
+
+        self.assertEqual(self.client.get(url, {"after": "!!!"}).status_code, 400)
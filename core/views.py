@@ -1,15 +1,24 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout 
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render
-from django.utils.timezone import now
-from django.db.models import Sum, Count, Q, F
 from datetime import date
-from delivery.models import Delivery
-from invoice.models import *
+from asgiref.sync import sync_to_async
+from . import dashboard
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.hashers import check_password
-from django.http import HttpResponseBadRequest
+from django.http import FileResponse, HttpResponseBadRequest, Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from pathlib import Path
+from .exports import DATASETS, export_rows, stream_csv
+from . import jobs
+from .models import Job, SchedulerCheckpoint
+from .pagination import wants_json
+
+
+# pages showing these refresh themselves
+ACTIVE_JOB_STATUSES = (Job.Status.PENDING, Job.Status.RUNNING)
 
 
 
@@ -75,128 +84,106 @@ def change_password_view(request):
 
 
 @login_required
-def dashboard_view(request):
-    today = date.today()
-
-    # =============================
-    # 1️⃣ TODAY DELIVERY SNAPSHOT
-    # =============================
-    today_deliveries = Delivery.objects.filter(date=today)
-
-    status_counts = (
-        today_deliveries
-        .values("status")
-        .annotate(c=Count("id"))
-    )
-    status_map = {row["status"]: row["c"] for row in status_counts}
+async def async_dashboard_view(request):
+    context = await dashboard.abuild_context(date.today())
+    return await sync_to_async(render)(request, "core/dashboard.html", context)
 
-    total_today = today_deliveries.count()
-    delivered_today = status_map.get("DELIVERED", 0)
-    not_delivered_today = status_map.get("NOT_DELIVERED", 0)
-    holiday_today = status_map.get("HOLIDAY", 0)
 
-    today_value = (
-        today_deliveries
-        .filter(status="DELIVERED")
-        .aggregate(v=Sum("price"))["v"] or 0
+@login_required
+def export_csv_view(request, dataset):
+    if dataset not in DATASETS:
+        raise Http404("Unknown export")
+
+    try:
+        start = request.GET.get("from")
+        end = request.GET.get("to")
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        return HttpResponseBadRequest("Dates must be YYYY-MM-DD")
+
+    compress = request.GET.get("gzip") == "1"
+    header, rows = export_rows(dataset, start, end)
+
+    filename = f"{dataset}.csv.gz" if compress else f"{dataset}.csv"
+    response = StreamingHttpResponse(
+        stream_csv(header, rows, compress=compress),
+        content_type="application/gzip" if compress else "text/csv",
     )
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+# ============================
+# BACKGROUND JOBS
+# ============================
+def _job_json(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "progress": job.progress,
+        "total": job.total,
+        "message": job.message,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
 
-    # =============================
-    # 2️⃣ TOTAL PENDING (GLOBAL)
-    # =============================
-    total_billed = (
-        Invoice.objects
-        .aggregate(t=Sum("total_amount"))["t"] or 0
-    )
 
-    total_paid = (
-        Payment.objects
-        .aggregate(t=Sum("amount"))["t"] or 0
-    )
+@login_required
+def job_list(request):
+    job_rows = Job.objects.select_related("created_by")
+    status = request.GET.get("status")
+    if status in Job.Status.values:
+        job_rows = job_rows.filter(status=status)
+    job_rows = job_rows[:50]
 
-    total_pending = total_billed - total_paid
-
-    # =============================
-    # 3️⃣ TOP PENDING CUSTOMERS (SAFE)
-    # =============================
-    invoice_totals = (
-        Invoice.objects
-        .values(
-            "customer_id",
-            "customer__name",
-            "customer__phone"
-        )
-        .annotate(billed=Sum("total_amount"))
-    )
+    if wants_json(request):
+        return JsonResponse({"results": [_job_json(job) for job in job_rows]})
 
-    payment_totals = (
-        Payment.objects
-        .values("invoice__customer_id")
-        .annotate(paid=Sum("amount"))
-    )
+    return render(request, "core/jobs.html", {
+        "jobs": job_rows,
+        "status": status,
+        "statuses": Job.Status.choices,
+        "active": any(job.status in ACTIVE_JOB_STATUSES for job in job_rows),
+        "checkpoints": SchedulerCheckpoint.objects.order_by("name"),
+    })
 
-    paid_map = {
-        row["invoice__customer_id"]: row["paid"]
-        for row in payment_totals
-    }
 
-    top_pending = []
-    for row in invoice_totals:
-        paid = paid_map.get(row["customer_id"], 0) or 0
-        pending = row["billed"] - paid
-        if pending > 0:
-            top_pending.append({
-                "name": row["customer__name"],
-                "phone": row["customer__phone"],
-                "pending": pending
-            })
-
-    top_pending = sorted(
-        top_pending,
-        key=lambda x: x["pending"],
-        reverse=True
-    )[:10]
-
-    # =============================
-    # 4️⃣ INVOICE HEALTH (THIS MONTH)
-    # =============================
-    month_start = today.replace(day=1)
-
-    monthly_invoices = Invoice.objects.filter(
-        created_at__date__gte=month_start
-    )
+@login_required
+def job_detail(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
 
-    billed_month = (
-        monthly_invoices
-        .aggregate(t=Sum("total_amount"))["t"] or 0
-    )
+    if wants_json(request):
+        return JsonResponse(_job_json(job))
 
-    paid_month = (
-        Payment.objects
-        .filter(invoice__in=monthly_invoices)
-        .aggregate(t=Sum("amount"))["t"] or 0
-    )
+    return render(request, "core/job_detail.html", {
+        "job": job,
+        "active": job.status in ACTIVE_JOB_STATUSES,
+    })
 
-    pending_month = billed_month - paid_month
-
-    # =============================
-    # CONTEXT
-    # =============================
-    context = {
-        "today": today,
-        "total_today": total_today,
-        "delivered_today": delivered_today,
-        "not_delivered_today": not_delivered_today,
-        "holiday_today": holiday_today,
-        "today_value": today_value,
-
-        "total_pending": total_pending,
-        "top_pending": top_pending,
-
-        "billed_month": billed_month,
-        "paid_month": paid_month,
-        "pending_month": pending_month,
-    }
 
-    return render(request, "core/dashboard.html", context)
+@login_required
+def job_download(request, job_id):
+    job = get_object_or_404(Job, pk=job_id, status=Job.Status.DONE)
+    name = (job.result or {}).get("file")
+    if not name:
+        raise Http404("No file for this job")
+
+    try:
+        fh = open(Path(settings.JOB_OUTPUT_DIR) / Path(name).name, "rb")
+    except FileNotFoundError:
+        raise Http404("File no longer available")
+    return FileResponse(fh, as_attachment=True, filename=name)
 
+
+@login_required
+@require_POST
+def job_retry(request, job_id):
+    job = get_object_or_404(Job, pk=job_id)
+    jobs.retry(job)
+    return redirect("job_detail", job_id=job.id)
@@ -5,5 +5,5 @@ from .models import Customer, Subscription
 class CustomerForm(ModelForm):
     class Meta:
         model = Customer
-        fields = ['name', 'address','phone', 'area', 'notes']
+        fields = ['name', 'address','phone', 'area', 'billing_day', 'notes']
 
@@ -0,0 +1,201 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import CustomerBalance, LedgerEntry
+
+
+def _locked_balance(customer_id):
+    CustomerBalance.objects.get_or_create(customer_id=customer_id)
+    return (
+        CustomerBalance.objects
+        .select_for_update()
+        .get(customer_id=customer_id)
+    )
+
+
+def _post(customer_id, kind, amount, invoice, payment=None):
+    row = _locked_balance(customer_id)
+
+    if kind == LedgerEntry.Kind.INVOICE:
+        row.billed_total += amount
+        signed = amount
+    else:
+        row.paid_total += amount
+        signed = -amount
+
+    row.balance = row.billed_total - row.paid_total
+    row.save()
+
+    return LedgerEntry.objects.create(
+        customer_id=customer_id,
+        kind=kind,
+        invoice=invoice,
+        payment=payment,
+        amount=signed,
+        balance_after=row.balance,
+    )
+
+
+# ============================
+# POSTING
+# ============================
+def record_invoice(invoice):
+    """Post a new invoice to its customer's ledger. Call inside the invoice transaction."""
+    return _post(
+        invoice.customer_id,
+        LedgerEntry.Kind.INVOICE,
+        Decimal(invoice.total_amount),
+        invoice,
+    )
+
+
+def record_payment(payment):
+    """Post a new payment to its customer's ledger. Call inside the payment transaction."""
+    return _post(
+        payment.invoice.customer_id,
+        LedgerEntry.Kind.PAYMENT,
+        Decimal(str(payment.amount)),
+        payment.invoice,
+        payment,
+    )
+
+
+def record_payments(payments):
+    """
+    Post many new payments, in list order, with one balance lock query
+    and one insert instead of a round of queries each. Call inside the
+    payments' transaction, with `payment.invoice` loaded.
+    """
+    by_customer = defaultdict(list)
+    for payment in payments:
+        by_customer[payment.invoice.customer_id].append(payment)
+    if not by_customer:
+        return []
+
+    CustomerBalance.objects.bulk_create(
+        [CustomerBalance(customer_id=c) for c in by_customer], ignore_conflicts=True
+    )
+    # locked in customer order so concurrent bulk posts cannot deadlock
+    rows = {
+        row.customer_id: row
+        for row in CustomerBalance.objects
+        .select_for_update()
+        .filter(customer_id__in=by_customer)
+        .order_by("customer_id")
+    }
+
+    entries = []
+    for customer_id, customer_payments in by_customer.items():
+        row = rows[customer_id]
+        for payment in customer_payments:
+            amount = Decimal(str(payment.amount))
+            row.paid_total += amount
+            row.balance = row.billed_total - row.paid_total
+            entries.append(LedgerEntry(
+                customer_id=customer_id,
+                kind=LedgerEntry.Kind.PAYMENT,
+                invoice=payment.invoice,
+                payment=payment,
+                amount=-amount,
+                balance_after=row.balance,
+            ))
+
+    # bulk_update skips auto_now
+    now = timezone.now()
+    for row in rows.values():
+        row.updated_at = now
+    CustomerBalance.objects.bulk_update(
+        rows.values(), ["paid_total", "balance", "updated_at"]
+    )
+    return LedgerEntry.objects.bulk_create(entries)
+
+
+# ============================
+# READS
+# ============================
+def balance_for(customer):
+    row = CustomerBalance.objects.filter(customer=customer).first()
+    return row.balance if row else 0
+
+
+def top_pending(limit=10):
+    return (
+        CustomerBalance.objects
+        .filter(balance__gt=0)
+        .select_related("customer")
+        .order_by("-balance")[:limit]
+    )
+
+
+# ============================
+# REBUILD
+# ============================
+@transaction.atomic
+def rebuild():
+    """
+    Replay every invoice and payment into fresh ledger and balance rows.
+
+    Entries are written in creation order so `balance_after` matches what
+    the live posting path would have produced. Returns the number of
+    customers with a balance row.
+    """
+    from invoice.models import Invoice, Payment
+
+    LedgerEntry.objects.all().delete()
+    CustomerBalance.objects.all().delete()
+
+    events = []
+    for inv in Invoice.objects.order_by().values(
+        "id", "customer_id", "total_amount", "created_at"
+    ).iterator():
+        events.append((inv["created_at"], 0, inv["id"], inv["customer_id"], inv["total_amount"], None))
+
+    for pay in Payment.objects.order_by().values(
+        "id", "invoice_id", "invoice__customer_id", "amount", "created_at"
+    ).iterator():
+        events.append((pay["created_at"], 1, pay["invoice_id"], pay["invoice__customer_id"], -pay["amount"], pay["id"]))
+
+    events.sort(key=lambda e: (e[0], e[1]))
+
+    running = defaultdict(Decimal)
+    entries = []
+    for created_at, _, invoice_id, customer_id, amount, payment_id in events:
+        running[customer_id] += amount
+        entries.append(LedgerEntry(
+            customer_id=customer_id,
+            kind=LedgerEntry.Kind.PAYMENT if payment_id else LedgerEntry.Kind.INVOICE,
+            invoice_id=invoice_id,
+            payment_id=payment_id,
+            amount=amount,
+            balance_after=running[customer_id],
+        ))
+
+    LedgerEntry.objects.bulk_create(entries, batch_size=1000)
+
+    billed = {
+        row["customer_id"]: row["t"]
+        for row in Invoice.objects.order_by().values("customer_id").annotate(t=Sum("total_amount"))
+    }
+    paid = {
+        row["invoice__customer_id"]: row["t"]
+        for row in Payment.objects.order_by().values("invoice__customer_id").annotate(t=Sum("amount"))
+    }
+
+    CustomerBalance.objects.bulk_create(
+        [
+            CustomerBalance(
+                customer_id=customer_id,
+                billed_total=total,
+                paid_total=paid.get(customer_id) or 0,
+                balance=total - (paid.get(customer_id) or 0),
+            )
+            for customer_id, total in billed.items()
+        ],
+        batch_size=1000,
+    )
+
+    return len(billed)
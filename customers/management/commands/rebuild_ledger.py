@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core import caching
+from customers import ledger
+
+
+class Command(BaseCommand):
+    help = "Rebuild customer ledger entries and balances from invoices and payments."
+
+    def handle(self, *args, **options):
+        customers = ledger.rebuild()
+        caching.clear()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt balances for {customers} customers"))
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:30
+
+import re
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def backfill_phone_digits(apps, schema_editor):
+    Customer = apps.get_model("customers", "Customer")
+
+    batch = []
+    for cust in Customer.objects.only("id", "phone").iterator():
+        value = (cust.phone or "").strip()
+        digits = re.sub(r"\D", "", value)
+        if (value.startswith("+") or len(digits) > 10) and digits.startswith("91"):
+            digits = digits[2:]
+        cust.phone_digits = digits.lstrip("0")
+        batch.append(cust)
+
+        if len(batch) >= 1000:
+            Customer.objects.bulk_update(batch, ["phone_digits"])
+            batch = []
+
+    Customer.objects.bulk_update(batch, ["phone_digits"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customerbalance_ledgerentry'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(backfill_phone_digits, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='customer_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='customer_name_upper_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['phone_digits'], name='customer_phone_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:35
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0003_customer_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(django.db.models.functions.comparison.Least('start_date', models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('end_date'), '+', models.Value(1)), output_field=models.DateField())), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('end_date'), '+', models.Value(1)), output_field=models.DateField()), models.Value('[)'), function='daterange'), output_field=django.contrib.postgres.fields.ranges.DateRangeField()),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('is_active', True), ('end_date__isnull', False), _connector='OR'), fields=['period'], name='subscription_period_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:45
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0004_subscription_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='billing_day',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(28)]),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(condition=models.Q(('billing_day__isnull', False)), fields=['billing_day', 'id'], name='customer_billing_day_idx'),
+        ),
+    ]
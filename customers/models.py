@@ -1,4 +1,14 @@
+from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Func, Q, Value
+from django.db.models.functions import Least, Upper
+
+from .phone import normalize_phone
+
+
+_DAY_AFTER_END = ExpressionWrapper(F("end_date") + 1, output_field=models.DateField())
 
 
 class Customer(models.Model):
@@ -6,13 +16,54 @@ class Customer(models.Model):
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=200, null=True, blank=True)
     phone = models.CharField(max_length=20)
+    # digits-only copy of `phone` without the +91 prefix, for search
+    phone_digits = models.CharField(max_length=20, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     area = models.CharField(max_length=100, null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
+    # day of the month run_scheduler invoices this customer up to the day
+    # before; blank: invoiced by hand or by a full billing run
+    billing_day = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1), MaxValueValidator(28)],
+    )
+
+    class Meta:
+        indexes = [
+            # a billing cycle's customers in run_billing's keyset order
+            models.Index(
+                fields=["billing_day", "id"],
+                name="customer_billing_day_idx",
+                condition=Q(billing_day__isnull=False),
+            ),
+            GinIndex(
+                fields=["name"],
+                name="customer_name_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # icontains compiles to UPPER(name) LIKE UPPER(...)
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name="customer_name_upper_trgm_idx",
+            ),
+            GinIndex(
+                fields=["phone_digits"],
+                name="customer_phone_trgm_idx",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+    def save(self, *args, **kwargs):
+        self.phone_digits = normalize_phone(self.phone)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "phone" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "phone_digits"}
+        super().save(*args, **kwargs)
     
 class Subscription(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
@@ -22,7 +73,82 @@ class Subscription(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
 
+    # [start_date, end_date] as a range for GiST lookups; open-ended while
+    # end_date is NULL, empty if end_date is before start_date
+    period = models.GeneratedField(
+        expression=Func(
+            Least("start_date", _DAY_AFTER_END),
+            _DAY_AFTER_END,
+            Value("[)"),
+            function="daterange",
+        ),
+        output_field=DateRangeField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # serves customers.roster; matches its live() filter
+            GistIndex(
+                fields=["period"],
+                name="subscription_period_idx",
+                condition=Q(is_active=True) | Q(end_date__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.customer.name} - {self.newspaper.name}"
 
+
+
+class CustomerBalance(models.Model):
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balance_row",
+    )
+    billed_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-balance"], name="customer_balance_desc_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} - ₹{self.balance}"
+
+
+class LedgerEntry(models.Model):
+
+    class Kind(models.TextChoices):
+        INVOICE = "INVOICE", "Invoice"
+        PAYMENT = "PAYMENT", "Payment"
+
+    customer = models.ForeignKey(Customer, on_delete=models.PROTECT)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    invoice = models.ForeignKey('invoice.Invoice', on_delete=models.PROTECT)
+    payment = models.OneToOneField(
+        'invoice.Payment',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
+
+    # positive for invoices, negative for payments
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["customer", "created_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.customer_id} {self.kind} ₹{self.amount}"
@@ -0,0 +1,15 @@
+import re
+
+
+def normalize_phone(value):
+    """
+    Reduce a phone number, or a fragment of one, to its national digits:
+    "+91 98765-43210" and "098765 43210" both become "9876543210".
+    """
+    value = (value or "").strip()
+    digits = re.sub(r"\D", "", value)
+
+    if (value.startswith("+") or len(digits) > 10) and digits.startswith("91"):
+        digits = digits[2:]
+
+    return digits.lstrip("0")
@@ -0,0 +1,131 @@
+"""
+Who gets a paper on a given day.
+
+A subscription covers the days in its `period`. One that was ended
+(is_active off with an end_date, as the customer page leaves it) still
+covers the days it ran, so past days stay deliverable and billable; one
+switched off without an end date covers nothing. A customer gets one
+paper a day, from their newest subscription covering it.
+
+Each lookup is one query served by subscription_period_idx. Today's
+roster is also kept in process memory until a subscription, customer or
+paper changes in any worker (see caching.roster_version()).
+"""
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core import caching
+from newspaper.pricing import PriceIndex
+from .models import Subscription
+
+
+class Entry(NamedTuple):
+    subscription_id: int
+    customer_id: int
+    newspaper_id: int
+    start: date
+    end: date | None
+
+    def covers(self, day):
+        return self.start <= day and (self.end is None or self.end >= day)
+
+
+FIELDS = (
+    "id", "customer_id", "newspaper_id", "start_date", "end_date",
+)
+
+
+def live():
+    """Subscriptions that cover the days of their period."""
+    return Subscription.objects.filter(Q(is_active=True) | Q(end_date__isnull=False))
+
+
+def daily(day):
+    """Queryset form of `on(day)`, for annotating and paginating."""
+    subs = live().filter(period__contains=day, customer__is_active=True)
+    return subs.exclude(
+        Exists(subs.filter(customer=OuterRef("customer_id"), id__gt=OuterRef("id")))
+    )
+
+
+class Span:
+    """Subscriptions overlapping a date range, by customer, newest first."""
+
+    def __init__(self, entries):
+        self.by_customer = {}
+        for entry in entries:
+            self.by_customer.setdefault(entry.customer_id, []).append(entry)
+
+    def pick(self, customer_id, day):
+        """The Entry delivering to `customer_id` on `day`, or None."""
+        return next(
+            (e for e in self.by_customer.get(customer_id, ()) if e.covers(day)), None
+        )
+
+    def on(self, day):
+        """One Entry per customer delivered on `day`, in customer order."""
+        picks = (self.pick(customer_id, day) for customer_id in self.by_customer)
+        return tuple(e for e in picks if e)
+
+
+def between(start, end, customer_ids=None, active_customers=True):
+    """
+    A Span of the subscriptions overlapping [start, end]; a `start` of
+    None reaches back to the first subscription.
+    """
+    subs = live().filter(period__overlap=DateRange(start, end, "[]"))
+    if customer_ids is not None:
+        subs = subs.filter(customer_id__in=customer_ids)
+    if active_customers:
+        subs = subs.filter(customer__is_active=True)
+    return Span(
+        Entry(*row)
+        for row in subs.order_by("customer_id", "-id").values_list(*FIELDS)
+    )
+
+
+# today's roster, as {"roster": ((day, version), entries)}; swapped whole
+# so concurrent requests never pair a key with another version's entries
+_today = {}
+
+
+def on(day):
+    """One Entry per active customer delivered on `day`, in customer order."""
+    if day != timezone.localdate():
+        return between(day, day).on(day)
+
+    key = (day, caching.roster_version())
+    cached = _today.get("roster")
+    if cached and cached[0] == key:
+        return cached[1]
+
+    entries = between(day, day).on(day)
+    _today["roster"] = (key, entries)
+    return entries
+
+
+def forecast(start, end):
+    """
+    Expected deliveries for each day in [start, end], from one query:
+    `(day, {newspaper_id: count}, value)` tuples. Stored exceptions such
+    as holidays are not taken off.
+    """
+    span = between(start, end)
+    prices = PriceIndex(start, end)
+    days = []
+    day = start
+    while day <= end:
+        counts = Counter()
+        value = Decimal(0)
+        for entry in span.on(day):
+            counts[entry.newspaper_id] += 1
+            value += prices.price(entry.newspaper_id, day)
+        days.append((day, dict(counts), value))
+        day += timedelta(days=1)
+    return days
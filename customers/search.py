@@ -0,0 +1,39 @@
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import Q
+
+from .models import Customer
+from .phone import normalize_phone
+
+
+# shorter digit fragments cannot use the trigram index
+MIN_PHONE_DIGITS = 3
+
+
+def search_customers(q, queryset=None):
+    """
+    Customers matching `q` by name (substring or trigram similarity) or
+    phone digits, best name match first. Both predicates are served by
+    the GIN trigram indexes on `name` and `phone_digits`.
+    """
+    queryset = Customer.objects.all() if queryset is None else queryset
+    q = (q or "").strip()
+    if not q:
+        return queryset
+
+    condition = Q(name__icontains=q) | Q(name__trigram_similar=q)
+
+    digits = normalize_phone(q)
+    if len(digits) >= MIN_PHONE_DIGITS:
+        condition |= Q(phone_digits__contains=digits)
+
+    return (
+        queryset
+        .filter(condition)
+        .annotate(rank=TrigramSimilarity("name", q))
+        .order_by("-rank", "name")
+    )
+
+
+def matching_customer_ids(q):
+    """Subquery of matching customer ids, for filtering related lists."""
+    return search_customers(q).order_by().values("id")
@@ -1,3 +1,228 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from delivery.generation import generate_range
+from delivery.models import Delivery
+from invoice.billing import bill_customer
+from invoice.models import Invoice
+from newspaper.models import NewsPaper
+from . import roster
+from .ledger import balance_for
+from .models import Customer, CustomerBalance, LedgerEntry, Subscription
+from .phone import normalize_phone
+from .search import search_customers
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        today = date.today()
+        start = today - timedelta(days=9)
+        self.customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        Subscription.objects.create(customer=self.customer, newspaper=paper, start_date=start)
+        generate_range(start, today)
+        with transaction.atomic():
+            self.invoice = bill_customer(self.customer.id, today, self.user)
+        self.client.force_login(self.user)
+
+    def _pay(self, amount, reference=""):
+        return self.client.post(
+            reverse("generate_payment", args=[self.invoice.id]),
+            {"amount": amount, "mode": "CASH", "reference": reference},
+        )
+
+    def test_payments_update_balance_and_status(self):
+        self.assertEqual(balance_for(self.customer.id), Decimal("50.00"))
+
+        self.assertEqual(self._pay("20.00").status_code, 302)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, Invoice.Status.PARTIAL)
+        self.assertEqual(balance_for(self.customer.id), Decimal("30.00"))
+
+        self.assertEqual(self._pay("30.00").status_code, 302)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.status, Invoice.Status.PAID)
+        self.assertEqual(self.invoice.paid_amount, Decimal("50.00"))
+
+        row = CustomerBalance.objects.get(customer=self.customer)
+        self.assertEqual(
+            (row.billed_total, row.paid_total, row.balance),
+            (Decimal("50.00"), Decimal("50.00"), Decimal("0.00")),
+        )
+        self.assertEqual(
+            list(
+                LedgerEntry.objects
+                .filter(customer=self.customer)
+                .order_by("id")
+                .values_list("kind", "amount", "balance_after")
+            ),
+            [
+                (LedgerEntry.Kind.INVOICE, Decimal("50.00"), Decimal("50.00")),
+                (LedgerEntry.Kind.PAYMENT, Decimal("-20.00"), Decimal("30.00")),
+                (LedgerEntry.Kind.PAYMENT, Decimal("-30.00"), Decimal("0.00")),
+            ],
+        )
+
+    def test_rejected_payment_leaves_ledger_alone(self):
+        self.assertEqual(self._pay("20.00", reference="R1").status_code, 302)
+        self.assertEqual(self._pay("10.00", reference="R1").status_code, 400)
+        self.assertEqual(self._pay("60.00").status_code, 400)
+
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.paid_amount, Decimal("20.00"))
+        self.assertEqual(balance_for(self.customer.id), Decimal("30.00"))
+        self.assertEqual(LedgerEntry.objects.filter(customer=self.customer).count(), 2)
+
+
+@override_settings(DELIVERY_STORAGE="rows")
+class CustomerDetailTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        Subscription.objects.create(
+            customer=self.customer, newspaper=paper, start_date=date.today(),
+        )
+        self.tomorrow = date.today() + timedelta(days=1)
+        generate_range(self.tomorrow, self.tomorrow)
+        self.client.force_login(self.user)
+
+    def _post(self, action):
+        return self.client.post(
+            reverse("customer_detail", args=[self.customer.id]), {"action": action},
+        )
+
+    def test_ending_subscription_drops_generated_days(self):
+        self.assertEqual(self._post("end").status_code, 302)
+        self.assertFalse(Delivery.objects.filter(date=self.tomorrow).exists())
+
+    def test_no_change_leaves_generated_days_alone(self):
+        with mock.patch("customers.views.regenerate_customer") as regenerate:
+            self._post("add")  # already subscribed
+            self._post("nothing")
+        regenerate.assert_not_called()
+        self.assertTrue(Delivery.objects.filter(date=self.tomorrow).exists())
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        for name, phone in [
+            ("Anita Sharma", "+91 98765 43210"),
+            ("Anil Sharma", "091234 56789"),
+            ("Ravi Kumar", "9988776655"),
+        ]:
+            Customer.objects.create(name=name, phone=phone)
+
+    def _names(self, q):
+        return [c.name for c in search_customers(q)]
+
+    def test_normalize_phone(self):
+        for value in ("+91 98765-43210", "098765 43210", "919876543210", "9876543210"):
+            self.assertEqual(normalize_phone(value), "9876543210")
+        self.assertEqual(normalize_phone("876-54"), "87654")
+
+    def test_name_substring(self):
+        self.assertEqual(sorted(self._names("sharma")), ["Anil Sharma", "Anita Sharma"])
+
+    def test_phone_fragment_in_any_format(self):
+        self.assertEqual(self._names("98765-432"), ["Anita Sharma"])
+        self.assertEqual(self._names("1234 567"), ["Anil Sharma"])
+
+    def test_misspelt_name_ranks_closest_first(self):
+        self.assertEqual(self._names("Anitha Sharma")[0], "Anita Sharma")
+
+    def test_blank_query_matches_everyone(self):
+        self.assertEqual(search_customers("  ").count(), 3)
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        self.times = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.herald = NewsPaper.objects.create(name="Herald", price_per_day=Decimal("4.00"))
+        self.today = date.today()
+        self.start = self.today - timedelta(days=6)
+
+        def customer(name, phone, **fields):
+            return Customer.objects.create(name=name, phone=phone, **fields)
+
+        self.switched = customer("Switched", "+91 9000000001")
+        self.ended = customer("Ended", "+91 9000000002")
+        self.paused = customer("Paused", "+91 9000000003")
+        self.inactive = customer("Inactive", "+91 9000000004", is_active=False)
+
+        Subscription.objects.create(
+            customer=self.switched, newspaper=self.times, start_date=self.start,
+            end_date=self.start + timedelta(days=3), is_active=False,
+        )
+        Subscription.objects.create(
+            customer=self.switched, newspaper=self.herald, start_date=self.start + timedelta(days=3),
+        )
+        Subscription.objects.create(
+            customer=self.ended, newspaper=self.times, start_date=self.start,
+            end_date=self.start + timedelta(days=2), is_active=False,
+        )
+        # switched off without an end date: covers nothing
+        Subscription.objects.create(
+            customer=self.paused, newspaper=self.times, start_date=self.start, is_active=False,
+        )
+        Subscription.objects.create(
+            customer=self.inactive, newspaper=self.times, start_date=self.start,
+        )
+
+    def _on(self, day):
+        return [(e.customer_id, e.newspaper_id) for e in roster.on(day)]
+
+    def test_who_gets_which_paper(self):
+        self.assertEqual(self._on(self.start), [
+            (self.switched.id, self.times.id), (self.ended.id, self.times.id),
+        ])
+        # the newer subscription wins the overlapping day
+        self.assertEqual(self._on(self.start + timedelta(days=3)), [
+            (self.switched.id, self.herald.id),
+        ])
+        self.assertEqual(self._on(self.today), [(self.switched.id, self.herald.id)])
+
+    def test_span_and_queryset_agree_with_daily_lookup(self):
+        span = roster.between(self.start, self.today)
+        day = self.start
+        while day <= self.today:
+            with self.subTest(day=day):
+                expected = self._on(day)
+                self.assertEqual([(e.customer_id, e.newspaper_id) for e in span.on(day)], expected)
+                self.assertEqual(
+                    sorted(roster.daily(day).values_list("customer_id", "newspaper_id")),
+                    expected,
+                )
+            day += timedelta(days=1)
+
+    def test_today_follows_subscription_changes(self):
+        self.assertEqual(len(roster.on(self.today)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.create(
+                customer=self.ended, newspaper=self.herald, start_date=self.today,
+            )
+
+        self.assertEqual(self._on(self.today), [
+            (self.switched.id, self.herald.id), (self.ended.id, self.herald.id),
+        ])
+
+    def test_forecast(self):
+        days = roster.forecast(self.start, self.start + timedelta(days=3))
+
+        self.assertEqual(
+            [(day, counts, value) for day, counts, value in days],
+            [
+                (self.start, {self.times.id: 2}, Decimal("10.00")),
+                (self.start + timedelta(days=1), {self.times.id: 2}, Decimal("10.00")),
+                (self.start + timedelta(days=2), {self.times.id: 2}, Decimal("10.00")),
+                (self.start + timedelta(days=3), {self.herald.id: 1}, Decimal("4.00")),
+            ],
+        )
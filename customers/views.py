@@ -5,12 +5,17 @@ from newspaper.models import NewsPaper
 from datetime import date
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
-from django.db.models import Q
-from invoice.models import Invoice, Payment
-from django.db.models import Sum
+from invoice.models import Invoice
+from .ledger import balance_for
+from .search import search_customers
+from core import caching
+from core.pagination import InvalidCursor, json_page, paginate, wants_json
+from delivery.generation import regenerate_customer
+from django.http import HttpResponseBadRequest
 
 
 @login_required
+@transaction.atomic
 def create_customer_view(request):
     if request.method == 'POST':
         form = CustomerForm(request.POST)
@@ -27,11 +32,15 @@ def create_customer_view(request):
                 is_active = True
 
             )
+            # the scheduler may already have generated tomorrow
+            regenerate_customer(cust.id, date.today())
 
 
             return redirect("customer")
         
-    newspaper = NewsPaper.objects.all()
+    newspaper = caching.cached(
+        "newspapers", caching.NEWSPAPERS_ALL_KEY, lambda: list(NewsPaper.objects.all())
+    )
     form = CustomerForm()
 
     return render(request, 'customers/create_customer.html', {'form': form, 'newspaper': newspaper})
@@ -40,24 +49,36 @@ def create_customer_view(request):
 def customer_list_view(request):
     q = request.GET.get("q", "").strip()
 
-    customers = Customer.objects.all()
-
-    if q:
-        customers = customers.filter(
-            Q(name__icontains=q) | Q(phone__icontains=q)
-        )
-    return render(request, 'customers/customer_list.html', {'customers': customers, 'query': q})
+    ordering = ("-rank", "name", "id") if q else ("id",)
+    try:
+        page = paginate(request, search_customers(q), ordering)
+    except InvalidCursor as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    if wants_json(request):
+        return json_page(page, [
+            {
+                "id": c.id,
+                "name": c.name,
+                "phone": c.phone,
+                "area": c.area,
+                "is_active": c.is_active,
+            }
+            for c in page.items
+        ])
+
+    return render(request, 'customers/customer_list.html', {'customers': page.items, 'page': page, 'query': q})
 
 @login_required
 @transaction.atomic
 def customer_detail_view(request, id):
     cust = get_object_or_404(Customer, id=id)
-    sub = Subscription.objects.filter(customer=cust, is_active=True).first()
-    newspapers = NewsPaper.objects.filter(is_active=True)
 
     if request.method == "POST":
+        sub = Subscription.objects.filter(customer=cust, is_active=True).first()
         action = request.POST.get("action")
         newspaper_id = request.POST.get("newspaper")
+        changed = True
 
         if action == "change" and sub and newspaper_id:
             sub.is_active = False
@@ -88,35 +109,48 @@ def customer_detail_view(request, id):
             cust.is_active = not cust.is_active
             cust.save()
 
-        return redirect("customer_detail", id=cust.id)
+        else:
+            changed = False
 
-    invoices = (
-        Invoice.objects
-        .filter(customer=cust)
-        .annotate(paid=Sum("payment__amount"))
-        .order_by("-created_at")
-    )
-
-    for inv in invoices:
-        inv.paid = inv.paid or 0
-        inv.pending = inv.total_amount - inv.paid
+        # days the scheduler already generated must follow the change
+        if changed:
+            regenerate_customer(cust.id, date.today())
 
-    due = invoices.aggregate(total=Sum("total_amount"))["total"] or 0
-    paid_total = Payment.objects.filter(
-        invoice__customer=cust
-    ).aggregate(total=Sum("amount"))["total"] or 0
+        return redirect("customer_detail", id=cust.id)
 
-    balance = due - paid_total
+    summary = caching.cached(
+        "customer", caching.customer_key(cust.id), lambda: _customer_summary(cust)
+    )
+    newspapers = caching.cached(
+        "newspapers",
+        caching.NEWSPAPERS_ACTIVE_KEY,
+        lambda: list(NewsPaper.objects.filter(is_active=True)),
+    )
 
     return render(request, "customers/customer_detail.html", {
         "cust": cust,
-        "sub": sub,
         "newspapers": newspapers,
-        "invoices": invoices,
-        "balance": balance,
+        **summary,
     })
 
 
+def _customer_summary(cust):
+    sub = (
+        Subscription.objects
+        .filter(customer=cust, is_active=True)
+        .select_related("newspaper")
+        .first()
+    )
+
+    invoices = list(
+        Invoice.objects
+        .filter(customer=cust)
+        .order_by("-created_at")
+    )
+
+    return {"sub": sub, "invoices": invoices, "balance": balance_for(cust)}
+
+
 @login_required
 def update_customer_view(request, id):
     customer = get_object_or_404(Customer, id=id)
@@ -0,0 +1,65 @@
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+
+from customers import roster
+from .models import Delivery
+from . import sheet
+
+
+# rows stamped just before the cursor may commit just after it was read;
+# re-send that window and let the client upsert by customer_id
+OVERLAP = timedelta(seconds=5)
+
+FIELDS = ("id", "customer_id", "customer__name", "newspaper__name", "status")
+KEYS = ("id", "customer_id", "customer", "newspaper", "status")
+
+
+def encode_cursor(value):
+    """Microseconds since the epoch, as a string; "0" for an empty sheet."""
+    if value is None:
+        return "0"
+    return str(int(value.timestamp() * 1_000_000))
+
+
+def decode_cursor(cursor):
+    micros = int(cursor)
+    if micros < 0:
+        raise ValueError("cursor must not be negative")
+    return datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+
+
+def sheet_state(day):
+    """`(latest updated_at, row count)` for one day; a single indexed aggregate."""
+    state = Delivery.objects.filter(date=day).aggregate(
+        latest=Max("updated_at"),
+        count=Count("id"),
+    )
+    if sheet.exceptions_only():
+        # stored rows are only the changes; the sheet is the roster
+        return state["latest"], roster.daily(day).count()
+    return state["latest"], state["count"]
+
+
+def etag(day, since, latest, count):
+    raw = f"{day}:{since}:{encode_cursor(latest)}:{count}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def changed_rows(day, since=None):
+    """
+    The day's deliveries changed after `since` (all of them when `since`
+    is None), as compact dicts.
+    """
+    if since is None and sheet.exceptions_only():
+        rows = sheet.sheet(day).values_list("delivery_id", *FIELDS[1:])
+        return [dict(zip(KEYS, values)) for values in rows.order_by("customer_id")]
+
+    rows = Delivery.objects.filter(date=day)
+    if since is not None:
+        rows = rows.filter(updated_at__gt=since - OVERLAP)
+    return [
+        dict(zip(KEYS, values))
+        for values in rows.order_by("id").values_list(*FIELDS)
+    ]
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Max
+
+from customers import roster
+from core.rollups import refresh_deliveries
+from newspaper.pricing import PriceIndex
+from .models import Delivery
+from .sheet import exceptions_only
+
+
+BATCH_SIZE = 2000
+
+
+@dataclass
+class GenerationResult:
+    created: int = 0
+    skipped: int = 0
+
+    def __iadd__(self, other):
+        self.created += other.created
+        self.skipped += other.skipped
+        return self
+
+
+def _insert_day(day, entries, prices):
+    rows = [
+        Delivery(
+            customer_id=entry.customer_id,
+            subscription_id=entry.subscription_id,
+            newspaper_id=entry.newspaper_id,
+            date=day,
+            price=prices.price(entry.newspaper_id, day),
+        )
+        for entry in entries
+    ]
+    if not rows:
+        return GenerationResult()
+
+    before = Delivery.objects.filter(date=day).count()
+    Delivery.objects.bulk_create(rows, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    created = Delivery.objects.filter(date=day).count() - before
+
+    if created:
+        refresh_deliveries(day)
+
+    return GenerationResult(created=created, skipped=len(rows) - created)
+
+
+def generate_for_date(day):
+    """
+    Insert the delivery roster for one day.
+
+    Existing rows are left alone through `unique_delivery_per_customer_per_day`,
+    so the call is idempotent.
+    """
+    if exceptions_only():
+        return GenerationResult()
+
+    with transaction.atomic():
+        return _insert_day(day, roster.on(day), PriceIndex(day, day))
+
+
+def generate_range(start, end, progress=None):
+    """
+    Generate deliveries for every day in [start, end], one transaction per
+    day. A no-op in exception-only storage, where deliveries are derived.
+    `progress(days_done, days_total)` is called after each day's commit.
+    """
+    result = GenerationResult()
+    if exceptions_only():
+        return result
+
+    span = roster.between(start, end)
+    prices = PriceIndex(start, end)
+
+    total = (end - start).days + 1
+    day = start
+    while day <= end:
+        with transaction.atomic():
+            result += _insert_day(day, span.on(day), prices)
+        day += timedelta(days=1)
+        if progress:
+            progress((day - start).days, total)
+
+    return result
+
+
+def regenerate_customer(customer_id, after):
+    """
+    Redo a customer's unbilled deliveries dated after `after` from their
+    subscriptions as they are now, through the last day already
+    generated. Statuses set ahead, such as holidays, are kept. Call inside
+    the transaction that changed the subscriptions.
+    """
+    if exceptions_only():
+        return GenerationResult()
+
+    last = Delivery.objects.filter(date__gt=after).aggregate(last=Max("date"))["last"]
+    if last is None:
+        return GenerationResult()
+
+    rows = Delivery.objects.filter(customer_id=customer_id, date__gt=after, invoice__isnull=True)
+    statuses = dict(rows.values_list("date", "status"))
+    rows.delete()
+
+    start = after + timedelta(days=1)
+    span = roster.between(start, last, customer_ids=[customer_id])
+    prices = PriceIndex(start, last)
+    billed = set(
+        Delivery.objects
+        .filter(customer_id=customer_id, date__gt=after)
+        .values_list("date", flat=True)
+    )
+
+    new = []
+    day = start
+    while day <= last:
+        entry = span.pick(customer_id, day)
+        if entry and day not in billed:
+            new.append(Delivery(
+                customer_id=customer_id,
+                subscription_id=entry.subscription_id,
+                newspaper_id=entry.newspaper_id,
+                date=day,
+                price=prices.price(entry.newspaper_id, day),
+                status=statuses.get(day, Delivery.Status.DELIVERED),
+            ))
+        day += timedelta(days=1)
+    Delivery.objects.bulk_create(new)
+
+    # bulk_create skips the Delivery signals
+    for day in {d.date for d in new}:
+        refresh_deliveries(day)
+    return GenerationResult(created=len(new))
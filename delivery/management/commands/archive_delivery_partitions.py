@@ -0,0 +1,49 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from delivery import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact and freeze monthly delivery partitions whose deliveries are "
+        "all billed on locked invoices. Recent months are never touched."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-months", type=int, default=3,
+            help="Leave this many most recent months (including the current one) alone.",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Delivery partitioning needs PostgreSQL")
+        if connection.in_atomic_block:
+            raise CommandError("Run outside a transaction; VACUUM needs autocommit")
+
+        cutoff = partitions.month_start(date.today())
+        for _ in range(options["keep_months"] - 1):
+            cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+
+        self.stdout.write(f"{'PARTITION':<32}{'~ROWS':>10}{'MB':>8}  STATE")
+        for part in partitions.partitions():
+            if part.month is None or part.month >= cutoff:
+                state = "active"
+            elif part.archived:
+                state = "archived"
+            else:
+                reason = partitions.unbilled_reason(part.month)
+                if reason:
+                    state = f"kept: {reason}"
+                elif options["dry_run"]:
+                    state = "would archive"
+                else:
+                    partitions.archive_partition(part.month)
+                    state = "archived now"
+            self.stdout.write(
+                f"{part.name:<32}{part.rows:>10}{part.bytes / 2**20:>8.1f}  {state}"
+            )
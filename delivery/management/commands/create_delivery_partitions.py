@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from delivery import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create monthly delivery partitions from the current month through "
+        "--months-ahead months, moving any rows parked in the DEFAULT "
+        "partition into their month. Run it monthly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3)
+        parser.add_argument("--from", dest="start", help="First month to create (YYYY-MM-DD); defaults to this month.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Delivery partitioning needs PostgreSQL")
+
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else date.today()
+        except ValueError:
+            raise CommandError("--from must be YYYY-MM-DD")
+
+        last = partitions.month_start(date.today())
+        for _ in range(options["months_ahead"]):
+            last = partitions.next_month(last)
+
+        created = partitions.ensure_partitions(start, last)
+        for name in created:
+            self.stdout.write(f"created {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions created"))
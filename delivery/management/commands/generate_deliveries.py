@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from delivery.generation import generate_range
+from delivery.sheet import exceptions_only
+
+
+class Command(BaseCommand):
+    help = "Generate deliveries for a date or a date range (backfill)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Single date (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument("--from", dest="start", help="Range start (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Range end (YYYY-MM-DD), inclusive.")
+
+    def handle(self, *args, **options):
+        try:
+            if options["start"] or options["end"]:
+                if not (options["start"] and options["end"]):
+                    raise CommandError("--from and --to must be given together")
+                start = date.fromisoformat(options["start"])
+                end = date.fromisoformat(options["end"])
+            else:
+                start = end = (
+                    date.fromisoformat(options["date"])
+                    if options["date"] else date.today()
+                )
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD")
+
+        if start > end:
+            raise CommandError("--from must not be after --to")
+
+        if exceptions_only():
+            self.stdout.write("Exception-only delivery storage: deliveries come from subscriptions")
+            return
+
+        result = generate_range(start, end)
+        self.stdout.write(self.style.SUCCESS(
+            f"{start} → {end}: {result.created} created, {result.skipped} skipped"
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_invoice(apps, schema_editor):
+    Delivery = apps.get_model("delivery", "Delivery")
+    InvoiceDelivery = apps.get_model("invoice", "InvoiceDelivery")
+
+    Delivery.objects.filter(invoicedelivery__isnull=False).update(
+        invoice_id=Subquery(
+            InvoiceDelivery.objects
+            .filter(delivery_id=OuterRef("pk"))
+            .values("invoice_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_customerbalance_ledgerentry'),
+        ('delivery', '0001_initial'),
+        ('invoice', '0002_billingrun'),
+        ('newspaper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='invoice',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='billed_deliveries', to='invoice.invoice'),
+        ),
+        migrations.RunPython(backfill_invoice, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(condition=models.Q(('invoice__isnull', True), ('status', 'DELIVERED')), fields=['customer', 'date'], name='delivery_unbilled_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:52
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_updated_at(apps, schema_editor):
+    Delivery = apps.get_model("delivery", "Delivery")
+    Delivery.objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0002_delivery_invoice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['date', 'updated_at'], name='delivery_date_updated_idx'),
+        ),
+    ]
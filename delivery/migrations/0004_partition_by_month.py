@@ -0,0 +1,138 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:05
+
+from datetime import date
+
+from django.db import migrations
+
+
+TABLE = "delivery_delivery"
+NEW = "delivery_delivery_partitioned"
+
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def _definitions(cursor):
+    """`(indexes, constraints)` of delivery_delivery as `(name, definition)` pairs."""
+    cursor.execute(
+        """
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)
+        """,
+        [TABLE],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('u', 'f', 'c')
+        """,
+        [TABLE],
+    )
+    return indexes, cursor.fetchall()
+
+
+def partition_by_month(apps, schema_editor):
+    """
+    Rebuild delivery_delivery as a table range-partitioned on `date`.
+
+    PostgreSQL requires the primary key of a partitioned table to include
+    the partition column, so the key becomes (id, date); `id` still comes
+    from a sequence and stays unique. Indexes and constraints are
+    recreated under their existing names.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        indexes, constraints = _definitions(cursor)
+
+        cursor.execute(f"SELECT min(date), max(date) FROM {TABLE}")
+        first, last = cursor.fetchone()
+        today = date.today()
+        first = (first or today).replace(day=1)
+        last = max(last or today, today)
+        # a few months of headroom; create_delivery_partitions adds more
+        for _ in range(3):
+            last = _next_month(last.replace(day=1))
+
+        cursor.execute(
+            f"CREATE TABLE {NEW} (LIKE {TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (date)"
+        )
+        cursor.execute(f"ALTER TABLE {NEW} ADD CONSTRAINT {TABLE}_pkey_new PRIMARY KEY (id, date)")
+
+        month = first
+        while month < last:
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_y{month.year}m{month.month:02d} "
+                f"PARTITION OF {NEW} FOR VALUES FROM (%s) TO (%s)",
+                [month, _next_month(month)],
+            )
+            month = _next_month(month)
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {NEW} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {NEW} SELECT * FROM {TABLE}")
+        cursor.execute(f"SELECT COALESCE(max(id), 0) + 1 FROM {TABLE}")
+        (next_id,) = cursor.fetchone()
+
+        cursor.execute(f"DROP TABLE {TABLE}")
+        cursor.execute(f"ALTER TABLE {NEW} RENAME TO {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {TABLE}_pkey_new TO {TABLE}_pkey")
+
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', %s, false)", [next_id])
+
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+        for name, definition in indexes:
+            cursor.execute(definition)
+
+
+def unpartition(apps, schema_editor):
+    """Rebuild delivery_delivery as a plain table keyed on `id` alone."""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        indexes, constraints = _definitions(cursor)
+
+        cursor.execute(f"CREATE TABLE {NEW} (LIKE {TABLE} INCLUDING DEFAULTS)")
+        # the old id sequence is dropped with the partitioned table
+        cursor.execute(f"ALTER TABLE {NEW} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(f"ALTER TABLE {NEW} ADD CONSTRAINT {TABLE}_pkey_new PRIMARY KEY (id)")
+
+        cursor.execute(f"INSERT INTO {NEW} SELECT * FROM {TABLE}")
+        cursor.execute(f"SELECT COALESCE(max(id), 0) + 1 FROM {TABLE}")
+        (next_id,) = cursor.fetchone()
+
+        cursor.execute(f"DROP TABLE {TABLE}")
+        cursor.execute(f"ALTER TABLE {NEW} RENAME TO {TABLE}")
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME CONSTRAINT {TABLE}_pkey_new TO {TABLE}_pkey")
+
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY")
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence(%s, 'id'), %s, false)", [TABLE, next_id],
+        )
+
+        for name, definition in constraints:
+            cursor.execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}")
+        for name, definition in indexes:
+            cursor.execute(definition.replace(" ON ONLY ", " ON "))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0003_delivery_updated_at'),
+        ('invoice', '0005_invoicedelivery_no_db_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_by_month, unpartition),
+    ]
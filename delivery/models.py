@@ -22,7 +22,18 @@ class Delivery(models.Model):
         default=Status.DELIVERED,
     )
 
+    # set when the delivery is put on an invoice; NULL means unbilled
+    invoice = models.ForeignKey(
+        'invoice.Invoice',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="billed_deliveries",
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
+    # drives the delta feed; queryset .update() calls must set it explicitly
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         constraints = [
@@ -31,6 +42,17 @@ class Delivery(models.Model):
                 name="unique_delivery_per_customer_per_day",
             )
         ]
+        indexes = [
+            models.Index(
+                fields=["customer", "date"],
+                name="delivery_unbilled_idx",
+                condition=models.Q(invoice__isnull=True, status="DELIVERED"),
+            ),
+            models.Index(
+                fields=["date", "updated_at"],
+                name="delivery_date_updated_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.customer.name} - {self.newspaper.name} - {self.date}"
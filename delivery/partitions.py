@@ -0,0 +1,178 @@
+"""
+Month partitions of the `delivery_delivery` table (PostgreSQL only).
+
+The table is range-partitioned on `date`, one partition per month, plus a
+DEFAULT partition that catches dates no month partition covers yet.
+Queries and `.update()` calls that filter on `date` only touch the
+partitions they need.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+
+
+PARENT = "delivery_delivery"
+DEFAULT = f"{PARENT}_default"
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{PARENT}_y{month.year}m{month.month:02d}"
+
+
+@dataclass
+class Partition:
+    name: str
+    month: date | None
+    rows: int
+    bytes: int
+    archived: bool
+
+
+def partitions():
+    """Every partition, oldest month first, the DEFAULT partition last."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname,
+                   c.reltuples::bigint,
+                   pg_total_relation_size(c.oid),
+                   COALESCE('autovacuum_enabled=false' = ANY(c.reloptions), false)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            [PARENT],
+        )
+        rows = cursor.fetchall()
+
+    result = []
+    for name, rows_estimate, size, archived in rows:
+        month = None
+        if name != DEFAULT:
+            year, mon = name[len(PARENT) + 2:].split("m")
+            month = date(int(year), int(mon), 1)
+        result.append(Partition(name, month, max(rows_estimate, 0), size, archived))
+    result.sort(key=lambda p: (p.month is None, p.month or date.min))
+    return result
+
+
+def create_partition(cursor, month):
+    """
+    Create the partition for `month` if it is missing. Rows already in
+    the DEFAULT partition for that month are moved into it, since a new
+    partition cannot be attached over matching default rows.
+
+    Returns True when a partition was created.
+    """
+    name = partition_name(month)
+    cursor.execute("SELECT to_regclass(%s)", [name])
+    if cursor.fetchone()[0] is not None:
+        return False
+
+    start, end = month, next_month(month)
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+
+    cursor.execute("SELECT to_regclass(%s)", [DEFAULT])
+    has_default = cursor.fetchone()[0] is not None
+    stranded = False
+    if has_default:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {DEFAULT} WHERE date >= %s AND date < %s)",
+            [start, end],
+        )
+        stranded = cursor.fetchone()[0]
+
+    if not stranded:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {PARENT} FOR VALUES {bounds}")
+        return True
+
+    cursor.execute(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {DEFAULT} WHERE date >= %s AND date < %s RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved",
+        [start, end],
+    )
+    cursor.execute(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} FOR VALUES {bounds}")
+    return True
+
+
+def ensure_partitions(first, last):
+    """Create month partitions from `first` through `last`; returns the names created."""
+    created = []
+    month = month_start(first)
+    with transaction.atomic(), connection.cursor() as cursor:
+        while month <= last:
+            if create_partition(cursor, month):
+                created.append(partition_name(month))
+            month = next_month(month)
+    return created
+
+
+# ============================
+# ARCHIVAL
+# ============================
+def unbilled_reason(month):
+    """Why the month cannot be archived yet, or None if it can."""
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {name} "
+            f"WHERE status = 'DELIVERED' AND invoice_id IS NULL)"
+        )
+        if cursor.fetchone()[0]:
+            return "has unbilled deliveries"
+        cursor.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {name} d "
+            f"JOIN invoice_invoice i ON i.id = d.invoice_id WHERE NOT i.is_locked)"
+        )
+        if cursor.fetchone()[0]:
+            return "has deliveries on unlocked invoices"
+    return None
+
+
+def archive_partition(month):
+    """
+    Compact a fully billed month in place: rewrite it in (customer, date)
+    order with no free space, freeze it, and turn autovacuum off for it, so
+    vacuum and index maintenance stop revisiting history. Moves it to
+    DELIVERY_ARCHIVE_TABLESPACE when that is set.
+
+    The partition stays attached: invoices, CSV exports and rollup
+    rebuilds still read these rows.
+    """
+    name = partition_name(month)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT i.relname
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = x.indkey[0]
+            WHERE x.indrelid = %s::regclass AND x.indisunique AND a.attname = 'customer_id'
+            """,
+            [name],
+        )
+        (index,) = cursor.fetchone()
+
+        tablespace = getattr(settings, "DELIVERY_ARCHIVE_TABLESPACE", "")
+        if tablespace:
+            cursor.execute(f"ALTER TABLE {name} SET TABLESPACE {connection.ops.quote_name(tablespace)}")
+
+        cursor.execute(
+            f"ALTER TABLE {name} SET (fillfactor = 100, autovacuum_enabled = false, "
+            f"toast.autovacuum_enabled = false)"
+        )
+        cursor.execute(f"CLUSTER {name} USING {index}")
+        # VACUUM cannot run inside a transaction; callers must be in autocommit
+        cursor.execute(f"VACUUM (FREEZE, ANALYZE) {name}")
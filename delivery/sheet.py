@@ -0,0 +1,162 @@
+"""
+Exception-only delivery storage (DELIVERY_STORAGE = "exceptions").
+
+A customer gets their subscribed paper at the day's price on every day
+an active subscription covers, unless a `Delivery` row for that customer
+and day says otherwise. Only those rows are stored: a status change or a
+price override. Sheets, rollups and bills are derived from subscriptions
+with the stored rows laid over them, so nothing is generated per day.
+Who is delivered on which day comes from customers.roster, as it does for
+generated rows.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.rollups import refresh_deliveries
+from customers import roster
+from invoice.models import Invoice
+from newspaper.pricing import PriceIndex, price_on
+from .models import Delivery
+
+
+def exceptions_only():
+    return settings.DELIVERY_STORAGE == "exceptions"
+
+
+def invoiced(day=OuterRef("date")):
+    """
+    True for a delivery whose customer has been invoiced through `day`
+    (the row's own date by default). Such days keep their status: a
+    change would no longer reach the bill.
+    """
+    return Exists(Invoice.objects.filter(customer=OuterRef("customer_id"), to_date__gte=day))
+
+
+def sheet(day):
+    """
+    The day's roster subscriptions annotated like a delivery: `status`,
+    `price` and `delivery_id`, taken from the stored row for the customer
+    and day if there is one.
+    """
+    stored = Delivery.objects.filter(customer=OuterRef("customer_id"), date=day)
+    return roster.daily(day).annotate(
+        delivery_id=Subquery(stored.values("id")[:1]),
+        status=Coalesce(
+            Subquery(stored.values("status")[:1]), Value(Delivery.Status.DELIVERED)
+        ),
+        price=Coalesce(Subquery(stored.values("price")[:1]), price_on(day)),
+    )
+
+
+def status_totals(day):
+    """Per-status count `c` and value `v` for `day`, like grouped `Delivery` rows."""
+    return (
+        sheet(day).order_by()
+        .values("status")
+        .annotate(c=Count("id"), v=Sum("price"))
+    )
+
+
+@transaction.atomic
+def set_status(day, status, area=None, newspaper_ids=None, customer_ids=None):
+    """
+    Set `status` for every customer on the day's sheet matching the
+    filter. Stored rows are updated and the rest are stored as new rows;
+    nothing is deleted, so the delta feed sees every change. Customers
+    already invoiced for the day are left alone.
+
+    Returns the number of customers whose status changed.
+    """
+    rows = sheet(day).exclude(status=status).exclude(invoiced(day))
+    if area:
+        rows = rows.filter(customer__area__iexact=area)
+    if newspaper_ids:
+        rows = rows.filter(newspaper_id__in=newspaper_ids)
+    if customer_ids:
+        rows = rows.filter(customer_id__in=customer_ids)
+
+    rows = list(rows.values_list("delivery_id", "id", "customer_id", "newspaper_id", "price"))
+    if not rows:
+        return 0
+
+    now = timezone.now()
+    Delivery.objects.filter(
+        id__in=[delivery_id for delivery_id, *_ in rows if delivery_id]
+    ).update(status=status, updated_at=now)
+    # a concurrent writer may store the same customer first; its row wins
+    Delivery.objects.bulk_create(
+        [
+            Delivery(
+                customer_id=customer_id,
+                subscription_id=sub_id,
+                newspaper_id=newspaper_id,
+                date=day,
+                price=price,
+                status=status,
+            )
+            for delivery_id, sub_id, customer_id, newspaper_id, price in rows
+            if not delivery_id
+        ],
+        ignore_conflicts=True,
+    )
+
+    # neither .update() nor bulk_create() sends signals
+    refresh_deliveries(day)
+    return len(rows)
+
+
+# ============================
+# BILLING
+# ============================
+@dataclass
+class Line:
+    customer_id: int
+    date: object
+    newspaper_id: int
+    price: object
+    # the stored row billed, if the day has one
+    delivery_id: int | None = None
+
+
+def billable_lines(starts, cutoff):
+    """
+    Delivered days through `cutoff` for each customer in `starts`, which
+    maps customer id -> first day to bill (None: their first subscription
+    day). Days whose stored row is already on an invoice are skipped.
+    Returns Lines in (customer, date) order.
+    """
+    span = roster.between(None, cutoff, customer_ids=starts, active_customers=False)
+    first = min(
+        [start for start in starts.values() if start]
+        + [e.start for entries in span.by_customer.values() for e in entries],
+        default=cutoff,
+    )
+    prices = PriceIndex(first, cutoff)
+    stored = {
+        (customer_id, day): (delivery_id, status, price, invoice_id)
+        for delivery_id, customer_id, day, status, price, invoice_id in (
+            Delivery.objects
+            .filter(customer_id__in=span.by_customer, date__gte=first, date__lte=cutoff)
+            .values_list("id", "customer_id", "date", "status", "price", "invoice_id")
+        )
+    }
+
+    lines = []
+    for customer_id, entries in span.by_customer.items():
+        day = starts.get(customer_id) or min(e.start for e in entries)
+        while day <= cutoff:
+            entry = span.pick(customer_id, day)
+            if entry:
+                delivery_id, status, price, invoice_id = stored.get((customer_id, day)) or (
+                    None, Delivery.Status.DELIVERED, prices.price(entry.newspaper_id, day), None
+                )
+                if status == Delivery.Status.DELIVERED and invoice_id is None:
+                    lines.append(Line(customer_id, day, entry.newspaper_id, price, delivery_id))
+            day += timedelta(days=1)
+    return lines
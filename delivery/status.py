@@ -0,0 +1,117 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+
+from core.rollups import refresh_deliveries
+from .models import Delivery
+from . import sheet
+
+
+MAX_CHANGES = 5000
+
+
+@dataclass
+class StatusResult:
+    by_status: Counter = field(default_factory=Counter)
+    # only known when explicit IDs were given
+    unchanged: int | None = None
+    missing: list | None = None
+    invoiced: list | None = None
+
+    @property
+    def updated(self):
+        return sum(self.by_status.values())
+
+    def as_dict(self):
+        return {
+            "updated": self.updated,
+            "by_status": dict(self.by_status),
+            "unchanged": self.unchanged,
+            "missing": self.missing,
+            "invoiced": self.invoiced,
+        }
+
+
+@transaction.atomic
+def apply_changes(changes):
+    """
+    Apply `(delivery_id, status)` pairs with one UPDATE.
+
+    Rows already in the requested status are left alone and counted as
+    unchanged; unknown IDs, and rows on days already invoiced, are
+    reported back. A later pair for the same ID wins.
+    """
+    wanted = dict(changes)
+    rows = (
+        Delivery.objects
+        .select_for_update()
+        .filter(id__in=wanted)
+        .annotate(invoiced=sheet.invoiced())
+        .values_list("id", "date", "status", "invoiced")
+    )
+
+    result = StatusResult(unchanged=0, invoiced=[])
+    ids_by_status = {}
+    days = set()
+    found = set()
+    for delivery_id, day, current, invoiced in rows:
+        found.add(delivery_id)
+        if invoiced:
+            result.invoiced.append(delivery_id)
+            continue
+        status = wanted[delivery_id]
+        if status == current:
+            result.unchanged += 1
+            continue
+        ids_by_status.setdefault(status, []).append(delivery_id)
+        result.by_status[status] += 1
+        days.add(day)
+    result.missing = sorted(set(wanted) - found)
+
+    if ids_by_status:
+        Delivery.objects.filter(
+            id__in=[i for ids in ids_by_status.values() for i in ids]
+        ).update(
+            status=Case(
+                *[When(id__in=ids, then=Value(s)) for s, ids in ids_by_status.items()]
+            ),
+            updated_at=timezone.now(),
+        )
+
+    # .update() skips post_save
+    for day in sorted(days):
+        refresh_deliveries(day)
+    return result
+
+
+@transaction.atomic
+def apply_filter(day, status, area=None, newspaper_ids=None, customer_ids=None):
+    """
+    Set every delivery on `day` matching the filter to `status`, with one
+    UPDATE. Customers already invoiced for the day are left alone.
+    """
+    result = StatusResult()
+    if sheet.exceptions_only():
+        updated = sheet.set_status(
+            day, status, area=area, newspaper_ids=newspaper_ids, customer_ids=customer_ids
+        )
+        if updated:
+            result.by_status[status] = updated
+        return result
+
+    deliveries = Delivery.objects.filter(date=day).exclude(status=status).exclude(sheet.invoiced(day))
+    if area:
+        deliveries = deliveries.filter(customer__area__iexact=area)
+    if newspaper_ids:
+        deliveries = deliveries.filter(newspaper_id__in=newspaper_ids)
+    if customer_ids:
+        deliveries = deliveries.filter(customer_id__in=customer_ids)
+
+    updated = deliveries.update(status=status, updated_at=timezone.now())
+    if updated:
+        result.by_status[status] = updated
+        refresh_deliveries(day)
+    return result
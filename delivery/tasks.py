@@ -0,0 +1,12 @@
+from datetime import date
+
+from core.jobs import task
+from .generation import generate_range
+
+
+@task("generate_deliveries")
+def generate_deliveries(job, start, end):
+    result = generate_range(
+        date.fromisoformat(start), date.fromisoformat(end), progress=job.report,
+    )
+    return {"created": result.created, "skipped": result.skipped}
@@ -1,3 +1,413 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
+from core import rollups
+from core.models import DailyRollup
+
+from customers.models import Customer, Subscription
+from invoice.billing import NothingToBill, bill_customer
+from newspaper.models import NewsPaper
+from newspaper.pricing import set_price
+from . import feed, partitions, sheet
+from .generation import generate_range
+from .models import Delivery
+from .status import MAX_CHANGES, apply_changes, apply_filter
+
+
+def subscribe(count, start, paper):
+    """`count` customers subscribed to `paper` from `start`."""
+    customers = []
+    for i in range(count):
+        customer = Customer.objects.create(name=f"C{i}", phone=f"+91 900000000{i}")
+        Subscription.objects.create(customer=customer, newspaper=paper, start_date=start)
+        customers.append(customer)
+    return customers
+
+
+@override_settings(DELIVERY_STORAGE="rows")
+class InvoicedDayTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.today = date.today()
+        self.billed, self.open = subscribe(2, self.today - timedelta(days=9), paper)
+        generate_range(self.today - timedelta(days=9), self.today + timedelta(days=1))
+        with transaction.atomic():
+            self.invoice = bill_customer(
+                self.billed.id, self.today - timedelta(days=1), self.user,
+            )
+
+    def test_billing_marks_its_deliveries(self):
+        rows = Delivery.objects.filter(customer=self.billed)
+        self.assertEqual(rows.filter(invoice=self.invoice).count(), 9)
+        self.assertFalse(rows.filter(date__gte=self.today, invoice__isnull=False).exists())
+
+        with transaction.atomic():
+            later = bill_customer(self.billed.id, self.today + timedelta(days=1), self.user)
+        self.assertEqual(later.from_date, self.today)
+        self.assertEqual(later.total_amount, Decimal("10.00"))
+
+    def test_filter_leaves_invoiced_days_alone(self):
+        day = self.today - timedelta(days=3)
+
+        result = apply_filter(day, Delivery.Status.HOLIDAY)
+
+        self.assertEqual(dict(result.by_status), {Delivery.Status.HOLIDAY: 1})
+        self.assertEqual(
+            dict(Delivery.objects.filter(date=day).values_list("customer_id", "status")),
+            {
+                self.billed.id: Delivery.Status.DELIVERED,
+                self.open.id: Delivery.Status.HOLIDAY,
+            },
+        )
+
+    def test_filter_reaches_days_after_the_invoice(self):
+        result = apply_filter(self.today, Delivery.Status.HOLIDAY)
+
+        self.assertEqual(result.updated, 2)
+
+
+@override_settings(DELIVERY_STORAGE="rows")
+class StatusBatchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.today = date.today()
+        self.customers = subscribe(3, self.today - timedelta(days=2), paper)
+        generate_range(self.today - timedelta(days=2), self.today)
+        with transaction.atomic():
+            bill_customer(self.customers[0].id, self.today - timedelta(days=1), self.user)
+
+        self.ids = dict(
+            Delivery.objects.filter(date=self.today).values_list("customer_id", "id")
+        )
+        self.invoiced_id = Delivery.objects.get(
+            customer=self.customers[0], date=self.today - timedelta(days=1),
+        ).id
+
+    def _statuses(self):
+        return dict(Delivery.objects.filter(date=self.today).values_list("id", "status"))
+
+    def test_apply_changes(self):
+        first, second, third = (self.ids[c.id] for c in self.customers)
+        before = dict(Delivery.objects.values_list("id", "updated_at"))
+
+        result = apply_changes([
+            (first, Delivery.Status.NOT_DELIVERED),
+            (second, Delivery.Status.HOLIDAY),
+            (third, Delivery.Status.DELIVERED),
+            (self.invoiced_id, Delivery.Status.HOLIDAY),
+            (999999, Delivery.Status.HOLIDAY),
+            # a later pair for the same ID wins
+            (first, Delivery.Status.HOLIDAY),
+        ])
+
+        self.assertEqual(result.as_dict(), {
+            "updated": 2,
+            "by_status": {Delivery.Status.HOLIDAY: 2},
+            "unchanged": 1,
+            "missing": [999999],
+            "invoiced": [self.invoiced_id],
+        })
+        self.assertEqual(self._statuses(), {
+            first: Delivery.Status.HOLIDAY,
+            second: Delivery.Status.HOLIDAY,
+            third: Delivery.Status.DELIVERED,
+        })
+        self.assertEqual(
+            Delivery.objects.get(pk=self.invoiced_id).status, Delivery.Status.DELIVERED,
+        )
+
+        after = dict(Delivery.objects.values_list("id", "updated_at"))
+        self.assertEqual(
+            {i for i in after if after[i] != before[i]}, {first, second},
+        )
+        rollup = DailyRollup.objects.get(date=self.today)
+        self.assertEqual((rollup.holiday_count, rollup.delivered_count), (2, 1))
+        self.assertEqual(rollup.delivered_value, Decimal("5.00"))
+
+    def test_batch_view(self):
+        self.client.force_login(self.user)
+        url = reverse("batch_update_status")
+        second = self.ids[self.customers[1].id]
+
+        def post(payload):
+            return self.client.post(url, payload, content_type="application/json")
+
+        response = post({"changes": [[second, Delivery.Status.NOT_DELIVERED]]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["by_status"], {Delivery.Status.NOT_DELIVERED: 1})
+
+        response = post({"date": self.today.isoformat(), "status": Delivery.Status.HOLIDAY})
+        self.assertEqual(response.json()["updated"], 3)
+
+        for payload in (
+            {"changes": [[second, "LOST"]]},
+            {"changes": [[second, Delivery.Status.HOLIDAY]] * (MAX_CHANGES + 1)},
+            {"status": Delivery.Status.HOLIDAY},
+            [1, 2],
+        ):
+            self.assertEqual(post(payload).status_code, 400, payload)
+        self.assertEqual(
+            set(self._statuses().values()), {Delivery.Status.HOLIDAY},
+        )
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.today = date.today()
+        self.customers = subscribe(3, self.today, paper)
+        self.client.force_login(self.user)
+
+    def _get(self, since=None, **headers):
+        params = {"date": self.today.isoformat()}
+        if since is not None:
+            params["since"] = since
+        return self.client.get(reverse("delivery_feed"), params, **headers)
+
+    def test_cursor_round_trip(self):
+        now = timezone.now()
+        self.assertEqual(feed.decode_cursor(feed.encode_cursor(now)), now)
+        self.assertEqual(feed.encode_cursor(None), "0")
+
+    @override_settings(DELIVERY_STORAGE="rows")
+    def test_since_resends_the_overlap_window(self):
+        generate_range(self.today, self.today)
+        old, recent, latest = (
+            Delivery.objects.get(customer=c, date=self.today).id for c in self.customers
+        )
+        cursor_at = timezone.now() - timedelta(minutes=1)
+        for delivery_id, at in [
+            (old, cursor_at - timedelta(minutes=1)),
+            (recent, cursor_at - feed.OVERLAP / 2),
+            (latest, cursor_at),
+        ]:
+            Delivery.objects.filter(pk=delivery_id).update(updated_at=at)
+
+        full = self._get().json()
+        self.assertTrue(full["full"])
+        self.assertEqual((full["count"], len(full["rows"])), (3, 3))
+        self.assertEqual(full["cursor"], feed.encode_cursor(cursor_at))
+
+        delta = self._get(full["cursor"]).json()
+        self.assertFalse(delta["full"])
+        self.assertEqual({row["id"] for row in delta["rows"]}, {recent, latest})
+
+    @override_settings(DELIVERY_STORAGE="rows")
+    def test_etag_changes_with_the_sheet(self):
+        generate_range(self.today, self.today)
+        response = self._get()
+        etag = response["ETag"]
+        self.assertEqual(self._get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        apply_filter(self.today, Delivery.Status.HOLIDAY, customer_ids=[self.customers[0].id])
+
+        changed = self._get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], etag)
+        rows = self._get(response.json()["cursor"]).json()["rows"]
+        self.assertIn(
+            (self.customers[0].id, Delivery.Status.HOLIDAY),
+            [(row["customer_id"], row["status"]) for row in rows],
+        )
+
+    @override_settings(DELIVERY_STORAGE="exceptions")
+    def test_exceptions_only_sheet(self):
+        full = self._get().json()
+        self.assertEqual((full["count"], full["cursor"]), (3, "0"))
+        self.assertEqual(
+            [(row["id"], row["status"]) for row in full["rows"]],
+            [(None, Delivery.Status.DELIVERED)] * 3,
+        )
+
+        apply_filter(self.today, Delivery.Status.HOLIDAY, customer_ids=[self.customers[1].id])
+
+        delta = self._get(full["cursor"]).json()
+        self.assertEqual(delta["count"], 3)
+        self.assertEqual(
+            [(row["customer_id"], row["status"]) for row in delta["rows"]],
+            [(self.customers[1].id, Delivery.Status.HOLIDAY)],
+        )
+
+    def test_bad_requests(self):
+        self.assertEqual(self._get("-1").status_code, 400)
+        self.assertEqual(self._get("soon").status_code, 400)
+        self.assertEqual(self.client.get(reverse("delivery_feed")).status_code, 400)
+
+
+def partition_rows(name, day):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT count(*) FROM {name} WHERE date = %s", [day])
+        return cursor.fetchone()[0]
+
+
+@override_settings(DELIVERY_STORAGE="rows")
+class PartitionTests(TestCase):
+    def setUp(self):
+        self.paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        # months no migration or earlier run has created
+        self.month = date(date.today().year + 5, 1, 1)
+
+    def test_ensure_partitions_creates_each_month_once(self):
+        last = self.month.replace(month=3)
+
+        created = partitions.ensure_partitions(self.month, last)
+
+        self.assertEqual(created, [
+            "delivery_delivery_y{}m01".format(self.month.year),
+            "delivery_delivery_y{}m02".format(self.month.year),
+            "delivery_delivery_y{}m03".format(self.month.year),
+        ])
+        self.assertEqual(partitions.ensure_partitions(self.month, last), [])
+
+        found = partitions.partitions()
+        self.assertEqual(found[-1].name, partitions.DEFAULT)
+        months = [p.month for p in found[:-1]]
+        self.assertEqual(months, sorted(months))
+        self.assertIn(last, months)
+
+    def test_new_partition_takes_rows_from_default(self):
+        day = self.month.replace(day=10)
+        subscribe(2, day, self.paper)
+        generate_range(day, day)
+        self.assertEqual(partition_rows(partitions.DEFAULT, day), 2)
+
+        partitions.ensure_partitions(day, day)
+
+        self.assertEqual(partition_rows(partitions.DEFAULT, day), 0)
+        self.assertEqual(partition_rows(partitions.partition_name(self.month), day), 2)
+        self.assertEqual(Delivery.objects.filter(date=day).count(), 2)
+
+
+@override_settings(DELIVERY_STORAGE="rows")
+class PartitionArchiveTests(TransactionTestCase):
+    """VACUUM cannot run in a transaction, so these run in autocommit."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        today = date.today()
+        self.month = date(today.year - 1, today.month, 1)
+        partitions.ensure_partitions(self.month, self.month)
+        (self.customer,) = subscribe(1, self.month, paper)
+        generate_range(self.month, self.month + timedelta(days=2))
+
+    def _state(self):
+        out = StringIO()
+        call_command("archive_delivery_partitions", "--dry-run", stdout=out)
+        name = partitions.partition_name(self.month)
+        return next(line for line in out.getvalue().splitlines() if line.startswith(name))
+
+    def test_only_billed_locked_months_are_archived(self):
+        self.assertEqual(partitions.unbilled_reason(self.month), "has unbilled deliveries")
+        self.assertIn("kept: has unbilled deliveries", self._state())
+
+        with transaction.atomic():
+            invoice = bill_customer(self.customer.id, self.month + timedelta(days=2), self.user)
+        invoice.is_locked = False
+        invoice.save(update_fields=["is_locked"])
+        self.assertEqual(
+            partitions.unbilled_reason(self.month), "has deliveries on unlocked invoices",
+        )
+
+        invoice.is_locked = True
+        invoice.save(update_fields=["is_locked"])
+        self.assertIsNone(partitions.unbilled_reason(self.month))
+        self.assertIn("would archive", self._state())
+
+        partitions.archive_partition(self.month)
+
+        (archived,) = [p for p in partitions.partitions() if p.month == self.month]
+        self.assertTrue(archived.archived)
+        self.assertIn("archived", self._state())
+        self.assertEqual(Delivery.objects.filter(invoice=invoice).count(), 3)
+
+
+class ExceptionStorageTests(TestCase):
+    """Exception-only storage must add up to what generated rows give."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        self.end = date.today()
+        self.start = self.end - timedelta(days=6)
+        times = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        herald = NewsPaper.objects.create(name="Herald", price_per_day=Decimal("4.00"))
+        set_price(herald, self.start + timedelta(days=3), Decimal("6.00"), Decimal("8.00"))
+
+        self.customers = subscribe(3, self.start, times)
+        switched, ended, _ = self.customers
+        # a switch of paper mid-way, and a subscription that ran out
+        Subscription.objects.filter(customer=switched).update(
+            is_active=False, end_date=self.start + timedelta(days=1),
+        )
+        Subscription.objects.create(
+            customer=switched, newspaper=herald, start_date=self.start + timedelta(days=2),
+        )
+        Subscription.objects.filter(customer=ended).update(
+            is_active=False, end_date=self.start + timedelta(days=4),
+        )
+        self.herald = herald
+
+    def _run(self, storage):
+        """Totals, sheets and bills for one storage mode, rolled back after."""
+        days = [self.start + timedelta(days=i) for i in range(7)]
+        with override_settings(DELIVERY_STORAGE=storage), transaction.atomic():
+            if storage == "rows":
+                generate_range(self.start, self.end)
+            apply_filter(days[1], Delivery.Status.HOLIDAY, customer_ids=[self.customers[0].id])
+            apply_filter(days[4], Delivery.Status.NOT_DELIVERED, newspaper_ids=[self.herald.id])
+            apply_filter(days[5], Delivery.Status.HOLIDAY)
+
+            totals = {day: rollups.delivery_totals(day) for day in days}
+            sheets = {
+                day: sorted(
+                    (row.customer_id, row.newspaper_id, row.status, row.price)
+                    for row in sheet.sheet(day)
+                )
+                for day in days
+            }
+            bills = {}
+            for customer in self.customers:
+                try:
+                    with transaction.atomic():
+                        invoice = bill_customer(customer.id, self.end, self.user)
+                except NothingToBill:
+                    continue
+                bills[customer.id] = (
+                    invoice.from_date, invoice.total_amount, invoice.invoicedelivery_set.count(),
+                )
+            transaction.set_rollback(True)
+        return totals, sheets, bills
+
+    def test_matches_row_storage(self):
+        rows = self._run("rows")
+        exceptions = self._run("exceptions")
+
+        for name, expected, got in zip(("totals", "sheets", "bills"), rows, exceptions):
+            with self.subTest(name):
+                self.assertEqual(got, expected)
+
+        totals = rows[0]
+        self.assertEqual(totals[self.start]["deliveries_total"], 3)
+        self.assertEqual(totals[self.end]["deliveries_total"], 2)
+        self.assertEqual(totals[self.start + timedelta(days=5)]["holiday_count"], 2)
+
+    @override_settings(DELIVERY_STORAGE="exceptions")
+    def test_only_changes_are_stored(self):
+        apply_filter(self.end, Delivery.Status.HOLIDAY, customer_ids=[self.customers[2].id])
+        apply_filter(self.end, Delivery.Status.DELIVERED, customer_ids=[self.customers[2].id])
+
+        self.assertEqual(
+            list(Delivery.objects.values_list("customer_id", "date", "status")),
+            [(self.customers[2].id, self.end, Delivery.Status.DELIVERED)],
+        )
@@ -6,5 +6,8 @@ urlpatterns = [
     path('generate/', generate_deliveries, name='generate_deliveries'),
     path("bulk-status/", bulk_update_status, name="bulk_update_status"),
      path("update-status/", update_delivery_status, name="update_delivery_status"),
+    path("status/batch/", batch_update_status, name="batch_update_status"),
+    path("feed/", delivery_feed, name="delivery_feed"),
+    path("forecast/", delivery_forecast, name="delivery_forecast"),
 
 ]
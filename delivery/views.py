@@ -1,11 +1,23 @@
+import json
+
 from django.shortcuts import render, redirect
-from datetime import date as dt_date
+from datetime import date as dt_date, timedelta
 from .models import Delivery
-from customers.models import Subscription
-from django.db.models import Q
+from customers import roster
+from newspaper.models import NewsPaper
 from django.urls import reverse
-from django.http import HttpResponseBadRequest
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_GET, require_POST
+from django.utils.cache import get_conditional_response, quote_etag
 from django.conf import settings
+from django.contrib import messages
+from .generation import generate_for_date
+from .status import MAX_CHANGES, apply_changes, apply_filter
+from . import feed, sheet
+from core import caching, jobs
+from core.pagination import InvalidCursor, json_page, paginate, wants_json
+from customers.search import matching_customer_ids
 
 
 def delivery_list_view(request):
@@ -17,26 +29,46 @@ def delivery_list_view(request):
         if selected_date else dt_date.today()
     )
 
+    derived = sheet.exceptions_only()
     deliveries = (
-        Delivery.objects
-        .filter(date=selected_date)
-        .select_related("customer", "newspaper")
-        .order_by("customer__name")
-    )
+        sheet.sheet(selected_date) if derived
+        else Delivery.objects.filter(date=selected_date)
+    ).select_related("customer", "newspaper")
 
     if search:
         deliveries = deliveries.filter(
-            Q(customer__name__icontains=search) |
-            Q(customer__phone__icontains=search)
+            customer_id__in=matching_customer_ids(search)
         )
 
+    try:
+        page = paginate(request, deliveries, ("customer__name", "id"))
+    except InvalidCursor as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    if wants_json(request):
+        return json_page(page, [
+            {
+                # null for a derived delivery with no stored row
+                "id": d.delivery_id if derived else d.id,
+                "customer_id": d.customer_id,
+                "customer": d.customer.name,
+                "newspaper": d.newspaper.name,
+                "price": d.price,
+                "status": d.status,
+            }
+            for d in page.items
+        ])
+
     return render(request, "delivery/delivery_page.html", {
-        "deliveries": deliveries,
+        "deliveries": page.items,
+        "page": page,
         "selected_date": selected_date,
-        "deliveries_exist": deliveries.exists(),
+        # derived sheets need no generating
+        "deliveries_exist": derived or bool(page.items) or deliveries.exists(),
     })
 
 
+@login_required
 def generate_deliveries(request):
     if request.method != "POST":
         return redirect("delivery")
@@ -46,26 +78,17 @@ def generate_deliveries(request):
     if getattr(settings, "PROD_MODE", False) and selected_date > dt_date.today():
         return HttpResponseBadRequest("Future deliveries not allowed")
 
-    subs = (
-        Subscription.objects
-        .select_related("customer", "newspaper")
-        .filter(
-            is_active=True,
-            customer__is_active=True,
-            start_date__lte=selected_date,
-        )
-        .filter(
-            Q(end_date__isnull=True) | Q(end_date__gte=selected_date)
-        )
-    )
-
-    for sub in subs:
-        Delivery.objects.get_or_create(
-            customer=sub.customer,
-            subscription=sub,
-            newspaper=sub.newspaper,
-            date=selected_date,
-            defaults={"price": sub.newspaper.price_per_day},
+    if sheet.exceptions_only():
+        messages.info(request, "Deliveries come from subscriptions; nothing to generate")
+    elif settings.BACKGROUND_JOBS:
+        day = selected_date.isoformat()
+        job = jobs.enqueue("generate_deliveries", user=request.user, start=day, end=day)
+        return redirect("job_detail", job_id=job.id)
+    else:
+        result = generate_for_date(selected_date)
+        messages.info(
+            request,
+            f"{result.created} deliveries created, {result.skipped} already existed",
         )
 
     return redirect(f"{reverse('delivery')}?date={selected_date}")
@@ -78,7 +101,7 @@ def bulk_update_status(request):
     selected_date = dt_date.fromisoformat(request.POST["date"])
     status = request.POST["status"]
 
-    Delivery.objects.filter(date=selected_date).update(status=status)
+    apply_filter(selected_date, status)
 
     return redirect(f"{reverse('delivery')}?date={selected_date}")
 
@@ -86,15 +109,143 @@ def update_delivery_status(request):
     if request.method != "POST":
         return redirect("delivery")
 
-    delivery_id = request.POST["delivery_id"]
+    # keyed by customer and day, which derived deliveries also have
+    customer_id = int(request.POST["customer_id"])
     status = request.POST["status"]
-    date = request.POST["date"]
+    date = dt_date.fromisoformat(request.POST["date"])
 
-    Delivery.objects.filter(id=delivery_id).update(status=status)
+    if status in Delivery.Status.values:
+        apply_filter(date, status, customer_ids=[customer_id])
 
     return redirect(f"{reverse('delivery')}?date={date}")
 
 
-
-
-
+def _int_list(values):
+    if not isinstance(values, list):
+        raise ValueError("expected a list of IDs")
+    return [int(v) for v in values]
+
+
+@login_required
+@require_POST
+def batch_update_status(request):
+    """
+    JSON body, either explicit pairs:
+        {"changes": [[delivery_id, status], ...]}
+    (IDs of stored rows; in exception-only storage a derived delivery has
+    none, so use customer_ids) or a filter for one day:
+        {"date": "YYYY-MM-DD", "status": "...", "area": "...",
+         "newspaper_ids": [...], "customer_ids": [...]}
+    """
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "Body must be JSON"}, status=400)
+    if not isinstance(payload, dict):
+        return JsonResponse({"error": "Body must be a JSON object"}, status=400)
+
+    statuses = set(Delivery.Status.values)
+
+    try:
+        if "changes" in payload:
+            changes = [(int(i), s) for i, s in payload["changes"]]
+            if len(changes) > MAX_CHANGES:
+                raise ValueError(f"at most {MAX_CHANGES} changes per request")
+            if any(s not in statuses for _, s in changes):
+                raise ValueError("unknown status")
+            result = apply_changes(changes)
+        else:
+            status = payload.get("status")
+            if status not in statuses:
+                raise ValueError("unknown status")
+            result = apply_filter(
+                dt_date.fromisoformat(payload["date"]),
+                status,
+                area=payload.get("area"),
+                newspaper_ids=_int_list(payload.get("newspaper_ids", [])),
+                customer_ids=_int_list(payload.get("customer_ids", [])),
+            )
+    except KeyError as exc:
+        return JsonResponse({"error": f"missing {exc}"}, status=400)
+    except (TypeError, ValueError) as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    return JsonResponse(result.as_dict())
+
+
+@login_required
+@require_GET
+def delivery_feed(request):
+    """
+    JSON rows of one day's sheet changed since `?since=<cursor>` (the
+    whole sheet without it). Pass the returned cursor next time; rows may
+    repeat, so clients upsert by customer_id (a customer has one delivery a
+    day; `id` is null for derived deliveries); a `count` that disagrees
+    with the local copy means rows were removed and the sheet should be
+    reloaded.
+    Unchanged sheets answer 304.
+    """
+    try:
+        day = dt_date.fromisoformat(request.GET["date"])
+        since = request.GET.get("since")
+        since_at = feed.decode_cursor(since) if since else None
+    except KeyError:
+        return JsonResponse({"error": "missing date"}, status=400)
+    except (ValueError, OverflowError):
+        return JsonResponse({"error": "bad date or cursor"}, status=400)
+
+    latest, count = feed.sheet_state(day)
+    etag = quote_etag(feed.etag(day, since, latest, count))
+
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        return not_modified
+
+    response = JsonResponse({
+        "date": day.isoformat(),
+        "cursor": feed.encode_cursor(latest),
+        "count": count,
+        "full": since_at is None,
+        "rows": feed.changed_rows(day, since_at),
+    })
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+MAX_FORECAST_DAYS = 62
+
+
+@login_required
+@require_GET
+def delivery_forecast(request):
+    """
+    Expected deliveries per day and paper for `?from=&to=` (default: the
+    week from today), from the subscription roster.
+    """
+    try:
+        start = dt_date.fromisoformat(request.GET.get("from") or dt_date.today().isoformat())
+        end = dt_date.fromisoformat(request.GET.get("to") or (start + timedelta(days=6)).isoformat())
+    except ValueError:
+        return JsonResponse({"error": "bad date"}, status=400)
+    if not 0 <= (end - start).days < MAX_FORECAST_DAYS:
+        return JsonResponse({"error": f"give a range of 1 to {MAX_FORECAST_DAYS} days"}, status=400)
+
+    newspapers = caching.cached(
+        "newspapers", caching.NEWSPAPERS_ALL_KEY, lambda: list(NewsPaper.objects.all())
+    )
+    names = {paper.id: paper.name for paper in newspapers}
+
+    return JsonResponse({
+        "from": start,
+        "to": end,
+        "days": [
+            {
+                "date": day,
+                "total": sum(counts.values()),
+                "value": value,
+                "newspapers": {names.get(n, n): c for n, c in counts.items()},
+            }
+            for day, counts, value in roster.forecast(start, end)
+        ],
+    })
@@ -0,0 +1,259 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Max, OuterRef, Q, Subquery, Value, When
+from django.utils import timezone
+
+from core import caching, rollups
+from customers.ledger import record_invoice
+from customers.models import Customer
+from delivery import sheet
+from delivery.models import Delivery
+from .models import BillingRun, Invoice, InvoiceDelivery
+
+
+def _unbilled(customer_ids, cutoff):
+    """DELIVERED rows up to `cutoff` not yet on any invoice, after each customer's last invoice."""
+    last_to = (
+        Invoice.objects
+        .filter(customer=OuterRef("customer_id"))
+        .order_by("-to_date")
+        .values("to_date")[:1]
+    )
+    return (
+        Delivery.objects
+        .filter(
+            customer_id__in=customer_ids,
+            status=Delivery.Status.DELIVERED,
+            date__lte=cutoff,
+            invoice__isnull=True,
+        )
+        .annotate(last_to=Subquery(last_to))
+        .filter(Q(last_to__isnull=True) | Q(date__gt=F("last_to")))
+    )
+
+
+def _last_invoiced(customer_ids):
+    return dict(
+        Invoice.objects
+        .filter(customer_id__in=customer_ids)
+        .order_by()
+        .values("customer_id")
+        .annotate(last_to=Max("to_date"))
+        .values_list("customer_id", "last_to")
+    )
+
+
+def _lines(customer_ids, cutoff):
+    """
+    `(last_to, lines)`: each customer's last invoiced day and their
+    billable `(delivery_id, customer_id, newspaper_id, price, date)` lines,
+    in (customer, date) order.
+    """
+    if sheet.exceptions_only():
+        # no rows to lock: lock the customers, as bill_customer does
+        list(Customer.objects.select_for_update().filter(id__in=customer_ids).values_list("id"))
+        last_to = _last_invoiced(customer_ids)
+        starts = {
+            c: last_to[c] + timedelta(days=1) if c in last_to else None
+            for c in customer_ids
+        }
+        return last_to, [
+            (line.delivery_id, line.customer_id, line.newspaper_id, line.price, line.date)
+            for line in sheet.billable_lines(starts, cutoff)
+        ]
+
+    # lock the rows we are about to link; totals are summed from this same
+    # snapshot so an invoice can never disagree with its link rows
+    rows = list(
+        _unbilled(customer_ids, cutoff)
+        .select_for_update()
+        .order_by("customer_id", "date")
+        .values_list("id", "customer_id", "newspaper_id", "price", "date", "last_to")
+    )
+    last_to = {customer_id: last for _, customer_id, *_, last in rows if last}
+    return last_to, [row[:5] for row in rows]
+
+
+class NothingToBill(Exception):
+    pass
+
+
+@transaction.atomic
+def bill_customer(customer_id, to_date, user):
+    """
+    Invoice one customer's delivered, unbilled days from the day after
+    their last invoice (or their first delivery) through `to_date`.
+    Raises NothingToBill when there are none.
+    """
+    # the lock serialises billing of one customer; in exception-only
+    # storage there are no delivery rows to lock instead
+    customer = Customer.objects.select_for_update().get(pk=customer_id)
+
+    last_invoice = (
+        Invoice.objects
+        .filter(customer=customer)
+        .order_by("-to_date")
+        .first()
+    )
+    # None: from the first delivery, which may be of an ended subscription
+    start = last_invoice.to_date + timedelta(days=1) if last_invoice else None
+
+    if sheet.exceptions_only():
+        lines = sheet.billable_lines({customer.id: start}, to_date)
+    else:
+        deliveries = Delivery.objects.filter(
+            customer=customer,
+            date__lte=to_date,
+            status="DELIVERED",
+            invoice__isnull=True,
+        )
+        if start:
+            deliveries = deliveries.filter(date__gte=start)
+        lines = [
+            sheet.Line(customer.id, d.date, d.newspaper_id, d.price, d.id)
+            for d in deliveries.order_by("date").select_for_update()
+        ]
+
+    if not lines:
+        raise NothingToBill("No deliveries to invoice")
+
+    total = sum(line.price for line in lines)
+
+    invoice = Invoice.objects.create(
+        customer=customer,
+        from_date=start or lines[0].date,
+        to_date=to_date,
+        total_amount=total,
+        created_by=user
+    )
+
+    InvoiceDelivery.objects.bulk_create([
+        InvoiceDelivery(
+            invoice=invoice,
+            delivery_id=line.delivery_id,
+            date=line.date,
+            newspaper_id=line.newspaper_id,
+            delivery_price=line.price
+        )
+        for line in lines
+    ])
+    Delivery.objects.filter(
+        id__in=[line.delivery_id for line in lines if line.delivery_id]
+    ).update(invoice=invoice, updated_at=timezone.now())
+
+    record_invoice(invoice)
+    return invoice
+
+
+def _bill_chunk(run, customer_ids):
+    last_to, rows = _lines(customer_ids, run.cutoff_date)
+    if not rows:
+        return 0, 0
+
+    totals = {}
+    for _, customer_id, _, price, day in rows:
+        if customer_id not in totals:
+            last = last_to.get(customer_id)
+            from_date = last + timedelta(days=1) if last else day
+            totals[customer_id] = [from_date, 0]
+        totals[customer_id][1] += price
+
+    invoices = [
+        Invoice(
+            customer_id=customer_id,
+            from_date=from_date,
+            to_date=run.cutoff_date,
+            total_amount=total,
+            created_by_id=run.created_by_id,
+        )
+        for customer_id, (from_date, total) in totals.items()
+    ]
+
+    invoices = Invoice.objects.bulk_create(invoices)
+    invoice_for = {inv.customer_id: inv for inv in invoices}
+
+    InvoiceDelivery.objects.bulk_create(
+        [
+            InvoiceDelivery(
+                invoice=invoice_for[customer_id],
+                delivery_id=delivery_id,
+                date=day,
+                newspaper_id=newspaper_id,
+                delivery_price=price,
+            )
+            for delivery_id, customer_id, newspaper_id, price, day in rows
+        ],
+        batch_size=2000,
+    )
+    Delivery.objects.filter(
+        id__in=[delivery_id for delivery_id, *_ in rows if delivery_id]
+    ).update(
+        invoice_id=Case(
+            *[When(customer_id=inv.customer_id, then=Value(inv.id)) for inv in invoices]
+        ),
+        updated_at=timezone.now(),
+    )
+
+    # bulk_create skips post_save, so post ledger/rollups explicitly
+    billed = 0
+    for inv in invoices:
+        record_invoice(inv)
+        caching.billing_changed(inv.customer_id, timezone.localdate())
+        billed += inv.total_amount
+    rollups.bump(timezone.localdate(), billed_amount=billed)
+
+    return len(invoices), billed
+
+
+def pending_customers(run):
+    """Active customers `run` has still to bill, in id order."""
+    customers = Customer.objects.filter(is_active=True, id__gt=run.last_customer_id)
+    if run.billing_day:
+        customers = customers.filter(billing_day=run.billing_day)
+    return customers.order_by("id")
+
+
+def run_billing(run):
+    """
+    Bill every active customer (of `run.billing_day`'s cycle, if set) up
+    to `run.cutoff_date`.
+
+    Customers are processed in id order, `run.chunk_size` at a time. Each
+    chunk commits together with the run checkpoint, so calling this again
+    on a crashed run picks up after the last committed chunk.
+    """
+    if run.status == BillingRun.Status.DONE:
+        return run
+
+    run.status = BillingRun.Status.RUNNING
+    run.started_at = run.started_at or timezone.now()
+    run.error = ""
+    run.save(update_fields=["status", "started_at", "error"])
+
+    try:
+        while True:
+            customer_ids = list(
+                pending_customers(run).values_list("id", flat=True)[:run.chunk_size]
+            )
+            if not customer_ids:
+                break
+
+            with transaction.atomic():
+                created, billed = _bill_chunk(run, customer_ids)
+                run.last_customer_id = customer_ids[-1]
+                run.customers_billed += created
+                run.total_amount += billed
+                run.save(update_fields=[
+                    "last_customer_id", "customers_billed", "total_amount",
+                ])
+    except Exception as exc:
+        run.status = BillingRun.Status.FAILED
+        run.error = str(exc)
+        run.save(update_fields=["status", "error"])
+        raise
+
+    run.status = BillingRun.Status.DONE
+    run.finished_at = timezone.now()
+    run.save(update_fields=["status", "finished_at"])
+    return run
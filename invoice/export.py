@@ -0,0 +1,103 @@
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from django.conf import settings
+
+from . import pdf_cache
+from .models import Invoice
+
+
+class _ChunkWriter:
+    """Write-only, non-seekable sink; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def filter_invoices(start=None, end=None, area=None, ids=None):
+    """Invoices whose billing period ends in [start, end], optionally by area or ids."""
+    invoices = Invoice.objects.all()
+    if start:
+        invoices = invoices.filter(to_date__gte=start)
+    if end:
+        invoices = invoices.filter(to_date__lte=end)
+    if area:
+        invoices = invoices.filter(customer__area__iexact=area)
+    if ids:
+        invoices = invoices.filter(id__in=ids)
+    return invoices
+
+
+def _payloads(invoices):
+    rows = (
+        invoices
+        .select_related("customer")
+        .only(
+            "id", "customer__name", "from_date", "to_date", "total_amount",
+            "paid_amount", "status", "paid_at", "created_at",
+        )
+        .order_by("id")
+    )
+    for invoice in rows.iterator(chunk_size=500):
+        yield pdf_cache.export_payload(invoice)
+
+
+def stream_pdf_zip(invoices, workers=None):
+    """
+    Yield a ZIP archive of invoice PDFs chunk by chunk.
+
+    PDFs are read from the invoice PDF cache, or rendered into it, across
+    a process pool with at most `2 * workers` in flight, and each one is
+    written to the archive as soon as it is ready in invoice-id order, so
+    memory stays bounded regardless of how many invoices match. They are
+    the same bytes the invoice's own PDF download serves.
+    """
+    workers = workers or settings.INVOICE_EXPORT_WORKERS
+    sink = _ChunkWriter()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED)
+
+    # spawned, not forked: this may run in a run_jobs worker thread, and
+    # forking a multi-threaded process can copy a lock held mid-update
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+    pending = deque()
+
+    def write_next():
+        payload, future = pending.popleft()
+        name, data, rendered = future.result()
+        if rendered:
+            pdf_cache.stored(payload, data)
+        archive.writestr(name, data)
+        return sink.drain()
+
+    try:
+        for payload in _payloads(invoices):
+            pending.append((payload, executor.submit(pdf_cache.render_cached, payload)))
+            if len(pending) >= workers * 2:
+                yield write_next()
+
+        while pending:
+            yield write_next()
+
+        archive.close()
+        yield sink.drain()
+    finally:
+        executor.shutdown(cancel_futures=True)
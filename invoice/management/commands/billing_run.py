@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.billing import run_billing
+from invoice.models import BillingRun
+
+
+class Command(BaseCommand):
+    help = "Bill all active customers up to a cutoff date, or resume an unfinished run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cutoff", help="Bill deliveries up to this date (YYYY-MM-DD).")
+        parser.add_argument("--user", help="Username recorded as the invoices' creator.")
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--resume", type=int, metavar="RUN_ID", help="Resume an unfinished run.")
+
+    def handle(self, *args, **options):
+        if options["resume"]:
+            run = BillingRun.objects.filter(id=options["resume"]).first()
+            if not run:
+                raise CommandError(f"Billing run #{options['resume']} not found")
+            if not run.is_resumable:
+                raise CommandError(f"Billing run #{run.id} is already {run.status}")
+        else:
+            if not options["cutoff"] or not options["user"]:
+                raise CommandError("--cutoff and --user are required for a new run")
+            try:
+                cutoff = date.fromisoformat(options["cutoff"])
+            except ValueError:
+                raise CommandError("--cutoff must be YYYY-MM-DD")
+
+            user = get_user_model().objects.filter(username=options["user"]).first()
+            if not user:
+                raise CommandError(f"User {options['user']!r} not found")
+
+            run = BillingRun.objects.create(
+                cutoff_date=cutoff,
+                chunk_size=options["chunk_size"],
+                created_by=user,
+            )
+
+        run = run_billing(run)
+        self.stdout.write(self.style.SUCCESS(
+            f"Billing run #{run.id}: {run.customers_billed} invoices, ₹{run.total_amount}"
+        ))
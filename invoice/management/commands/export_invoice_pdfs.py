@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.export import filter_invoices, stream_pdf_zip
+
+
+class Command(BaseCommand):
+    help = "Write a ZIP of invoice PDFs for a billing period, area or id list."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Path of the ZIP file to write.")
+        parser.add_argument("--from", dest="start", help="Period end on/after (YYYY-MM-DD).")
+        parser.add_argument("--to", dest="end", help="Period end on/before (YYYY-MM-DD).")
+        parser.add_argument("--area", help="Customer area.")
+        parser.add_argument("--ids", help="Comma-separated invoice ids.")
+        parser.add_argument("--workers", type=int, help="Render processes (default: INVOICE_EXPORT_WORKERS).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+            ids = [int(i) for i in (options["ids"] or "").split(",") if i.strip()]
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD and ids integers")
+
+        if not (start or end or options["area"] or ids):
+            raise CommandError("Give --from/--to, --area or --ids")
+
+        invoices = filter_invoices(start=start, end=end, area=options["area"], ids=ids)
+        count = invoices.count()
+
+        with open(options["output"], "wb") as fh:
+            for chunk in stream_pdf_zip(invoices, workers=options["workers"]):
+                fh.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} invoices to {options['output']}"))
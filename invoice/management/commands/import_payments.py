@@ -0,0 +1,43 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from invoice.statements import StatementError, import_statement
+
+
+class Command(BaseCommand):
+    help = "Import a CSV bank / UPI statement as payments and print what was left unmatched."
+
+    def add_arguments(self, parser):
+        parser.add_argument("statement", help="Path of the CSV statement.")
+        parser.add_argument("--user", required=True, help="Username the payments are recorded as created by.")
+        parser.add_argument("--mode", default="UPI", help="Payment mode recorded (default: UPI).")
+        parser.add_argument("--dry-run", action="store_true", help="Match and report without recording anything.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}")
+
+        try:
+            with open(options["statement"], "rb") as fh:
+                statement, result = import_statement(
+                    fh, os.path.basename(options["statement"]), user,
+                    mode=options["mode"][:20], dry_run=options["dry_run"],
+                )
+        except (OSError, StatementError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Could not read the statement: {exc}")
+
+        for line in result.report:
+            self.stdout.write(
+                f"line {line['line']}: {line['outcome']} {line['reference']} "
+                f"₹{line['amount']} - {line['reason']}"
+            )
+
+        summary = f"{result.matched} of {result.lines} lines matched, ₹{result.matched_amount}"
+        if statement:
+            self.stdout.write(self.style.SUCCESS(f"Import #{statement.id}: {summary} recorded"))
+        else:
+            self.stdout.write(f"Dry run: {summary}")
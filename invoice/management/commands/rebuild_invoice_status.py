@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from invoice.payments import refresh_paid
+
+
+class Command(BaseCommand):
+    help = "Recompute every invoice's paid amount and status from its payments."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = refresh_paid()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {count} invoices"))
@@ -0,0 +1,60 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:56
+
+from django.db import migrations, models
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def backfill_paid(apps, schema_editor):
+    Invoice = apps.get_model("invoice", "Invoice")
+    Payment = apps.get_model("invoice", "Payment")
+
+    paid = (
+        Payment.objects
+        .filter(invoice_id=OuterRef("pk"))
+        .order_by()
+        .values("invoice_id")
+        .annotate(t=Sum("amount"))
+        .values("t")
+    )
+    Invoice.objects.update(
+        paid_amount=Coalesce(
+            Subquery(paid), Value(0),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+    )
+    Invoice.objects.update(
+        status=Case(
+            When(paid_amount__gte=F("total_amount"), then=Value("PAID")),
+            When(paid_amount__gt=0, then=Value("PARTIAL")),
+            default=Value("UNPAID"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0003_invoice_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='invoice',
+            name='status',
+            field=models.CharField(choices=[('UNPAID', 'Unpaid'), ('PARTIAL', 'Partial'), ('PAID', 'Paid')], default='UNPAID', max_length=10),
+        ),
+        migrations.RunPython(backfill_paid, migrations.RunPython.noop),
+        # the backfill queues deferred FK checks on invoice_invoice, and
+        # Postgres will not index a table with pending trigger events
+        migrations.RunSQL("SET CONSTRAINTS ALL IMMEDIATE", migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'PAID'), _negated=True), fields=['-created_at', '-id'], name='invoice_outstanding_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0003_delivery_updated_at'),
+        ('invoice', '0004_invoice_payment_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoicedelivery',
+            name='delivery',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.PROTECT, to='delivery.delivery'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_lines(apps, schema_editor):
+    InvoiceDelivery = apps.get_model("invoice", "InvoiceDelivery")
+    Delivery = apps.get_model("delivery", "Delivery")
+
+    delivery = Delivery.objects.filter(pk=OuterRef("delivery_id"))
+    InvoiceDelivery.objects.update(
+        date=Subquery(delivery.values("date")[:1]),
+        newspaper_id=Subquery(delivery.values("newspaper_id")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('delivery', '0004_partition_by_month'),
+        ('invoice', '0005_invoicedelivery_no_db_fk'),
+        ('newspaper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoicedelivery',
+            name='date',
+            field=models.DateField(db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='invoicedelivery',
+            name='newspaper',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='newspaper.newspaper'),
+        ),
+        migrations.RunPython(backfill_lines, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='invoicedelivery',
+            name='date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='invoicedelivery',
+            name='newspaper',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='newspaper.newspaper'),
+        ),
+        migrations.AlterField(
+            model_name='invoicedelivery',
+            name='delivery',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='delivery.delivery'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0006_invoicedelivery_date_newspaper'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='billingrun',
+            name='billing_day',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
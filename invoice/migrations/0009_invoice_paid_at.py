@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:40
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_paid_at(apps, schema_editor):
+    Invoice = apps.get_model("invoice", "Invoice")
+    Payment = apps.get_model("invoice", "Payment")
+
+    last = (
+        Payment.objects
+        .filter(invoice_id=OuterRef("pk"))
+        .order_by()
+        .values("invoice_id")
+        .annotate(t=Max("created_at"))
+        .values("t")
+    )
+    Invoice.objects.update(paid_at=Subquery(last))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoice', '0008_payment_reference_paymentimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='paid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_paid_at, migrations.RunPython.noop),
+    ]
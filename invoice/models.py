@@ -1,10 +1,17 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 from django.conf import settings
+from django.utils import timezone
 from customers.models import Customer 
 
 
 class Invoice(models.Model):
+
+    class Status(models.TextChoices):
+        UNPAID = "UNPAID", "Unpaid"
+        PARTIAL = "PARTIAL", "Partial"
+        PAID = "PAID", "Paid"
+
     customer = models.ForeignKey(
         Customer,
         on_delete=models.PROTECT
@@ -21,6 +28,16 @@ class Invoice(models.Model):
 
     is_locked = models.BooleanField(default=True)
 
+    # maintained from Payment rows; see apply_payment()
+    paid_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.UNPAID,
+    )
+    # when paid_amount last changed; versions the cached PDF
+    paid_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -35,19 +52,59 @@ class Invoice(models.Model):
                 name="invoice_from_lte_to"
             ),
         ]
+        indexes = [
+            # keyset order of the invoice list
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="invoice_created_id_idx",
+            ),
+            # same order, outstanding invoices only
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="invoice_outstanding_idx",
+                condition=~models.Q(status="PAID"),
+            ),
+        ]
 
     def __str__(self):
         return f"Invoice #{self.id} - {self.customer}"
 
+    @property
+    def pending_amount(self):
+        return self.total_amount - self.paid_amount
+
+    @classmethod
+    def status_for(cls, total, paid):
+        if paid >= total:
+            return cls.Status.PAID
+        if paid > 0:
+            return cls.Status.PARTIAL
+        return cls.Status.UNPAID
+
+    def apply_payment(self, amount):
+        """Add `amount` to the paid total. Call on a row locked with select_for_update()."""
+        self.paid_amount += amount
+        self.status = self.status_for(self.total_amount, self.paid_amount)
+        self.paid_at = timezone.now()
+        self.save(update_fields=["paid_amount", "status", "paid_at"])
+
 class InvoiceDelivery(models.Model):
     invoice = models.ForeignKey(
         Invoice,
         on_delete=models.PROTECT,
     )
+    # no database FK: delivery_delivery is partitioned by date, and its
+    # primary key must include the partition column. NULL for a line
+    # billed from a derived delivery (exception-only storage).
     delivery = models.OneToOneField(
         "delivery.Delivery",
-        on_delete=models.PROTECT
+        on_delete=models.PROTECT,
+        db_constraint=False,
+        null=True,
+        blank=True,
     )
+    date = models.DateField(db_index=True)
+    newspaper = models.ForeignKey("newspaper.NewsPaper", on_delete=models.PROTECT)
 
     delivery_price = models.DecimalField(
         max_digits=10,
@@ -59,7 +116,7 @@ class InvoiceDelivery(models.Model):
         unique_together = ("invoice", "delivery")
 
     def __str__(self):
-        return f"Invoice #{self.invoice_id} → Delivery #{self.delivery_id}"
+        return f"Invoice #{self.invoice_id} → {self.date}"
 
 
 class Payment(models.Model):
@@ -77,6 +134,16 @@ class Payment(models.Model):
     payment_date = models.DateField()
     mode = models.CharField(max_length=20) 
     notes = models.TextField(blank=True)
+    # bank / UPI transaction reference; a statement line is imported once
+    reference = models.CharField(max_length=100, blank=True)
+    # the statement import that recorded this payment, if any
+    statement = models.ForeignKey(
+        "PaymentImport",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="payments",
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -86,9 +153,79 @@ class Payment(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["reference"],
+                condition=~models.Q(reference=""),
+                name="unique_payment_reference",
+            ),
+        ]
 
     def __str__(self):
         return f"Payment ₹{self.amount} for Invoice #{self.invoice_id}"
 
 
+class BillingRun(models.Model):
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "Pending"
+        RUNNING = "RUNNING", "Running"
+        DONE = "DONE", "Done"
+        FAILED = "FAILED", "Failed"
+
+    cutoff_date = models.DateField()
+    # only customers with this Customer.billing_day; NULL: every active customer
+    billing_day = models.PositiveSmallIntegerField(null=True, blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    chunk_size = models.PositiveIntegerField(default=200)
 
+    # checkpoint: every customer with id <= this has been processed
+    last_customer_id = models.PositiveBigIntegerField(default=0)
+    customers_billed = models.PositiveIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT
+    )
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Billing run #{self.id} up to {self.cutoff_date}"
+
+    @property
+    def is_resumable(self):
+        return self.status in (self.Status.PENDING, self.Status.RUNNING, self.Status.FAILED)
+
+
+class PaymentImport(models.Model):
+    """One imported bank / UPI statement and its reconciliation report."""
+
+    filename = models.CharField(max_length=255)
+    lines = models.PositiveIntegerField(default=0)
+    matched = models.PositiveIntegerField(default=0)
+    matched_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # lines not imported, as dicts with the line, outcome and reason
+    report = models.JSONField(default=list)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT
+    )
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import #{self.id} {self.filename}"
@@ -0,0 +1,36 @@
+from django.db.models import Case, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import Invoice, Payment
+
+
+def refresh_paid(invoices=None):
+    """
+    Recompute `paid_amount` and `paid_at`, then `status`, from Payment
+    rows in two set-based UPDATEs.
+
+    For writes that bypass apply_payment(): bulk imports and repairs.
+    Returns the number of invoices touched.
+    """
+    invoices = Invoice.objects.all() if invoices is None else invoices
+    payments = (
+        Payment.objects
+        .filter(invoice_id=OuterRef("pk"))
+        .order_by()
+        .values("invoice_id")
+    )
+    invoices.update(
+        paid_amount=Coalesce(
+            Subquery(payments.annotate(t=Sum("amount")).values("t")),
+            Value(0),
+            output_field=DecimalField(max_digits=10, decimal_places=2),
+        ),
+        paid_at=Subquery(payments.annotate(t=Max("created_at")).values("t")),
+    )
+    return invoices.update(
+        status=Case(
+            When(paid_amount__gte=F("total_amount"), then=Value(Invoice.Status.PAID)),
+            When(paid_amount__gt=0, then=Value(Invoice.Status.PARTIAL)),
+            default=Value(Invoice.Status.UNPAID),
+        ),
+    )
@@ -0,0 +1,96 @@
+import io
+from functools import lru_cache
+from types import SimpleNamespace
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table, TableStyle
+
+
+# bump when the layout below changes so cached PDFs are not reused
+LAYOUT_VERSION = 2
+
+
+@lru_cache(maxsize=1)
+def _styles():
+    return getSampleStyleSheet()
+
+
+def render_invoice_pdf(invoice, paid, pending, out, printed_on=None):
+    """Write the invoice PDF for `invoice` into the file-like `out`."""
+    printed_on = printed_on or timezone.now().date()
+
+    doc = SimpleDocTemplate(
+        out,
+        pagesize=A4,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36,
+    )
+
+    styles = _styles()
+    elements = []
+
+    elements.append(
+        Paragraph(f"<b>Invoice #{invoice.id}</b>", styles["Title"])
+    )
+    elements.append(
+        Paragraph(
+            f"{invoice.customer.name}<br/>"
+            f"Period: {invoice.from_date} → {invoice.to_date}<br/>"
+            f"As of: {printed_on}",
+            styles["Normal"],
+        )
+    )
+
+    elements.append(Paragraph("<br/>", styles["Normal"]))
+
+    data = [
+        ["Total Amount", f"₹{invoice.total_amount}"],
+        ["Paid", f"₹{paid}"],
+        ["Pending", f"₹{pending}"],
+    ]
+
+    table = Table(data, colWidths=[200, 200])
+    table.setStyle(
+        TableStyle([
+            ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
+            ("FONT", (0, 0), (-1, -1), "Helvetica"),
+            ("FONTSIZE", (0, 0), (-1, -1), 11),
+            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
+            ("TOPPADDING", (0, 0), (-1, -1), 10),
+            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
+            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ])
+    )
+
+    elements.append(table)
+    doc.build(elements)
+
+
+def render_invoice_payload(payload):
+    """
+    Render from a plain dict so the call can run in a worker process
+    without Django models or a database connection.
+
+    Returns `(filename, pdf_bytes)`.
+    """
+    invoice = SimpleNamespace(
+        id=payload["id"],
+        customer=SimpleNamespace(name=payload["customer_name"]),
+        from_date=payload["from_date"],
+        to_date=payload["to_date"],
+        total_amount=payload["total_amount"],
+    )
+    buffer = io.BytesIO()
+    render_invoice_pdf(
+        invoice,
+        payload["paid"],
+        payload["total_amount"] - payload["paid"],
+        buffer,
+        payload["printed_on"],
+    )
+    return f"invoice_{payload['id']}.pdf", buffer.getvalue()
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .pdf import LAYOUT_VERSION, render_invoice_payload, render_invoice_pdf
+
+
+# eviction frees down to this share of INVOICE_PDF_CACHE_MAX_BYTES, so
+# the directory is not rescanned on every miss once it is full
+LOW_WATER = 0.9
+
+# bytes in the cache directory as this process last counted them, plus
+# what it has written since; None until the first write
+_size = {"bytes": None}
+_size_lock = threading.Lock()
+
+
+def _cache_dir():
+    path = Path(settings.INVOICE_PDF_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def version(invoice):
+    """
+    Return `(key, last_modified)` identifying the PDF for the invoice's
+    current payment state, from the invoice row alone.
+    """
+    # fixed decimals: an instance just saved may still hold 100 for 100.00
+    raw = (
+        f"{invoice.id}:{invoice.total_amount:.2f}:{invoice.paid_amount:.2f}:"
+        f"{invoice.status}:{invoice.paid_at}:{LAYOUT_VERSION}"
+    )
+    key = hashlib.sha256(raw.encode()).hexdigest()
+    last_modified = max(filter(None, [invoice.created_at, invoice.paid_at]))
+    return key, last_modified
+
+
+def _scan(directory):
+    """`(mtime, size, path)` of every cached PDF."""
+    entries = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".pdf"):
+            continue
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    return entries
+
+
+def _evict(directory, keep):
+    """Delete least recently used PDFs down to the low-water mark; returns bytes left."""
+    entries = _scan(directory)
+    total = sum(size for _, size, _ in entries)
+    target = settings.INVOICE_PDF_CACHE_MAX_BYTES * LOW_WATER
+
+    # hits refresh mtime
+    for _, size, path in sorted(entries):
+        if total <= target:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    return total
+
+
+def _added(directory, path, size):
+    """Count a newly written PDF; evict only once the count passes the limit."""
+    with _size_lock:
+        if _size["bytes"] is None:
+            # the scan already includes the new file
+            _size["bytes"] = sum(s for _, s, _ in _scan(directory))
+        else:
+            _size["bytes"] += size
+        if _size["bytes"] > settings.INVOICE_PDF_CACHE_MAX_BYTES:
+            _size["bytes"] = _evict(directory, keep=path)
+
+
+def _read(path):
+    """The cached PDF at `path`, marked recently used, or None."""
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    os.utime(path)
+    return data
+
+
+def _write(path, data):
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def get_or_render(invoice):
+    """
+    Return `(pdf_bytes, key, last_modified)` for `invoice`, rendering on a miss.
+
+    Files are content-addressed by `version`, so a new payment produces a
+    new entry and the old one ages out through LRU eviction. The PDF is
+    dated by `last_modified`, not the day it is served, so a version's
+    bytes never change.
+    """
+    key, last_modified = version(invoice)
+
+    directory = _cache_dir()
+    path = directory / f"{key}.pdf"
+
+    data = _read(path)
+    if data is not None:
+        return data, key, last_modified
+
+    buffer = io.BytesIO()
+    render_invoice_pdf(
+        invoice, invoice.paid_amount, invoice.pending_amount, buffer,
+        timezone.localdate(last_modified),
+    )
+    data = buffer.getvalue()
+    _write(path, data)
+    _added(directory, str(path), len(data))
+
+    return data, key, last_modified
+
+
+# ============================
+# BULK EXPORT
+# ============================
+def export_payload(invoice):
+    """
+    What an export worker needs for `invoice` (with its customer loaded):
+    the fields `render_invoice_payload` takes, dated as `get_or_render`
+    dates them, and the cache file for its version.
+    """
+    key, last_modified = version(invoice)
+    return {
+        "id": invoice.id,
+        "customer_name": invoice.customer.name,
+        "from_date": invoice.from_date,
+        "to_date": invoice.to_date,
+        "total_amount": invoice.total_amount,
+        "paid": invoice.paid_amount,
+        "printed_on": timezone.localdate(last_modified),
+        "path": str(_cache_dir() / f"{key}.pdf"),
+    }
+
+
+def render_cached(payload):
+    """
+    Run in an export worker process, without Django: read the payload's
+    cached PDF, or render and store it. Returns `(filename, pdf_bytes,
+    rendered)`; the caller passes rendered files to `stored`.
+    """
+    path = Path(payload["path"])
+    data = _read(path)
+    if data is not None:
+        return f"invoice_{payload['id']}.pdf", data, False
+
+    name, data = render_invoice_payload(payload)
+    _write(path, data)
+    return name, data, True
+
+
+def stored(payload, data):
+    """Count a PDF an export worker wrote into this process's size total."""
+    path = Path(payload["path"])
+    _added(path.parent, str(path), len(data))
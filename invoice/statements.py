@@ -0,0 +1,394 @@
+"""
+Bank / UPI statement import.
+
+A statement is a CSV of credits, read line by line. Each credit is
+matched against an in-memory index of the open invoices, built with one
+query:
+
+- an invoice number in the narration ("INV 123", "Invoice #123") picks
+  that invoice;
+- otherwise a phone number picks the customer. It comes from a phone
+  column, or from the digits of a UPI id in the narration such as
+  9876543210@ybl. The line then pays the open invoice whose pending
+  amount it equals. If the customer has only one open invoice, the line
+  may also pay part of it.
+
+Lines that cannot be matched this way are left to be checked by hand:
+
+- UNMATCHED: no customer or invoice was found.
+- AMBIGUOUS: there are several candidates, or the amount is more than
+  what is pending.
+- DUPLICATE: the reference is already on a payment.
+- INVALID: the line could not be read.
+
+The statement is read and matched BATCH_SIZE lines at a time, and
+matched lines are written in one transaction; see import_statement().
+"""
+import csv
+import io
+import re
+from collections import defaultdict
+from itertools import islice
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from core import caching, rollups
+from customers.ledger import record_payments
+from customers.phone import normalize_phone
+from .models import Invoice, Payment, PaymentImport
+from .payments import refresh_paid
+
+
+MATCHED = "MATCHED"
+UNMATCHED = "UNMATCHED"
+AMBIGUOUS = "AMBIGUOUS"
+DUPLICATE = "DUPLICATE"
+INVALID = "INVALID"
+
+# accepted header names for each field, compared case-insensitively
+COLUMNS = {
+    "date": ("date", "txn date", "transaction date", "value date"),
+    "amount": ("amount", "credit", "credit amount", "deposit", "deposit amount"),
+    "reference": ("reference", "ref", "ref no", "utr", "upi ref", "transaction id"),
+    "narration": ("narration", "description", "remarks", "particulars"),
+    "phone": ("phone", "mobile"),
+}
+REQUIRED = ("date", "amount", "reference")
+
+# lines read, matched and written together
+BATCH_SIZE = 500
+# lines kept for a dry run's preview
+PREVIEW_LINES = 1000
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d-%b-%Y", "%d %b %Y")
+
+INVOICE_NUMBER = re.compile(r"\binv(?:oice)?\s*[#:.-]?\s*(\d+)\b", re.IGNORECASE)
+# a ten-digit mobile number, on its own or as a UPI id
+PHONE_NUMBER = re.compile(r"(?<!\d)(?:\+?91[\s-]?)?([6-9]\d{9})(?!\d)")
+
+
+class StatementError(ValueError):
+    pass
+
+
+@dataclass
+class Line:
+    number: int
+    date: date | None
+    amount: Decimal | None
+    reference: str
+    narration: str = ""
+    phone: str = ""
+    outcome: str = ""
+    reason: str = ""
+    invoice_id: int | None = None
+    candidates: list = field(default_factory=list)
+
+    def as_report(self):
+        return {
+            "line": self.number,
+            "date": self.date.isoformat() if self.date else "",
+            "amount": str(self.amount) if self.amount is not None else "",
+            "reference": self.reference,
+            "narration": self.narration,
+            "outcome": self.outcome,
+            "reason": self.reason,
+            "candidates": self.candidates,
+        }
+
+
+# ============================
+# READING
+# ============================
+def _header_map(fieldnames):
+    names = {(name or "").strip().lower(): name for name in fieldnames or ()}
+    found = {}
+    for key, aliases in COLUMNS.items():
+        for alias in aliases:
+            if alias in names:
+                found[key] = names[alias]
+                break
+    missing = [key for key in REQUIRED if key not in found]
+    if missing:
+        raise StatementError(f"Statement has no {', '.join(missing)} column")
+    return found
+
+
+def _parse_date(value):
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+def _parse_amount(value):
+    cleaned = re.sub(r"[₹,\s]|cr$", "", value.strip(), flags=re.IGNORECASE)
+    if not cleaned:
+        return Decimal(0)
+    try:
+        return Decimal(cleaned)
+    except InvalidOperation:
+        return None
+
+
+def _credits(reader, columns):
+    for row in reader:
+        values = {key: (row.get(name) or "").strip() for key, name in columns.items()}
+        if not any(values.values()):
+            continue
+
+        line = Line(
+            number=reader.line_num,
+            date=_parse_date(values["date"]),
+            amount=_parse_amount(values["amount"]),
+            reference=values["reference"][:100],
+            narration=values.get("narration", ""),
+            phone=values.get("phone", ""),
+        )
+        if line.amount is not None and line.amount <= 0:
+            continue
+        if line.date is None or line.amount is None or not line.reference:
+            line.outcome = INVALID
+            line.reason = "Needs a date, a credit amount and a reference"
+        yield line
+
+
+def read_lines(fh):
+    """
+    Return an iterator of a Line for every credit in the CSV text stream
+    `fh`; debit and empty rows are skipped. Lines that cannot be read come
+    back INVALID. The header is checked at once.
+    """
+    reader = csv.DictReader(fh)
+    return _credits(reader, _header_map(reader.fieldnames))
+
+
+# ============================
+# MATCHING
+# ============================
+@dataclass
+class _Open:
+    id: int
+    customer_id: int
+    pending: Decimal
+
+
+class OpenInvoices:
+    """Unpaid and part-paid invoices, by id and by customer phone."""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_phone = defaultdict(list)
+        rows = (
+            Invoice.objects
+            .exclude(status=Invoice.Status.PAID)
+            .order_by("id")
+            .values_list("id", "customer_id", "customer__phone_digits", "total_amount", "paid_amount")
+        )
+        for invoice_id, customer_id, phone, total, paid in rows:
+            invoice = _Open(invoice_id, customer_id, total - paid)
+            self.by_id[invoice_id] = invoice
+            if phone:
+                self.by_phone[phone].append(invoice)
+
+    def for_phones(self, phones):
+        return [
+            invoice
+            for phone in phones
+            for invoice in self.by_phone.get(phone, ())
+            if invoice.pending > 0
+        ]
+
+
+def _phones(line):
+    if line.phone:
+        return {normalize_phone(line.phone)}
+    return set(PHONE_NUMBER.findall(line.narration))
+
+
+def _match(line, index):
+    """Set `line`'s outcome; a match is taken off the index's pending amount."""
+    found = None
+
+    number = INVOICE_NUMBER.search(line.narration)
+    if number:
+        invoice_id = int(number.group(1))
+        found = index.by_id.get(invoice_id)
+        line.candidates = [invoice_id]
+        if found is None or found.pending <= 0:
+            line.outcome, line.reason = AMBIGUOUS, f"Invoice #{invoice_id} is not open"
+            return
+        if line.amount > found.pending:
+            line.outcome = AMBIGUOUS
+            line.reason = f"More than the ₹{found.pending} pending on invoice #{invoice_id}"
+            return
+    else:
+        phones = _phones(line)
+        candidates = index.for_phones(phones)
+        line.candidates = [invoice.id for invoice in candidates]
+        if not candidates:
+            line.outcome = UNMATCHED
+            line.reason = (
+                f"No open invoice for {', '.join(sorted(phones))}" if phones
+                else "No invoice number or phone number"
+            )
+            return
+
+        exact = [invoice for invoice in candidates if invoice.pending == line.amount]
+        if len(exact) == 1:
+            found = exact[0]
+        elif len(candidates) == 1 and line.amount < candidates[0].pending:
+            found = candidates[0]
+        else:
+            line.outcome = AMBIGUOUS
+            line.reason = (
+                f"₹{line.amount} settles {len(exact)} open invoices" if exact
+                else f"₹{line.amount} does not settle one of {len(candidates)} open invoices"
+            )
+            return
+
+    found.pending -= line.amount
+    line.outcome, line.invoice_id = MATCHED, found.id
+
+
+def match_lines(lines, index, seen):
+    """
+    Match a batch of readable lines against `index`, one query for their
+    references. `seen` holds the references of earlier batches.
+    """
+    references = {line.reference for line in lines if not line.outcome}
+    taken = seen | set(
+        Payment.objects
+        .filter(reference__in=references)
+        .values_list("reference", flat=True)
+    )
+
+    for line in lines:
+        if line.outcome:
+            continue
+        if line.reference in taken:
+            line.outcome, line.reason = DUPLICATE, "Reference already recorded"
+            continue
+        taken.add(line.reference)
+        seen.add(line.reference)
+        _match(line, index)
+    return lines
+
+
+# ============================
+# IMPORT
+# ============================
+@dataclass
+class ImportResult:
+    lines: int = 0
+    matched: int = 0
+    matched_amount: Decimal = Decimal(0)
+    # Line.as_report() of every line left for manual follow-up
+    report: list = field(default_factory=list)
+    # the first PREVIEW_LINES lines, for a dry run
+    preview: list = field(default_factory=list)
+
+
+def _post(lines, statement, user, mode):
+    """Record a batch's matched lines as payments; returns the payments."""
+    matched = [line for line in lines if line.outcome == MATCHED]
+
+    # payments may have come in since the index was read
+    locked = {
+        invoice.id: invoice
+        for invoice in Invoice.objects
+        .select_for_update()
+        .filter(id__in={line.invoice_id for line in matched})
+        .order_by("id")
+    }
+    pending = {invoice.id: invoice.pending_amount for invoice in locked.values()}
+
+    payments = []
+    for line in matched:
+        if line.amount > pending[line.invoice_id]:
+            line.outcome = AMBIGUOUS
+            line.reason = f"Invoice #{line.invoice_id} was paid while importing"
+            continue
+        pending[line.invoice_id] -= line.amount
+        payments.append(Payment(
+            invoice=locked[line.invoice_id],
+            amount=line.amount,
+            payment_date=line.date,
+            mode=mode,
+            notes=line.narration,
+            reference=line.reference,
+            statement=statement,
+            created_by=user,
+        ))
+
+    # bulk_create skips the Payment signals: post everything they would
+    Payment.objects.bulk_create(payments)
+    refresh_paid(Invoice.objects.filter(id__in={p.invoice_id for p in payments}))
+    record_payments(payments)
+
+    by_day = defaultdict(Decimal)
+    for payment in payments:
+        by_day[timezone.localdate(payment.invoice.created_at)] += payment.amount
+    for day, amount in by_day.items():
+        rollups.bump(day, paid_amount=amount)
+    caching.billing_changed_many({
+        (p.invoice.customer_id, timezone.localdate(p.invoice.created_at)) for p in payments
+    })
+    return payments
+
+
+def _batches(lines):
+    while batch := list(islice(lines, BATCH_SIZE)):
+        yield batch
+
+
+def import_statement(fh, filename, user, mode="UPI", dry_run=False):
+    """
+    Read, match and record the statement in the binary or text stream
+    `fh`, BATCH_SIZE lines at a time. Returns `(PaymentImport,
+    ImportResult)`, with no PaymentImport and nothing written on a dry
+    run. Raises StatementError for a file without the required columns.
+    """
+    if not isinstance(fh, io.TextIOBase):
+        fh = io.TextIOWrapper(fh, encoding="utf-8-sig", newline="")
+    lines = read_lines(fh)
+
+    result = ImportResult()
+    index = OpenInvoices()
+    seen = set()
+
+    with transaction.atomic():
+        statement = None
+        if not dry_run:
+            statement = PaymentImport.objects.create(filename=filename[:255], created_by=user)
+
+        for batch in _batches(lines):
+            match_lines(batch, index, seen)
+            if statement:
+                payments = _post(batch, statement, user, mode)
+                result.matched += len(payments)
+                result.matched_amount += sum(p.amount for p in payments)
+            else:
+                matched = [line for line in batch if line.outcome == MATCHED]
+                result.matched += len(matched)
+                result.matched_amount += sum(line.amount for line in matched)
+                result.preview.extend(batch[:PREVIEW_LINES - len(result.preview)])
+
+            result.lines += len(batch)
+            result.report.extend(line.as_report() for line in batch if line.outcome != MATCHED)
+
+        if statement:
+            statement.lines = result.lines
+            statement.matched = result.matched
+            statement.matched_amount = result.matched_amount
+            statement.report = result.report
+            statement.save(update_fields=["lines", "matched", "matched_amount", "report"])
+
+    return statement, result
@@ -0,0 +1,48 @@
+import os
+from datetime import date
+
+from core.jobs import JobFailed, output_path, task
+from .billing import NothingToBill, bill_customer, run_billing
+from .export import filter_invoices, stream_pdf_zip
+from .models import BillingRun
+
+
+@task("generate_invoice", needs_user=True)
+def generate_invoice(job, customer_id, to_date):
+    try:
+        invoice = bill_customer(customer_id, date.fromisoformat(to_date), job.created_by)
+    except NothingToBill as exc:
+        raise JobFailed(str(exc))
+    return {"invoice_id": invoice.id, "total_amount": str(invoice.total_amount)}
+
+
+@task("billing_run")
+def billing_run(job, run_id):
+    # checkpointed, so a retry resumes after the last committed chunk
+    run = run_billing(BillingRun.objects.get(pk=run_id))
+    return {"customers_billed": run.customers_billed, "total_amount": str(run.total_amount)}
+
+
+@task("export_invoice_pdfs")
+def export_invoice_pdfs(job, start=None, end=None, area="", ids=()):
+    invoices = filter_invoices(
+        start=start and date.fromisoformat(start),
+        end=end and date.fromisoformat(end),
+        area=area,
+        ids=ids,
+    )
+    total = invoices.count()
+    job.report(0, total)
+
+    path = output_path(job, ".zip")
+    partial = path.with_suffix(".part")
+    with open(partial, "wb") as fh:
+        # one chunk per invoice written, then the archive's directory
+        for written, chunk in enumerate(stream_pdf_zip(invoices), start=1):
+            fh.write(chunk)
+            if written % 50 == 0:
+                job.report(min(written, total))
+    os.replace(partial, path)
+
+    job.report(total)
+    return {"file": path.name, "invoices": total}
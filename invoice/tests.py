@@ -1,3 +1,274 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from customers.models import Customer, Subscription
+from delivery.generation import generate_range
+from newspaper.models import NewsPaper
+from . import billing, pdf, pdf_cache, statements
+from .models import BillingRun, Invoice, InvoiceDelivery, Payment
+
+
+class BillingRunTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.today = date.today()
+        start = self.today - timedelta(days=9)
+        for i in range(3):
+            customer = Customer.objects.create(name=f"C{i}", phone=f"+91 900000000{i}")
+            Subscription.objects.create(customer=customer, newspaper=paper, start_date=start)
+        generate_range(start, self.today)
+
+    def test_resume_after_failure_bills_each_customer_once(self):
+        run = BillingRun.objects.create(
+            cutoff_date=self.today, chunk_size=1, created_by=self.user,
+        )
+        bill_chunk = billing._bill_chunk
+        calls = []
+
+        def fail_second_chunk(*args):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError("connection lost")
+            return bill_chunk(*args)
+
+        with mock.patch("invoice.billing._bill_chunk", side_effect=fail_second_chunk):
+            with self.assertRaises(RuntimeError):
+                billing.run_billing(run)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, BillingRun.Status.FAILED)
+        self.assertEqual(run.customers_billed, 1)
+        self.assertEqual(Invoice.objects.count(), 1)
+
+        billing.run_billing(run)
+        billing.run_billing(run)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, BillingRun.Status.DONE)
+        self.assertEqual(run.customers_billed, 3)
+        self.assertEqual(run.total_amount, Decimal("150.00"))
+        self.assertEqual(
+            sorted(Invoice.objects.values_list("customer__name", flat=True)),
+            ["C0", "C1", "C2"],
+        )
+        # ten days for each of three customers, each on exactly one invoice
+        self.assertEqual(InvoiceDelivery.objects.count(), 30)
+        self.assertEqual(
+            InvoiceDelivery.objects.values("invoice__customer", "date").distinct().count(), 30,
+        )
+
+
+class StatementImportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        paper = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        today = date.today()
+        start = today - timedelta(days=9)
+        customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        Subscription.objects.create(customer=customer, newspaper=paper, start_date=start)
+        generate_range(start, today)
+        with transaction.atomic():
+            self.invoice = billing.bill_customer(customer.id, today, self.user)
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("generate_payment", args=[self.invoice.id]),
+            {"amount": "10.00", "mode": "UPI", "reference": "R1"},
+        )
+
+    def _import(self):
+        csv = (
+            "Txn Date,Narration,UTR,Credit\n"
+            f"{date.today():%d/%m/%Y},UPI/INV {self.invoice.id},R1,10.00\n"
+            f"{date.today():%d/%m/%Y},UPI/INV {self.invoice.id},R2,15.00\n"
+        )
+        return statements.import_statement(io.StringIO(csv), "stmt.csv", self.user)
+
+    def test_recorded_reference_is_skipped(self):
+        _, result = self._import()
+
+        self.assertEqual(result.lines, 2)
+        self.assertEqual(result.matched, 1)
+        self.assertEqual(result.matched_amount, Decimal("15.00"))
+        self.assertEqual(
+            [(line["reference"], line["outcome"]) for line in result.report],
+            [("R1", statements.DUPLICATE)],
+        )
+        self.assertEqual(Payment.objects.filter(reference="R1").count(), 1)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.paid_amount, Decimal("25.00"))
+
+    def test_reimport_applies_nothing(self):
+        self._import()
+        _, result = self._import()
+
+        self.assertEqual(result.matched, 0)
+        self.assertEqual(
+            {line["outcome"] for line in result.report}, {statements.DUPLICATE},
+        )
+        self.assertEqual(Payment.objects.count(), 2)
+        self.invoice.refresh_from_db()
+        self.assertEqual(self.invoice.paid_amount, Decimal("25.00"))
+
+
+class PaymentStatusMigrationTests(TransactionTestCase):
+    """invoice 0004 onwards, applied to a database that already has invoices."""
+
+    rollback = {
+        "invoice": "0003_invoice_created_id_idx",
+        "delivery": "0003_delivery_updated_at",
+    }
+
+    def setUp(self):
+        executor = MigrationExecutor(connection)
+        before = [
+            (app, self.rollback.get(app, name))
+            for app, name in executor.loader.graph.leaf_nodes()
+        ]
+        executor.migrate(before)
+        self.apps = executor.loader.project_state(before).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def _seed(self):
+        get = self.apps.get_model
+        user = get("auth", "User").objects.create(username="staff")
+        paper = get("newspaper", "NewsPaper").objects.create(name="Times", price_per_day=Decimal("5.00"))
+        customer = get("customers", "Customer").objects.create(
+            name="C0", phone="+91 9000000000", phone_digits="9000000000",
+        )
+        start = date.today() - timedelta(days=9)
+        subscription = get("customers", "Subscription").objects.create(
+            customer=customer, newspaper=paper, start_date=start,
+        )
+        invoice = get("invoice", "Invoice").objects.create(
+            customer=customer, from_date=start, to_date=start + timedelta(days=4),
+            total_amount=Decimal("25.00"), created_by=user,
+        )
+        for i in range(5):
+            delivery = get("delivery", "Delivery").objects.create(
+                customer=customer, subscription=subscription, newspaper=paper,
+                date=start + timedelta(days=i), price=Decimal("5.00"), invoice=invoice,
+            )
+            get("invoice", "InvoiceDelivery").objects.create(
+                invoice=invoice, delivery=delivery, delivery_price=Decimal("5.00"),
+            )
+        get("invoice", "Payment").objects.create(
+            invoice=invoice, amount=Decimal("10.00"), payment_date=date.today(),
+            mode="CASH", created_by=user,
+        )
+        return invoice.id
+
+    def test_backfills_seeded_rows(self):
+        invoice_id = self._seed()
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+        invoice = Invoice.objects.get(pk=invoice_id)
+        self.assertEqual(invoice.paid_amount, Decimal("10.00"))
+        self.assertEqual(invoice.status, Invoice.Status.PARTIAL)
+        self.assertIsNotNone(invoice.paid_at)
+        self.assertFalse(
+            InvoiceDelivery.objects.filter(invoice=invoice, date__isnull=True).exists()
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM pg_partitioned_table "
+                "WHERE partrelid = 'delivery_delivery'::regclass"
+            )
+            self.assertEqual(cursor.fetchone(), (1,))
+
+
+class PdfCacheTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("staff")
+        customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        self.invoices = [
+            Invoice.objects.create(
+                customer=customer, from_date=date(2026, 9, 1), to_date=date(2026, 9, 30),
+                total_amount=Decimal(100 + i), created_by=self.user,
+            )
+            for i in range(4)
+        ]
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overridden = self.settings(INVOICE_PDF_CACHE_DIR=directory)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        self.directory = directory
+
+        patched = mock.patch.dict(pdf_cache._size, {"bytes": None})
+        patched.start()
+        self.addCleanup(patched.stop)
+
+    def _cached(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(".pdf"))
+
+    def test_version_follows_payment_state(self):
+        invoice = self.invoices[0]
+        key, last_modified = pdf_cache.version(invoice)
+        self.assertEqual(last_modified, invoice.created_at)
+        invoice.refresh_from_db()
+        self.assertEqual(pdf_cache.version(invoice)[0], key)
+
+        invoice.apply_payment(Decimal("10.00"))
+
+        paid_key, paid_modified = pdf_cache.version(invoice)
+        self.assertNotEqual(paid_key, key)
+        self.assertEqual(paid_modified, invoice.paid_at)
+        invoice.refresh_from_db()
+        self.assertEqual(pdf_cache.version(invoice)[0], paid_key)
+
+    def test_hit_serves_the_stored_file(self):
+        invoice = self.invoices[0]
+        with mock.patch(
+            "invoice.pdf_cache.render_invoice_pdf", wraps=pdf.render_invoice_pdf,
+        ) as render:
+            data, key, _ = pdf_cache.get_or_render(invoice)
+            again, _, _ = pdf_cache.get_or_render(invoice)
+
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(again, data)
+        self.assertEqual(self._cached(), [f"{key}.pdf"])
+
+    def test_eviction_drops_least_recently_used(self):
+        first, _, _ = pdf_cache.get_or_render(self.invoices[0])
+        limit = int(len(first) * 2.5)
+
+        with self.settings(INVOICE_PDF_CACHE_MAX_BYTES=limit):
+            for invoice in self.invoices[1:]:
+                pdf_cache.get_or_render(invoice)
+
+        cached = self._cached()
+        sizes = sum(os.path.getsize(os.path.join(self.directory, name)) for name in cached)
+        self.assertLessEqual(sizes, limit)
+        self.assertEqual(pdf_cache._size["bytes"], sizes)
+        self.assertIn(f"{pdf_cache.version(self.invoices[-1])[0]}.pdf", cached)
+        self.assertNotIn(f"{pdf_cache.version(self.invoices[0])[0]}.pdf", cached)
+
+    def test_view_answers_not_modified(self):
+        self.client.force_login(self.user)
+        url = reverse("invoice_pdf", args=[self.invoices[0].id])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
@@ -28,6 +28,19 @@ urlpatterns = [
     "invoice/<int:invoice_id>/pdf/",
     views.invoice_pdf_view,
     name="invoice_pdf",
-)
+),
+    path("export/pdf/", views.export_invoice_pdfs, name="export_invoice_pdfs"),
+    path("billing-runs/", views.billing_runs, name="billing_runs"),
+    path(
+        "billing-runs/<int:run_id>/resume/",
+        views.resume_billing_run,
+        name="resume_billing_run"
+    ),
+    path("payments/import/", views.import_payments, name="import_payments"),
+    path(
+        "payments/import/<int:import_id>/",
+        views.payment_import,
+        name="payment_import"
+    ),
 
 ]
@@ -1,18 +1,30 @@
+import logging
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.db import transaction
-from django.db.models import Sum, Q
-from django.http import HttpResponseBadRequest, HttpResponse
+from django.http import Http404, HttpResponseBadRequest, HttpResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
-from .models import Invoice, InvoiceDelivery, Payment
-from delivery.models import Delivery
-from customers.models import Customer, Subscription
+from .models import BillingRun, Invoice, InvoiceDelivery, Payment, PaymentImport
+from .billing import NothingToBill, bill_customer, pending_customers, run_billing
+from customers.models import Customer
+from customers.ledger import record_payment
+from customers.search import matching_customer_ids
+from .pdf_cache import get_or_render, version
+from .export import filter_invoices, stream_pdf_zip
+from .statements import StatementError, import_statement
+from core import jobs
+from core.pagination import InvalidCursor, json_page, paginate, wants_json
+
 
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
+logger = logging.getLogger(__name__)
 
 
 # ============================
@@ -22,33 +34,50 @@ from reportlab.lib import colors
 def invoice_list(request):
     q = request.GET.get("q", "").strip()
 
-    invoices = (
-        Invoice.objects
-        .select_related("customer")
-        .order_by("-created_at")
-    )
+    status = request.GET.get("status", "")
 
-    if q:
-        invoices = invoices.filter(
-            Q(customer__name__icontains=q) |
-            Q(customer__phone__icontains=q)
-        )
+    invoices = Invoice.objects.select_related("customer")
 
-    payments = (
-        Payment.objects
-        .values("invoice_id")
-        .annotate(paid=Sum("amount"))
-    )
-    paid_map = {p["invoice_id"]: p["paid"] for p in payments}
-
-    for i in invoices:
-        i.paid = paid_map.get(i.id, 0) or 0
-        i.pending = i.total_amount - i.paid
+    if q:
+        invoices = invoices.filter(customer_id__in=matching_customer_ids(q))
+
+    # OUTSTANDING and the unpaid statuses are served by invoice_outstanding_idx
+    if status == "OUTSTANDING":
+        invoices = invoices.exclude(status=Invoice.Status.PAID)
+    elif status in Invoice.Status.values:
+        invoices = invoices.filter(status=status)
+    elif status:
+        return HttpResponseBadRequest("Unknown status")
+
+    try:
+        page = paginate(request, invoices, ("-created_at", "-id"))
+    except InvalidCursor as exc:
+        return HttpResponseBadRequest(str(exc))
+
+    if wants_json(request):
+        return json_page(page, [
+            {
+                "id": i.id,
+                "customer": i.customer.name,
+                "from_date": i.from_date,
+                "to_date": i.to_date,
+                "total_amount": i.total_amount,
+                "paid": i.paid_amount,
+                "pending": i.pending_amount,
+                "status": i.status,
+            }
+            for i in page.items
+        ])
 
     return render(
         request,
         "invoice/invoice_list.html",
-        {"invoices": invoices}
+        {
+            "invoices": page.items,
+            "page": page,
+            "status": status,
+            "statuses": [("OUTSTANDING", "Outstanding"), *Invoice.Status.choices],
+        }
     )
 
 
@@ -61,15 +90,15 @@ def invoice_detail(request, invoice_id):
 
     deliveries = (
         InvoiceDelivery.objects
-        .select_related("delivery")
+        .select_related("newspaper")
         .filter(invoice=invoice)
-        .order_by("delivery__date")
+        .order_by("date")
     )
 
     payments = Payment.objects.filter(invoice=invoice)
 
-    paid = payments.aggregate(total=Sum("amount"))["total"] or 0
-    pending = invoice.total_amount - paid
+    paid = invoice.paid_amount
+    pending = invoice.pending_amount
 
     return render(
         request,
@@ -88,66 +117,32 @@ def invoice_detail(request, invoice_id):
 # GENERATE INVOICE
 # ============================
 @login_required
-@transaction.atomic
 def generate_invoice(request, customer_id):
     if request.method != "POST":
         return HttpResponseBadRequest()
 
-    customer = get_object_or_404(Customer, pk=customer_id)
-
-    last_invoice = (
-        Invoice.objects
-        .filter(customer=customer)
-        .order_by("-to_date")
-        .first()
-    )
-
-    sub = Subscription.objects.get(customer=customer, is_active=True)
-
-    from_date = (
-        last_invoice.to_date + timezone.timedelta(days=1)
-        if last_invoice
-        else sub.start_date
-    )
-
     to_date = request.POST.get("to_date")
     if not to_date:
         return HttpResponseBadRequest("to_date required")
-
-    billed_delivery_ids = InvoiceDelivery.objects.values_list(
-        "delivery_id", flat=True
-    )
-
-    deliveries = (
-        Delivery.objects
-        .filter(
-            customer=customer,
-            date__range=(from_date, to_date),
-            status="DELIVERED"
+    try:
+        to_date = date.fromisoformat(to_date)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid to_date")
+
+    if settings.BACKGROUND_JOBS:
+        customer = get_object_or_404(Customer, pk=customer_id)
+        job = jobs.enqueue(
+            "generate_invoice", user=request.user,
+            customer_id=customer.id, to_date=to_date.isoformat(),
         )
-        .exclude(id__in=billed_delivery_ids)
-        .select_for_update()
-    )
-
-    if not deliveries.exists():
-        return HttpResponseBadRequest("No deliveries to invoice")
+        return redirect("job_detail", job_id=job.id)
 
-    total = sum(d.price for d in deliveries)
-
-    invoice = Invoice.objects.create(
-        customer=customer,
-        from_date=from_date,
-        to_date=to_date,
-        total_amount=total,
-        created_by=request.user
-    )
-
-    for d in deliveries:
-        InvoiceDelivery.objects.create(
-            invoice=invoice,
-            delivery=d,
-            delivery_price=d.price
-        )
+    try:
+        invoice = bill_customer(customer_id, to_date, request.user)
+    except Customer.DoesNotExist:
+        raise Http404("No Customer matches the given query.")
+    except NothingToBill as exc:
+        return HttpResponseBadRequest(str(exc))
 
     return redirect("invoice_detail", invoice_id=invoice.id)
 
@@ -161,34 +156,43 @@ def generate_payment(request, invoice_id):
     if request.method != "POST":
         return HttpResponseBadRequest()
 
-    invoice = get_object_or_404(Invoice, pk=invoice_id)
+    # the lock serialises concurrent payments against the same invoice
+    invoice = get_object_or_404(Invoice.objects.select_for_update(), pk=invoice_id)
 
     amount = request.POST.get("amount")
     mode = request.POST.get("mode")
     notes = request.POST.get("notes", "")
+    reference = request.POST.get("reference", "").strip()[:100]
 
     if not amount or not mode:
         return HttpResponseBadRequest("Invalid payment")
 
-    paid = Payment.objects.filter(invoice=invoice).aggregate(
-        total=Sum("amount")
-    )["total"] or 0
+    pending = invoice.pending_amount
 
-    pending = invoice.total_amount - paid
+    try:
+        amount = Decimal(amount)
+    except InvalidOperation:
+        return HttpResponseBadRequest("Invalid payment amount")
 
-    amount = float(amount)
     if amount <= 0 or amount > pending:
         return HttpResponseBadRequest("Invalid payment amount")
 
-    Payment.objects.create(
+    if reference and Payment.objects.filter(reference=reference).exists():
+        return HttpResponseBadRequest("Payment reference already recorded")
+
+    payment = Payment.objects.create(
         invoice=invoice,
         amount=amount,
         payment_date=timezone.now().date(),
         mode=mode,
         notes=notes,
+        reference=reference,
         created_by=request.user
     )
 
+    invoice.apply_payment(amount)
+    record_payment(payment)
+
     return redirect("invoice_detail", invoice_id=invoice.id)
 
 
@@ -199,13 +203,8 @@ def generate_payment(request, invoice_id):
 def print_invoice_view(request, invoice_id):
     invoice = get_object_or_404(Invoice, id=invoice_id)
 
-    paid = (
-        Payment.objects
-        .filter(invoice=invoice)
-        .aggregate(t=Sum("amount"))["t"] or 0
-    )
-
-    pending = invoice.total_amount - paid
+    paid = invoice.paid_amount
+    pending = invoice.pending_amount
 
     return render(
         request,
@@ -223,67 +222,192 @@ def print_invoice_view(request, invoice_id):
 # ============================
 @login_required
 def invoice_pdf_view(request, invoice_id):
-    invoice = get_object_or_404(Invoice, id=invoice_id)
+    invoice = get_object_or_404(
+        Invoice.objects.select_related("customer"), id=invoice_id
+    )
 
-    paid = (
-        Payment.objects
-        .filter(invoice=invoice)
-        .aggregate(t=Sum("amount"))["t"] or 0
+    key, last_modified = version(invoice)
+    etag = quote_etag(key)
+
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()),
     )
-    pending = invoice.total_amount - paid
+    if not_modified is not None:
+        return not_modified
+
+    data, _, _ = get_or_render(invoice)
 
-    response = HttpResponse(content_type="application/pdf")
+    response = HttpResponse(data, content_type="application/pdf")
     response["Content-Disposition"] = (
         f'inline; filename="invoice_{invoice.id}.pdf"'
     )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified.timestamp())
+    response["Cache-Control"] = "private, no-cache"
 
-    doc = SimpleDocTemplate(
-        response,
-        pagesize=A4,
-        rightMargin=36,
-        leftMargin=36,
-        topMargin=36,
-        bottomMargin=36,
-    )
+    return response
 
-    styles = getSampleStyleSheet()
-    elements = []
 
-    elements.append(
-        Paragraph(f"<b>Invoice #{invoice.id}</b>", styles["Title"])
+# ============================
+# BULK PDF EXPORT (ZIP)
+# ============================
+@login_required
+def export_invoice_pdfs(request):
+    try:
+        start = request.GET.get("from")
+        end = request.GET.get("to")
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+        ids = [int(i) for i in request.GET.get("ids", "").split(",") if i.strip()]
+    except ValueError:
+        return HttpResponseBadRequest("Invalid filters")
+
+    area = request.GET.get("area", "").strip()
+
+    if not (start or end or area or ids):
+        return HttpResponseBadRequest("Give a date range, area or invoice ids")
+
+    if settings.BACKGROUND_JOBS:
+        job = jobs.enqueue(
+            "export_invoice_pdfs", user=request.user,
+            start=start and start.isoformat(), end=end and end.isoformat(),
+            area=area, ids=ids,
+        )
+        return redirect("job_detail", job_id=job.id)
+
+    invoices = filter_invoices(start=start, end=end, area=area, ids=ids)
+
+    response = StreamingHttpResponse(
+        stream_pdf_zip(invoices),
+        content_type="application/zip",
     )
-    elements.append(
-        Paragraph(
-            f"{invoice.customer.name}<br/>"
-            f"Period: {invoice.from_date} → {invoice.to_date}<br/>"
-            f"Printed on: {timezone.now().date()}",
-            styles["Normal"],
+    response["Content-Disposition"] = 'attachment; filename="invoices.zip"'
+    return response
+
+
+# ============================
+# BILLING RUNS
+# ============================
+def _run_in_request(request, run):
+    """
+    Run `run`, saved or new, inside this request when it is small enough.
+    Returns False, with a message, when it was refused or failed.
+    """
+    remaining = pending_customers(run).count()
+    if remaining > run.chunk_size * settings.BILLING_REQUEST_MAX_CHUNKS:
+        messages.error(
+            request,
+            f"{remaining} customers to bill is too many to run here; "
+            "turn on background jobs or use `manage.py billing_run`",
         )
+        return False
+
+    # a refused new run is not recorded
+    if run.pk is None:
+        run.save()
+    try:
+        run_billing(run)
+    except Exception:
+        # the run keeps its checkpoint and error, and can be resumed
+        logger.exception("Billing run #%s failed", run.id)
+        messages.error(request, f"Billing run #{run.id} failed: {run.error}")
+        return False
+
+    messages.success(
+        request,
+        f"Billing run #{run.id}: {run.customers_billed} invoices, ₹{run.total_amount}",
     )
+    return True
 
-    elements.append(Paragraph("<br/>", styles["Normal"]))
-
-    data = [
-        ["Total Amount", f"₹{invoice.total_amount}"],
-        ["Paid", f"₹{paid}"],
-        ["Pending", f"₹{pending}"],
-    ]
-
-    table = Table(data, colWidths=[200, 200])
-    table.setStyle(
-        TableStyle([
-            ("TEXTCOLOR", (0, 0), (-1, -1), colors.black),
-            ("FONT", (0, 0), (-1, -1), "Helvetica"),
-            ("FONTSIZE", (0, 0), (-1, -1), 11),
-            ("BOTTOMPADDING", (0, 0), (-1, -1), 10),
-            ("TOPPADDING", (0, 0), (-1, -1), 10),
-            ("ALIGN", (1, 0), (1, -1), "RIGHT"),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-        ])
+
+@login_required
+def billing_runs(request):
+    error = None
+
+    if request.method == "POST":
+        try:
+            cutoff = date.fromisoformat(request.POST.get("cutoff_date", ""))
+        except ValueError:
+            cutoff = None
+            error = "Valid cutoff date required"
+
+        if cutoff:
+            run = BillingRun(cutoff_date=cutoff, created_by=request.user)
+            if settings.BACKGROUND_JOBS:
+                run.save()
+                jobs.enqueue("billing_run", user=request.user, run_id=run.id)
+            else:
+                _run_in_request(request, run)
+            return redirect("billing_runs")
+
+    runs = BillingRun.objects.all()[:50]
+
+    return render(
+        request,
+        "invoice/billing_runs.html",
+        {"runs": runs, "error": error}
     )
 
-    elements.append(table)
-    doc.build(elements)
 
-    return response
+@login_required
+def resume_billing_run(request, run_id):
+    if request.method != "POST":
+        return HttpResponseBadRequest()
+
+    run = get_object_or_404(BillingRun, pk=run_id)
+    if run.is_resumable:
+        if settings.BACKGROUND_JOBS:
+            jobs.enqueue("billing_run", user=request.user, run_id=run.id)
+        else:
+            _run_in_request(request, run)
+
+    return redirect("billing_runs")
+
+
+# ============================
+# PAYMENT IMPORT
+# ============================
+@login_required
+def import_payments(request):
+    error = None
+    preview = None
+
+    if request.method == "POST":
+        upload = request.FILES.get("statement")
+        mode = request.POST.get("mode", "").strip() or "UPI"
+        if not upload:
+            error = "Choose a statement file"
+        else:
+            try:
+                statement, result = import_statement(
+                    upload.file, upload.name, request.user,
+                    mode=mode[:20], dry_run="preview" in request.POST,
+                )
+            except (StatementError, UnicodeDecodeError) as exc:
+                error = f"Could not read the statement: {exc}"
+            else:
+                if statement:
+                    return redirect("payment_import", import_id=statement.id)
+                preview = result
+
+    imports = PaymentImport.objects.select_related("created_by")[:20]
 
+    return render(
+        request,
+        "invoice/payment_imports.html",
+        {"imports": imports, "preview": preview, "error": error}
+    )
+
+
+@login_required
+def payment_import(request, import_id):
+    statement = get_object_or_404(PaymentImport, pk=import_id)
+    payments = statement.payments.select_related("invoice__customer").order_by("id")
+
+    return render(
+        request,
+        "invoice/payment_import.html",
+        {"statement": statement, "payments": payments}
+    )
@@ -3,6 +3,13 @@ from django import forms
 from .models import NewsPaper
 
 class NewsPaperForm(ModelForm):
+    # recorded as a NewsPaperPrice row alongside price_per_day
+    sunday_price = forms.DecimalField(max_digits=6, decimal_places=2, required=False)
+    effective_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={"type": "date"}, format="%Y-%m-%d"),
+    )
+
     class Meta:
         model = NewsPaper
         fields = ['name', 'price_per_day', 'is_active']
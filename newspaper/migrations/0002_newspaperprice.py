@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_schedule(apps, schema_editor):
+    NewsPaper = apps.get_model("newspaper", "NewsPaper")
+    NewsPaperPrice = apps.get_model("newspaper", "NewsPaperPrice")
+    NewsPaperPrice.objects.bulk_create([
+        NewsPaperPrice(
+            newspaper=paper,
+            effective_from=paper.created_at.date(),
+            price=paper.price_per_day,
+        )
+        for paper in NewsPaper.objects.all()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newspaper', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsPaperPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('effective_from', models.DateField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('sunday_price', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('newspaper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='prices', to='newspaper.newspaper')),
+            ],
+            options={
+                'ordering': ['newspaper', 'effective_from'],
+                'constraints': [models.UniqueConstraint(fields=('newspaper', 'effective_from'), name='unique_price_per_newspaper_per_day')],
+            },
+        ),
+        migrations.RunPython(backfill_schedule, migrations.RunPython.noop),
+    ]
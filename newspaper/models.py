@@ -2,7 +2,34 @@ from django.db import models
 
 class NewsPaper(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    # price for days before the paper's first NewsPaperPrice row
     price_per_day = models.DecimalField(max_digits=6, decimal_places=2)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+
+class NewsPaperPrice(models.Model):
+    """A paper's price from `effective_from` until its next row."""
+
+    newspaper = models.ForeignKey(
+        NewsPaper,
+        on_delete=models.CASCADE,
+        related_name="prices",
+    )
+    effective_from = models.DateField()
+    price = models.DecimalField(max_digits=6, decimal_places=2)
+    # NULL: Sundays cost the same as other days
+    sunday_price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["newspaper", "effective_from"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["newspaper", "effective_from"],
+                name="unique_price_per_newspaper_per_day",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.newspaper_id} from {self.effective_from}: ₹{self.price}"
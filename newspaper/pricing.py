@@ -0,0 +1,118 @@
+"""
+Dated newspaper prices.
+
+A paper costs the price of its latest NewsPaperPrice row on or before the
+day (the row's `sunday_price` on Sundays, when set), and `price_per_day`
+before its first row.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import NewsPaper, NewsPaperPrice
+
+
+SUNDAY = 6
+
+
+def _pick(price, sunday_price, day):
+    if day.weekday() == SUNDAY and sunday_price is not None:
+        return sunday_price
+    return price
+
+
+class PriceIndex:
+    """
+    Every paper's price for each day in [start, end], resolved from the
+    schedule up front with two queries, so `price()` is a dict and a list
+    lookup. Build one per generation or billing run.
+    """
+
+    def __init__(self, start, end):
+        self.start = start
+        days = (end - start).days + 1
+
+        schedules = {}
+        for newspaper_id, effective_from, price, sunday_price in (
+            NewsPaperPrice.objects
+            .filter(effective_from__lte=end)
+            .order_by("newspaper_id", "effective_from")
+            .values_list("newspaper_id", "effective_from", "price", "sunday_price")
+        ):
+            schedules.setdefault(newspaper_id, []).append((effective_from, price, sunday_price))
+
+        self._prices = {}
+        for newspaper_id, base in NewsPaper.objects.values_list("id", "price_per_day"):
+            rows = schedules.get(newspaper_id, [])
+            current = (base, None)
+            i = 0
+            prices = []
+            for offset in range(days):
+                day = start + timedelta(days=offset)
+                while i < len(rows) and rows[i][0] <= day:
+                    current = rows[i][1:]
+                    i += 1
+                prices.append(_pick(*current, day))
+            self._prices[newspaper_id] = prices
+
+    def price(self, newspaper_id, day):
+        return self._prices[newspaper_id][(day - self.start).days]
+
+
+def price_on(day):
+    """
+    The price on `day` of the outer row's `newspaper`, as an expression
+    for annotating Subscription or Delivery querysets.
+    """
+    rows = (
+        NewsPaperPrice.objects
+        .filter(newspaper=OuterRef("newspaper_id"), effective_from__lte=day)
+        .order_by("-effective_from")
+    )
+    column = Coalesce("sunday_price", "price") if day.weekday() == SUNDAY else F("price")
+    return Coalesce(
+        Subquery(rows.annotate(p=column).values("p")[:1]),
+        F("newspaper__price_per_day"),
+    )
+
+
+def schedule_on(day):
+    """`{newspaper_id: (price, sunday_price)}` for papers with a row by `day`."""
+    rows = (
+        NewsPaperPrice.objects
+        .filter(effective_from__lte=day)
+        .order_by("newspaper_id", "-effective_from")
+        .distinct("newspaper_id")
+        .values_list("newspaper_id", "price", "sunday_price")
+    )
+    return {newspaper_id: (price, sunday) for newspaper_id, price, sunday in rows}
+
+
+def in_effect(newspaper, day):
+    """`(price, sunday_price)` of `newspaper` on `day`."""
+    row = (
+        newspaper.prices
+        .filter(effective_from__lte=day)
+        .order_by("-effective_from")
+        .values_list("price", "sunday_price")
+        .first()
+    )
+    return row or (newspaper.price_per_day, None)
+
+
+@transaction.atomic
+def set_price(newspaper, effective_from, price, sunday_price=None):
+    """
+    Schedule `price` (and `sunday_price`) from `effective_from`. A no-op
+    when those prices already apply then; returns whether a row was written.
+    """
+    if in_effect(newspaper, effective_from) == (price, sunday_price):
+        return False
+    NewsPaperPrice.objects.update_or_create(
+        newspaper=newspaper,
+        effective_from=effective_from,
+        defaults={"price": price, "sunday_price": sunday_price},
+    )
+    return True
@@ -1,3 +1,90 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from customers.models import Customer, Subscription
+from delivery.generation import generate_range
+from delivery.models import Delivery
+from . import pricing
+from .models import NewsPaper, NewsPaperPrice
+
+
+# 2026-03-01 is a Sunday
+SUNDAY = date(2026, 3, 1)
+CHANGE = date(2026, 3, 5)
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        self.times = NewsPaper.objects.create(name="Times", price_per_day=Decimal("5.00"))
+        self.herald = NewsPaper.objects.create(name="Herald", price_per_day=Decimal("4.00"))
+        pricing.set_price(self.times, CHANGE, Decimal("6.00"), Decimal("9.00"))
+
+    def test_switches_on_effective_date(self):
+        before = CHANGE - timedelta(days=1)
+
+        self.assertEqual(pricing.in_effect(self.times, before), (Decimal("5.00"), None))
+        self.assertEqual(
+            pricing.in_effect(self.times, CHANGE), (Decimal("6.00"), Decimal("9.00")),
+        )
+        index = pricing.PriceIndex(before, CHANGE)
+        self.assertEqual(index.price(self.times.id, before), Decimal("5.00"))
+        self.assertEqual(index.price(self.times.id, CHANGE), Decimal("6.00"))
+
+    def test_sunday_price_applies_on_sundays(self):
+        sunday = SUNDAY + timedelta(days=7)
+        index = pricing.PriceIndex(sunday - timedelta(days=1), sunday)
+
+        self.assertEqual(index.price(self.times.id, sunday), Decimal("9.00"))
+        self.assertEqual(index.price(self.times.id, sunday - timedelta(days=1)), Decimal("6.00"))
+        # no Sunday price before the schedule or for the other paper
+        first = pricing.PriceIndex(SUNDAY, SUNDAY)
+        self.assertEqual(first.price(self.times.id, SUNDAY), Decimal("5.00"))
+        self.assertEqual(index.price(self.herald.id, sunday), Decimal("4.00"))
+
+    def test_same_price_is_not_written_again(self):
+        later = CHANGE + timedelta(days=10)
+
+        self.assertFalse(pricing.set_price(self.times, later, Decimal("6.00"), Decimal("9.00")))
+        self.assertFalse(pricing.set_price(self.herald, later, Decimal("4.00")))
+        self.assertTrue(pricing.set_price(self.times, later, Decimal("6.00")))
+        self.assertEqual(NewsPaperPrice.objects.count(), 2)
+
+    def test_index_matches_price_on(self):
+        customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        for paper in (self.times, self.herald):
+            Subscription.objects.create(customer=customer, newspaper=paper, start_date=SUNDAY)
+        start, end = SUNDAY, SUNDAY + timedelta(days=13)
+        index = pricing.PriceIndex(start, end)
+
+        day = start
+        while day <= end:
+            annotated = dict(
+                Subscription.objects
+                .annotate(price=pricing.price_on(day))
+                .values_list("newspaper_id", "price")
+            )
+            self.assertEqual(
+                annotated,
+                {paper.id: index.price(paper.id, day) for paper in (self.times, self.herald)},
+                day,
+            )
+            day += timedelta(days=1)
+
+    @override_settings(DELIVERY_STORAGE="rows")
+    def test_generated_deliveries_take_the_new_price_on_the_day(self):
+        customer = Customer.objects.create(name="C0", phone="+91 9000000000")
+        Subscription.objects.create(customer=customer, newspaper=self.times, start_date=SUNDAY)
+
+        generate_range(CHANGE - timedelta(days=2), CHANGE + timedelta(days=1))
+
+        self.assertEqual(
+            list(Delivery.objects.order_by("date").values_list("date", "price")),
+            [
+                (CHANGE - timedelta(days=2), Decimal("5.00")),
+                (CHANGE - timedelta(days=1), Decimal("5.00")),
+                (CHANGE, Decimal("6.00")),
+                (CHANGE + timedelta(days=1), Decimal("6.00")),
+            ],
+        )
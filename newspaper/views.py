@@ -1,13 +1,18 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.utils import timezone
 from .models import NewsPaper
 from .forms import NewsPaperForm
+from . import pricing
+from core import caching
 
 
 @login_required
 def newspaper_list(request):
     edit_id = request.GET.get("edit")
     edit_obj = get_object_or_404(NewsPaper, id=edit_id) if edit_id else None
+    today = timezone.localdate()
 
     # POST: Add / Edit / Activate / Deactivate
     if request.method == "POST":
@@ -15,6 +20,7 @@ def newspaper_list(request):
         # EDIT existing
         if "newspaper_id" in request.POST:
             obj = get_object_or_404(NewsPaper, id=request.POST["newspaper_id"])
+            base_price = obj.price_per_day
             form = NewsPaperForm(request.POST, instance=obj)
         # ADD new
         else:
@@ -26,19 +32,39 @@ def newspaper_list(request):
 
             if not obj:
                 paper.is_active = True
+            else:
+                # price_per_day only prices days before the schedule starts;
+                # a new price goes into the schedule instead
+                paper.price_per_day = base_price
 
             if "deactivate" in request.POST:
                 paper.is_active = False
             if "activate" in request.POST:
                 paper.is_active = True
 
-            paper.save()
+            with transaction.atomic():
+                paper.save()
+                pricing.set_price(
+                    paper,
+                    form.cleaned_data["effective_from"] or today,
+                    form.cleaned_data["price_per_day"],
+                    form.cleaned_data["sunday_price"],
+                )
             return redirect("newspaper")
 
     else:
-        form = NewsPaperForm(instance=edit_obj)
+        initial = {}
+        if edit_obj:
+            price, sunday = pricing.in_effect(edit_obj, today)
+            initial = {"price_per_day": price, "sunday_price": sunday, "effective_from": today}
+        form = NewsPaperForm(instance=edit_obj, initial=initial)
 
-    newspapers = NewsPaper.objects.all()
+    newspapers = caching.cached(
+        "newspapers", caching.NEWSPAPERS_ALL_KEY, lambda: list(NewsPaper.objects.all())
+    )
+    schedule = pricing.schedule_on(today)
+    for n in newspapers:
+        n.price_today, n.sunday_price = schedule.get(n.id, (n.price_per_day, None))
 
     return render(
         request,